@@ -29,6 +29,25 @@ export async function POST(request) {
 }
 
 async function callMLAnalysisService(ticker, marketData, shortData) {
+  // Prefer the long-running Python service (app/services/analysis_service.py) when configured
+  if (process.env.ML_SERVICE_URL) {
+    try {
+      const response = await fetch(`${process.env.ML_SERVICE_URL}/analyze`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ticker, marketData, shortData }),
+        signal: AbortSignal.timeout(5000)
+      });
+      if (response.ok) {
+        const result = await response.json();
+        return result.analysis;
+      }
+      console.error(`ML service returned ${response.status}, falling back to simulation`);
+    } catch (error) {
+      console.error('ML service unavailable, falling back to simulation:', error.message);
+    }
+  }
+
   return new Promise((resolve, reject) => {
     // Enhanced ML analysis with more sophisticated simulation based on market data
     
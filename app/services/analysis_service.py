@@ -0,0 +1,453 @@
+"""
+ML Analysis Service
+Long-running HTTP front end for ml_engine/recommendation_engine with request micro-batching
+
+Run with: python analysis_service.py --port 8001 --window-ms 3
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import numpy as np
+from aiohttp import web
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from metrics import metrics
+from ml_models import OPTIONS_FEATURES, SHORT_DATA_FIELDS, QuantumMLEngine, get_ml_engine
+from ranking import DEFAULT_TOP_K, RANK_KEYS, Leaderboard
+from recommendation_engine import RiskLevel, TradeRecommendationEngine, TradeType, get_recommendation_engine
+
+# Tickers scanned per step of a /leaderboard request; a partial leaderboard follows each step
+LEADERBOARD_CHUNK = 256
+
+# Numeric marketData fields read by the batch path
+MARKET_FIELDS = ('price', 'volume', 'high', 'low') + OPTIONS_FEATURES
+DEFAULT_ACCOUNT_SIZE = 100000
+
+class ServiceOverloaded(Exception):
+    """Raised when a batcher queue is full; surfaced to clients as HTTP 503"""
+
+class InvalidRequest(ValueError):
+    """Raised for a malformed request body; surfaced to clients as HTTP 400"""
+
+class MicroBatcher:
+    """Collects concurrent single-item requests into batches.
+
+    The first queued request opens a collection window of ``window_ms``; every
+    request that arrives before it closes (up to ``max_batch``) is handed to
+    ``process_batch`` in one call, which runs on a dedicated worker thread so
+    the event loop keeps accepting requests. ``max_queue`` bounds the backlog.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], window_ms: float = 3.0,
+                 max_batch: int = 512, max_queue: int = 4096):
+        self.process_batch = process_batch
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.task = None
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.largest_batch = 0
+
+    def start(self):
+        self.task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=False)
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its individual result"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((item, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise ServiceOverloaded()
+        return await future
+
+    async def _collect(self) -> List:
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            # Drain whatever is already queued before waiting on the clock
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or len(batch) >= self.max_batch:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(self.executor, self.process_batch, items)
+            except Exception as e:
+                print(f"Error processing batch of {len(items)}: {e}")
+                results = [e] * len(items)
+
+            self.batches += 1
+            self.items += len(items)
+            self.largest_batch = max(self.largest_batch, len(items))
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def stats(self) -> Dict:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'mean_batch_size': self.items / self.batches if self.batches else 0,
+            'largest_batch': self.largest_batch,
+            'queue_depth': self.queue.qsize(),
+            'rejected': self.rejected,
+        }
+
+def to_builtin(value: Any) -> Any:
+    """Convert NumPy scalars/arrays inside nested results to JSON-friendly types"""
+    if isinstance(value, dict):
+        return {key: to_builtin(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_builtin(item) for item in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+async def _read_json(request: web.Request) -> Dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise InvalidRequest('Request body must be valid JSON')
+    if not isinstance(body, dict):
+        raise InvalidRequest('Request body must be a JSON object')
+    return body
+
+def _number(value: Any, name: str, positive: bool = False) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise InvalidRequest(f'{name} must be a number')
+    if not np.isfinite(number) or (positive and number <= 0):
+        raise InvalidRequest(f'{name} must be a finite{" positive" if positive else ""} number')
+    return number
+
+def _count(value: Any, name: str) -> int:
+    number = _number(value, name)
+    if isinstance(value, bool) or not number.is_integer() or number < 1:
+        raise InvalidRequest(f'{name} must be a whole number of at least 1')
+    return int(number)
+
+def _quota(value: Any, name: str) -> Union[int, Dict[str, int], None]:
+    """A leaderboard cap: absent, one count for every group, or a count per group name"""
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return {group: _count(cap, f'{name}.{group}') for group, cap in value.items()}
+    return _count(value, name)
+
+def _ticker_request(item: Any) -> Dict:
+    """One ticker's request with its numbers checked and converted to floats.
+
+    Runs before the request joins a batch, so one bad value is answered with
+    a 400 instead of failing every request batched with it.
+    """
+    if not isinstance(item, dict) or not item.get('ticker') or not item.get('marketData'):
+        raise InvalidRequest('Ticker and market data required')
+    if not isinstance(item['marketData'], dict):
+        raise InvalidRequest('marketData must be an object')
+    market = dict(item['marketData'])
+    for field in MARKET_FIELDS:
+        if market.get(field) is not None:
+            market[field] = _number(market[field], f'marketData.{field}')
+    item = {**item, 'marketData': market}
+    if item.get('shortData'):
+        if not isinstance(item['shortData'], dict):
+            raise InvalidRequest('shortData must be an object')
+        item['shortData'] = {
+            field: _number(value, f'shortData.{field}') if field in SHORT_DATA_FIELDS.values() else value
+            for field, value in item['shortData'].items()
+        }
+    return item
+
+def _row(tree: Any, i: int) -> Any:
+    """Row ``i`` of a columnar result tree (scalars are shared by every row)"""
+    if isinstance(tree, dict):
+        return {key: _row(value, i) for key, value in tree.items()}
+    if isinstance(tree, np.ndarray) and tree.ndim:
+        return tree[i].item()
+    return to_builtin(tree)
+
+def _take(tree: Any, rows: np.ndarray) -> Any:
+    """Subset every per-ticker array of a columnar result tree"""
+    if isinstance(tree, dict):
+        return {key: _take(value, rows) for key, value in tree.items()}
+    if isinstance(tree, np.ndarray) and tree.ndim:
+        return tree[rows]
+    return tree
+
+class AnalysisService:
+    """Routes /analyze and /recommendations requests through micro-batchers"""
+
+    def __init__(self, engine: Optional[QuantumMLEngine] = None,
+                 recommender: Optional[TradeRecommendationEngine] = None,
+                 window_ms: float = 3.0, max_batch: int = 512, max_queue: int = 4096,
+                 metrics_log_interval: float = 0.0):
+        self.engine = engine or get_ml_engine()
+        self.recommender = recommender or get_recommendation_engine()
+        self.analyze_batcher = MicroBatcher(self._analyze_batch, window_ms, max_batch, max_queue)
+        self.recommend_batcher = MicroBatcher(self._recommend_batch, window_ms, max_batch, max_queue)
+        self.metrics_log_interval = metrics_log_interval
+        self.metrics_task = None
+
+    def _analyze_columns(self, requests: List[Dict]) -> Dict:
+        tickers = [request['ticker'] for request in requests]
+        market = [request['marketData'] for request in requests]
+        columns = {
+            'price': [m.get('price', 0) for m in market],
+            'volume': [m.get('volume', 0) for m in market],
+            'high': [m.get('high', m.get('price', 0)) for m in market],
+            'low': [m.get('low', m.get('price', 0)) for m in market],
+        }
+        # Options features some requests supply; the others have them simulated
+        for name in OPTIONS_FEATURES:
+            if any(m.get(name) is not None for m in market):
+                columns[name] = [m.get(name, np.nan) for m in market]
+        short_data = None
+        if any(request.get('shortData') for request in requests):
+            short_data = {field: [(request.get('shortData') or {}).get(field, 0) for request in requests]
+                          for field in SHORT_DATA_FIELDS.values()}
+        return self.engine.analyze_batch(tickers, columns, short_data), columns
+
+    def _analyze_batch(self, requests: List[Dict]) -> List[Dict]:
+        analysis, _ = self._analyze_columns(requests)
+        if 'error' in analysis:
+            return [RuntimeError(analysis['error'])] * len(requests)
+
+        results = []
+        for i, request in enumerate(requests):
+            result = _row(analysis, i)
+            # Short-interest features only apply to requests that supplied short data
+            if not request.get('shortData'):
+                for feature in SHORT_DATA_FIELDS:
+                    result['features'].pop(feature, None)
+            results.append(result)
+        return results
+
+    def _recommend_batch(self, requests: List[Dict]) -> List[Dict]:
+        analysis, columns = self._analyze_columns(requests)
+        if 'error' in analysis:
+            return [RuntimeError(analysis['error'])] * len(requests)
+
+        results = [[] for _ in requests]
+        # Sizing depends on account size and risk level, so group on them
+        groups = {}
+        for i, request in enumerate(requests):
+            key = (float(request.get('accountSize', DEFAULT_ACCOUNT_SIZE)),
+                   request.get('riskLevel', RiskLevel.MODERATE.value))
+            groups.setdefault(key, []).append(i)
+
+        for (account_size, risk_level), rows in groups.items():
+            rows = np.asarray(rows)
+            batch = self.recommender.generate_recommendations_batch(
+                _take(analysis, rows), _take(self._pricing_columns(columns), rows), account_size, RiskLevel(risk_level)
+            )
+            for view in batch:
+                results[rows[batch['ticker_index'][view._row]]].append(self._serialize(view))
+        return results
+
+    def _leaderboard_chunk(self, requests: List[Dict], account_size: float, risk_level: RiskLevel):
+        analysis, columns = self._analyze_columns(requests)
+        if 'error' in analysis:
+            raise RuntimeError(analysis['error'])
+        return self.recommender.generate_recommendations_batch(
+            analysis, self._pricing_columns(columns), account_size, risk_level
+        )
+
+    @staticmethod
+    def _pricing_columns(columns: Dict) -> Dict[str, np.ndarray]:
+        """The market data columns ``generate_recommendations_batch`` prices from"""
+        return {name: np.asarray(columns[name], dtype=float) for name in ('price', 'implied_volatility')
+                if name in columns}
+
+    @staticmethod
+    def _serialize(view) -> Dict:
+        recommendation = view.to_recommendation() if hasattr(view, 'to_recommendation') else view
+        data = dict(recommendation.__dict__)
+        data['trade_type'] = recommendation.trade_type.value
+        data['risk_level'] = recommendation.risk_level.value
+        return to_builtin(data)
+
+    async def handle_analyze(self, request: web.Request) -> web.Response:
+        try:
+            body = _ticker_request(await _read_json(request))
+        except InvalidRequest as e:
+            return web.json_response({'error': str(e)}, status=400)
+        try:
+            analysis = await self.analyze_batcher.submit(body)
+        except ServiceOverloaded:
+            return web.json_response({'error': 'Service overloaded'}, status=503, headers={'Retry-After': '1'})
+        except Exception as e:
+            print(f"Error in analyze request: {e}")
+            return web.json_response({'error': 'Internal server error'}, status=500)
+        return web.json_response({'success': True, 'ticker': body['ticker'], 'analysis': analysis})
+
+    async def handle_recommendations(self, request: web.Request) -> web.Response:
+        try:
+            body = _ticker_request(await _read_json(request))
+            body['accountSize'] = _number(body.get('accountSize', DEFAULT_ACCOUNT_SIZE), 'accountSize', positive=True)
+        except InvalidRequest as e:
+            return web.json_response({'error': str(e)}, status=400)
+        try:
+            RiskLevel(body.get('riskLevel', RiskLevel.MODERATE.value))
+        except ValueError:
+            return web.json_response({'error': 'Unknown risk level'}, status=400)
+        try:
+            recommendations = await self.recommend_batcher.submit(body)
+        except ServiceOverloaded:
+            return web.json_response({'error': 'Service overloaded'}, status=503, headers={'Retry-After': '1'})
+        except Exception as e:
+            print(f"Error in recommend request: {e}")
+            return web.json_response({'error': 'Internal server error'}, status=500)
+        return web.json_response({'success': True, 'ticker': body['ticker'], 'recommendations': recommendations})
+
+    async def handle_leaderboard(self, request: web.Request) -> web.StreamResponse:
+        """Scan a list of {ticker, marketData, shortData, sector} requests and stream the global
+        top-K as NDJSON, one partial leaderboard per LEADERBOARD_CHUNK tickers"""
+        try:
+            body = await _read_json(request)
+            requests = body.get('requests')
+            if not requests or not isinstance(requests, list):
+                raise InvalidRequest('Tickers and market data required')
+            requests = [_ticker_request(item) for item in requests]
+            account_size = _number(body.get('accountSize', DEFAULT_ACCOUNT_SIZE), 'accountSize', positive=True)
+            k = _count(body.get('k', DEFAULT_TOP_K), 'k')
+            type_quota = _quota(body.get('typeQuota'), 'typeQuota')
+            sector_quota = _quota(body.get('sectorQuota'), 'sectorQuota')
+        except InvalidRequest as e:
+            return web.json_response({'error': str(e)}, status=400)
+        try:
+            risk_level = RiskLevel(body.get('riskLevel', RiskLevel.MODERATE.value))
+            if isinstance(type_quota, dict):
+                type_quota = {TradeType(name): cap for name, cap in type_quota.items()}
+        except ValueError:
+            return web.json_response({'error': 'Unknown risk level or trade type'}, status=400)
+        key = body.get('key', 'confidence')
+        if key not in RANK_KEYS:
+            return web.json_response({'error': f"Unknown ranking key, expected one of {sorted(RANK_KEYS)}"},
+                                     status=400)
+        board = Leaderboard(k, key, type_quota, sector_quota,
+                            {item['ticker']: item['sector'] for item in requests if item.get('sector')})
+
+        response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+        await response.prepare(request)
+        loop = asyncio.get_running_loop()
+        for start in range(0, len(requests), LEADERBOARD_CHUNK):
+            chunk = requests[start:start + LEADERBOARD_CHUNK]
+            try:
+                # Shares the recommendation batcher's worker thread, so engine calls never overlap
+                batch = await loop.run_in_executor(self.recommend_batcher.executor, self._leaderboard_chunk,
+                                                   chunk, account_size, risk_level)
+            except Exception as e:
+                print(f"Error in leaderboard request: {e}")
+                await response.write(json.dumps({'error': 'Internal server error'}).encode() + b'\n')
+                break
+            board.add_batch(batch)
+            line = {
+                'done': start + len(chunk),
+                'total': len(requests),
+                'leaderboard': [self._serialize(recommendation) for recommendation in board.leaderboard()],
+            }
+            await response.write(json.dumps(line).encode() + b'\n')
+        await response.write_eof()
+        return response
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'status': 'ok',
+            'analyze': self.analyze_batcher.stats(),
+            'recommendations': self.recommend_batcher.stats(),
+        })
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        if request.query.get('format') == 'json':
+            return web.json_response(metrics.snapshot())
+        return web.Response(text=metrics.to_prometheus(), content_type='text/plain', charset='utf-8')
+
+    async def handle_metrics_toggle(self, request: web.Request) -> web.Response:
+        try:
+            body = await _read_json(request)
+        except InvalidRequest as e:
+            return web.json_response({'error': str(e)}, status=400)
+        metrics.enable() if body.get('enabled') else metrics.disable()
+        return web.json_response({'enabled': metrics.enabled})
+
+    async def _log_metrics(self):
+        while True:
+            await asyncio.sleep(self.metrics_log_interval)
+            if metrics.enabled:
+                print(metrics.log_line(), flush=True)
+
+    async def _on_startup(self, app: web.Application):
+        self.analyze_batcher.start()
+        self.recommend_batcher.start()
+        if self.metrics_log_interval > 0:
+            self.metrics_task = asyncio.get_running_loop().create_task(self._log_metrics())
+
+    async def _on_cleanup(self, app: web.Application):
+        if self.metrics_task:
+            self.metrics_task.cancel()
+        await self.analyze_batcher.stop()
+        await self.recommend_batcher.stop()
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/analyze', self.handle_analyze)
+        app.router.add_post('/recommendations', self.handle_recommendations)
+        app.router.add_post('/leaderboard', self.handle_leaderboard)
+        app.router.add_get('/health', self.handle_health)
+        app.router.add_get('/metrics', self.handle_metrics)
+        app.router.add_post('/metrics', self.handle_metrics_toggle)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Scanner Pro ML analysis service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--window-ms', type=float, default=3.0, help='micro-batch collection window')
+    parser.add_argument('--max-batch', type=int, default=512)
+    parser.add_argument('--max-queue', type=int, default=4096, help='queued requests before returning 503')
+    parser.add_argument('--metrics-log-interval', type=float, default=0.0,
+                        help='seconds between structured metrics log lines (0 disables)')
+    args = parser.parse_args(argv)
+
+    service = AnalysisService(window_ms=args.window_ms, max_batch=args.max_batch, max_queue=args.max_queue,
+                              metrics_log_interval=args.metrics_log_interval)
+    web.run_app(service.create_app(), host=args.host, port=args.port)
+
+if __name__ == '__main__':
+    main()
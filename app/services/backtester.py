@@ -0,0 +1,304 @@
+"""
+Recommendation Backtester
+Vectorized target/stop/horizon resolution of TradeRecommendations against historical bars
+"""
+
+import os
+import numpy as np
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, Optional, Sequence
+
+from bar_store import DEFAULT_ROOT, BarStore
+from options_pricing import RISK_FREE_RATE, implied_volatility, option_premium
+from probability import CONTRACT_MULTIPLIER, STOCK_HORIZON_DAYS
+from recommendation_engine import (
+    SINGLE_OPTION_CODES, STOCK_TRADE_CODES, TRADE_TYPE_CODES, TRADE_TYPES,
+    RecommendationBatch, TradeType
+)
+
+# Fallback IV (decimal) when a straddle carries no IV and none can be backed out
+DEFAULT_IV = 0.30
+# Trades resolved per vectorized pass (bounds the trades x bars matrices)
+BACKTEST_BLOCK = 65536
+# Below this many trades a process pool costs more than it saves
+PARALLEL_MIN_TRADES = 5000
+
+EXIT_REASONS = ('NO_DATA', 'TARGET', 'STOP', 'HORIZON', 'OPEN', 'UNSUPPORTED')
+NO_DATA, TARGET, STOP, HORIZON, OPEN, UNSUPPORTED = range(len(EXIT_REASONS))
+
+STRADDLE_CODE = TRADE_TYPE_CODES[TradeType.STRADDLE]
+CALL_CODE = TRADE_TYPE_CODES[TradeType.CALL_BUY]
+SUPPORTED_CODES = STOCK_TRADE_CODES + SINGLE_OPTION_CODES + (STRADDLE_CODE,)
+
+def _empty_results(n: int) -> Dict[str, np.ndarray]:
+    return {
+        'exit_reason': np.full(n, NO_DATA, dtype=np.int8),
+        'entry_date': np.full(n, np.datetime64('NaT'), dtype='datetime64[D]'),
+        'exit_date': np.full(n, np.datetime64('NaT'), dtype='datetime64[D]'),
+        'exit_price': np.full(n, np.nan),
+        'bars_held': np.zeros(n, dtype=np.int32),
+        'pnl': np.zeros(n),
+        'return_pct': np.full(n, np.nan),
+    }
+
+def _horizon_days(trades: Dict[str, np.ndarray]) -> np.ndarray:
+    """Calendar days a trade may stay open: expiry for options, STOCK_HORIZON_DAYS for stock"""
+    is_stock = np.isin(trades['trade_type'], STOCK_TRADE_CODES)
+    return np.where(is_stock, STOCK_HORIZON_DAYS, trades['expiry_days']).astype('timedelta64[D]')
+
+def _option_values(trade_type, strike, iv, spot, days_left, rate):
+    """Option (or straddle) value for underlying prices ``spot`` (trades x bars)"""
+    straddle = trade_type == STRADDLE_CODE
+    # A straddle's base leg is its call; the put is added below
+    is_call = ((trade_type == CALL_CODE) | straddle)[:, None]
+    value = option_premium(spot, strike[:, None], days_left, iv[:, None], is_call, rate)
+    if straddle.any():
+        put = option_premium(spot[straddle], strike[straddle, None], days_left[straddle],
+                             iv[straddle, None], False, rate)
+        value[straddle] += put
+    return value
+
+def _locate(keys: np.ndarray, offset: np.ndarray, ticker: np.ndarray, days: np.ndarray) -> np.ndarray:
+    """Local index of each ticker's last bar on or before ``days`` (-1 if none).
+
+    ``keys`` packs (ticker position, day number) of the flat bar arrays into one
+    increasing int64, so a single searchsorted serves every ticker at once.
+    """
+    query = (ticker.astype(np.int64) << 32) + days.astype('datetime64[D]').astype(np.int64)
+    return np.searchsorted(keys, query, side='right') - 1 - offset[ticker]
+
+def _resolve(trades: Dict[str, np.ndarray], entry: np.ndarray, last: np.ndarray,
+             offset: np.ndarray, length: np.ndarray, dates: np.ndarray,
+             bars: Dict[str, np.ndarray], rate: float) -> Dict[str, np.ndarray]:
+    """Resolve a block of trades against flat, per-ticker concatenated bar arrays.
+
+    ``entry``/``last`` are each trade's entry bar and final horizon bar inside its
+    ticker, which starts at ``offset`` and holds ``length`` bars. The path of every
+    trade is gathered into a (trades x bars) matrix, so finding the first target
+    or stop touch is one ``argmax`` over boolean matrices.
+    """
+    n = len(trades['trade_type'])
+    results = _empty_results(n)
+    trade_type = trades['trade_type']
+    is_stock = np.isin(trade_type, STOCK_TRADE_CODES)
+    supported = np.isin(trade_type, SUPPORTED_CODES)
+    results['exit_reason'][~supported] = UNSUPPORTED
+    horizon_end = trades['entry_date'] + _horizon_days(trades)
+    valid = supported & (entry >= 0) & (entry < length - 1) & (last > entry)
+    if not valid.any():
+        return results
+
+    rows = np.flatnonzero(valid)
+    entry, last, base, size = entry[rows], last[rows], offset[rows], length[rows]
+    stock = is_stock[rows]
+    trade_type = trade_type[rows]
+    width = int((last - entry).max())
+    steps = np.arange(1, width + 1)
+    in_path = steps[None, :] <= (last - entry)[:, None]
+    index = base[:, None] + np.minimum(entry[:, None] + steps[None, :], size[:, None] - 1)
+    path_dates = dates[index]
+    path = {field: bars[field][index] for field in ('open', 'high', 'low', 'close')}
+
+    entry_price = trades['entry_price'][rows]
+    target = trades['target_price'][rows]
+    stop = trades['stop_loss'][rows]
+    # Options are long premium: their target is always above entry and stop below
+    side = np.where(stock, np.where(trades['direction'][rows] < 0, -1.0, 1.0), 1.0)[:, None]
+
+    favourable = np.where(side > 0, path['high'], path['low'])
+    adverse = np.where(side > 0, path['low'], path['high'])
+    opening = path['open']
+    closing = path['close']
+    if not stock.all():
+        options = ~stock
+        strike = trades['strike_1'][rows][options]
+        iv = trades['implied_volatility'][rows][options] / 100
+        expiry = horizon_end[rows][options]
+        days_left = np.maximum((expiry[:, None] - path_dates[options]).astype(float), 0.0)
+        option_type = trade_type[options]
+        value = {field: _option_values(option_type, strike, iv, path[field][options], days_left, rate)
+                 for field in ('open', 'high', 'low', 'close')}
+        extremes = np.stack([value['high'], value['low'], value['close']])
+        favourable = favourable.copy()
+        adverse = adverse.copy()
+        opening = opening.copy()
+        closing = closing.copy()
+        favourable[options] = extremes.max(axis=0)
+        adverse[options] = extremes.min(axis=0)
+        opening[options] = value['open']
+        closing[options] = value['close']
+
+    hit_target = in_path & (side * (favourable - target[:, None]) >= 0)
+    hit_stop = in_path & (side * (adverse - stop[:, None]) <= 0)
+    never = width + 1
+    first_target = np.where(hit_target.any(axis=1), hit_target.argmax(axis=1), never)
+    first_stop = np.where(hit_stop.any(axis=1), hit_stop.argmax(axis=1), never)
+    # A bar that touches both levels is booked as a stop (intrabar order unknown)
+    stopped = first_stop <= first_target
+    exit_step = np.minimum(np.minimum(first_target, first_stop), (last - entry) - 1)
+    touched = np.minimum(first_target, first_stop) < never
+
+    pick = np.arange(len(rows))
+    gap_open = opening[pick, exit_step]
+    # Levels fill at the level, or at the open when the bar gaps through them
+    target_fill = np.where(side[:, 0] > 0, np.maximum(gap_open, target), np.minimum(gap_open, target))
+    stop_fill = np.where(side[:, 0] > 0, np.minimum(gap_open, stop), np.maximum(gap_open, stop))
+    exit_price = np.where(touched, np.where(stopped, stop_fill, target_fill), closing[pick, exit_step])
+
+    # Unresolved trades whose bars stop short of the horizon are marked to market as OPEN
+    horizon_reached = (last < size - 1) | (path_dates[pick, (last - entry) - 1] >= horizon_end[rows])
+    reason = np.where(touched, np.where(stopped, STOP, TARGET), np.where(horizon_reached, HORIZON, OPEN))
+    multiplier = np.where(stock, 1, CONTRACT_MULTIPLIER)
+
+    results['exit_reason'][rows] = reason
+    results['entry_date'][rows] = dates[base + entry]
+    results['exit_date'][rows] = path_dates[pick, exit_step]
+    results['exit_price'][rows] = exit_price
+    results['bars_held'][rows] = exit_step + 1
+    results['pnl'][rows] = side[:, 0] * (exit_price - entry_price) * trades['position_size'][rows] * multiplier
+    results['return_pct'][rows] = side[:, 0] * (exit_price / entry_price - 1) * 100
+    return results
+
+def _fill_missing_iv(trades: Dict[str, np.ndarray], entry_spot: np.ndarray, rate: float):
+    """Back out IVs for single options that arrived without one (straddles get DEFAULT_IV)"""
+    iv = trades['implied_volatility']
+    missing = ~np.isfinite(iv) & np.isin(trades['trade_type'], SINGLE_OPTION_CODES) & np.isfinite(entry_spot)
+    if missing.any():
+        solved = implied_volatility(trades['entry_price'][missing], entry_spot[missing],
+                                    trades['strike_1'][missing], trades['expiry_days'][missing],
+                                    trades['trade_type'][missing] == CALL_CODE, rate)
+        iv[missing] = np.where(solved['converged'], solved['iv'] * 100, np.nan)
+    still_missing = ~np.isfinite(iv) & ~np.isin(trades['trade_type'], STOCK_TRADE_CODES)
+    iv[still_missing] = DEFAULT_IV * 100
+
+def backtest_tickers(root: str, tickers: Sequence[str], trades: Dict[str, np.ndarray],
+                     rate: float = RISK_FREE_RATE) -> Dict[str, np.ndarray]:
+    """Resolve trades whose ``ticker_index`` points into ``tickers`` (one process's share).
+
+    Each ticker's bars are read once from the store and concatenated, then the
+    trades are resolved in vectorized blocks of BACKTEST_BLOCK.
+    """
+    store = BarStore(root)
+    columns = [store.read(ticker) for ticker in tickers]
+    length = np.array([len(bars['date']) for bars in columns], dtype=np.int64)
+    offset = np.concatenate([[0], np.cumsum(length)[:-1]]).astype(np.int64)
+    dates = np.concatenate([bars['date'] for bars in columns]) if columns else np.empty(0, 'datetime64[D]')
+    bars = {field: np.concatenate([b[field] for b in columns]) if columns else np.empty(0)
+            for field in ('open', 'high', 'low', 'close')}
+
+    trades = {name: np.array(values) for name, values in trades.items()}
+    ticker = trades['ticker_index'].astype(np.int64)
+    owner = np.repeat(np.arange(len(tickers), dtype=np.int64), length)
+    keys = (owner << 32) + dates.astype(np.int64)
+    entry = _locate(keys, offset, ticker, trades['entry_date'])
+    last = _locate(keys, offset, ticker, trades['entry_date'] + _horizon_days(trades))
+
+    known = (entry >= 0) & (entry < length[ticker])
+    entry_spot = np.full(len(ticker), np.nan)
+    entry_spot[known] = bars['close'][offset[ticker[known]] + entry[known]]
+    _fill_missing_iv(trades, entry_spot, rate)
+
+    n = len(ticker)
+    results = _empty_results(n)
+    for start in range(0, n, BACKTEST_BLOCK):
+        block = slice(start, start + BACKTEST_BLOCK)
+        part = _resolve({name: values[block] for name, values in trades.items()}, entry[block], last[block],
+                        offset[ticker[block]], length[ticker[block]], dates, bars, rate)
+        for name, values in part.items():
+            results[name][block] = values
+    return results
+
+# Columns a worker needs from the batch
+TRADE_COLUMNS = ('ticker_index', 'trade_type', 'direction', 'entry_price', 'target_price', 'stop_loss',
+                 'position_size', 'expiry_days', 'strike_1', 'implied_volatility')
+
+def backtest(batch, entry_dates, root: str = DEFAULT_ROOT, rate: float = RISK_FREE_RATE,
+             max_workers: Optional[int] = None, executor: Optional[Executor] = None) -> Dict:
+    """Replay every recommendation against stored bars.
+
+    ``batch`` is a RecommendationBatch (or a list of TradeRecommendation) and
+    ``entry_dates`` the date each was issued (scalar or one per row). Tickers
+    are split into shards resolved in parallel by a process pool; every worker
+    maps its tickers' bars straight from the store. Returns ``{'trades': ...,
+    'summary': ...}`` with per-trade columns aligned to the batch rows.
+    """
+    if not isinstance(batch, RecommendationBatch):
+        batch = RecommendationBatch.from_recommendations(list(batch))
+    n = len(batch)
+    trades = {name: np.asarray(batch[name]) for name in TRADE_COLUMNS}
+    trades['entry_date'] = np.broadcast_to(np.asarray(entry_dates, dtype='datetime64[D]'), (n,)).copy()
+
+    results = _empty_results(n)
+    tickers = list(batch.tickers)
+    workers = max_workers or os.cpu_count() or 1
+    inline = n < PARALLEL_MIN_TRADES or (workers == 1 and executor is None)
+    shards = [np.arange(len(tickers))] if inline \
+        else np.array_split(np.arange(len(tickers)), min(len(tickers), workers * 4))
+
+    def shard_job(shard):
+        rows = np.flatnonzero(np.isin(trades['ticker_index'], shard))
+        local = {name: values[rows] for name, values in trades.items()}
+        local['ticker_index'] = np.searchsorted(shard, local['ticker_index'])
+        return rows, [tickers[i] for i in shard], local
+
+    jobs = [shard_job(shard) for shard in shards if len(shard)]
+    if len(jobs) == 1:
+        rows, shard_tickers, local = jobs[0]
+        finished = [(rows, backtest_tickers(root, shard_tickers, local, rate))]
+    else:
+        pool = executor or ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [(rows, pool.submit(backtest_tickers, root, shard_tickers, local, rate))
+                       for rows, shard_tickers, local in jobs]
+            finished = [(rows, future.result()) for rows, future in futures]
+        finally:
+            if executor is None:
+                pool.shutdown()
+
+    for rows, part in finished:
+        for name, values in part.items():
+            results[name][rows] = values
+
+    results['ticker'] = np.asarray(tickers, dtype=object)[trades['ticker_index']] if n else np.empty(0, dtype=object)
+    results['trade_type'] = trades['trade_type']
+    results['entry_price'] = trades['entry_price']
+    return {'trades': results, 'summary': summarize(results)}
+
+def summarize(trades: Dict[str, np.ndarray]) -> Dict:
+    """Aggregate statistics over resolved trades (overall and per trade type)"""
+    def stats(mask):
+        closed = mask & np.isin(trades['exit_reason'], (TARGET, STOP, HORIZON, OPEN))
+        pnl = trades['pnl'][closed]
+        returns = trades['return_pct'][closed]
+        wins = pnl > 0
+        gains = pnl[wins].sum()
+        losses = -pnl[pnl < 0].sum()
+        order = np.argsort(trades['exit_date'][closed], kind='stable')
+        equity = np.cumsum(pnl[order])
+        drawdown = (np.maximum.accumulate(np.concatenate([[0.0], equity])) - np.concatenate([[0.0], equity])).max() \
+            if len(equity) else 0.0
+        reasons = trades['exit_reason'][closed]
+        return {
+            'trades': int(mask.sum()),
+            'resolved': int(closed.sum()),
+            'win_rate': float(wins.mean()) if len(pnl) else 0.0,
+            'total_pnl': float(pnl.sum()),
+            'average_pnl': float(pnl.mean()) if len(pnl) else 0.0,
+            'average_return_pct': float(returns.mean()) if len(returns) else 0.0,
+            'profit_factor': float(gains / losses) if losses > 0 else (float('inf') if gains > 0 else 0.0),
+            'max_drawdown': float(drawdown),
+            'average_bars_held': float(trades['bars_held'][closed].mean()) if len(pnl) else 0.0,
+            'target_rate': float((reasons == TARGET).mean()) if len(pnl) else 0.0,
+            'stop_rate': float((reasons == STOP).mean()) if len(pnl) else 0.0,
+            'horizon_rate': float((reasons == HORIZON).mean()) if len(pnl) else 0.0,
+        }
+
+    everything = np.ones(len(trades['exit_reason']), dtype=bool)
+    summary = stats(everything)
+    summary['skipped'] = {reason: int((trades['exit_reason'] == code).sum())
+                          for code, reason in enumerate(EXIT_REASONS) if code in (NO_DATA, UNSUPPORTED)}
+    summary['by_trade_type'] = {
+        TRADE_TYPES[code].value: stats(trades['trade_type'] == code)
+        for code in np.unique(trades['trade_type'])
+    }
+    return summary
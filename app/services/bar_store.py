@@ -0,0 +1,198 @@
+"""
+Historical Bar Store
+Memory-mapped columnar OHLCV storage with a per-ticker date index
+"""
+
+import os
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from indicators import BACKFILL_BLOCK, compute_indicators
+
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+# Raw little-endian column files: appends are plain writes, row count is size / 8
+FIELD_DTYPE = np.dtype('<f8')
+DATE_DTYPE = np.dtype('<i8')    # days since 1970-01-01, viewed as datetime64[D]
+DATE_FILE = 'date.i8'
+
+# Tickers whose memory maps are kept open (each mapped column holds a descriptor)
+MAX_OPEN_TICKERS = 128
+
+DEFAULT_ROOT = os.environ.get(
+    'SCANNER_BAR_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'bars')
+)
+
+def _field_file(field: str) -> str:
+    return f'{field}.f8'
+
+def _to_days(dates) -> np.ndarray:
+    """Dates (strings, datetime64, date objects) as int64 day numbers"""
+    return np.asarray(dates, dtype='datetime64[D]').astype(DATE_DTYPE)
+
+class BarStore:
+    """One directory per ticker holding a date index plus one file per OHLCV field.
+
+    Reads return zero-copy slices of read-only memory maps; appends only ever
+    write to the end of each file. The date file is written last and defines the
+    committed row count, so an interrupted append is trimmed on the next write.
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT, max_open: int = MAX_OPEN_TICKERS):
+        self.root = os.path.normpath(root)
+        self.max_open = max_open
+        self._maps = OrderedDict()
+
+    def _ticker_dir(self, ticker: str) -> str:
+        return os.path.join(self.root, ticker.upper().replace(os.sep, '_'))
+
+    def tickers(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, name, DATE_FILE)))
+
+    def __contains__(self, ticker: str) -> bool:
+        return os.path.exists(os.path.join(self._ticker_dir(ticker), DATE_FILE))
+
+    def __len__(self) -> int:
+        return len(self.tickers())
+
+    def length(self, ticker: str) -> int:
+        """Committed bar count for a ticker (0 if unknown)"""
+        path = os.path.join(self._ticker_dir(ticker), DATE_FILE)
+        return os.path.getsize(path) // DATE_DTYPE.itemsize if os.path.exists(path) else 0
+
+    def _columns(self, ticker: str, fields: Sequence[str] = BAR_FIELDS) -> Dict[str, np.ndarray]:
+        """Memory maps for the requested columns, opened lazily and reopened only
+        when the ticker has grown. Each map holds a file descriptor, so at most
+        ``max_open`` tickers stay mapped (least recently used are dropped; views
+        already handed out keep their mapping alive).
+        """
+        rows = self.length(ticker)
+        if not rows:
+            return {}
+        cached = self._maps.get(ticker)
+        if cached is None or cached[0] != rows:
+            cached = self._maps[ticker] = (rows, {})
+            while len(self._maps) > self.max_open:
+                self._maps.popitem(last=False)
+        else:
+            self._maps.move_to_end(ticker)
+
+        columns = cached[1]
+        directory = self._ticker_dir(ticker)
+        if 'date' not in columns:
+            columns['date'] = np.memmap(os.path.join(directory, DATE_FILE), dtype=DATE_DTYPE,
+                                        mode='r', shape=(rows,)).view('datetime64[D]')
+        for field in fields:
+            if field not in columns:
+                columns[field] = np.memmap(os.path.join(directory, _field_file(field)), dtype=FIELD_DTYPE,
+                                           mode='r', shape=(rows,))
+        return columns
+
+    def dates(self, ticker: str) -> np.ndarray:
+        return self._columns(ticker, ()).get('date', np.empty(0, dtype='datetime64[D]'))
+
+    def read(self, ticker: str, start=None, end=None,
+             fields: Sequence[str] = BAR_FIELDS) -> Dict[str, np.ndarray]:
+        """Bars with ``start <= date <= end`` as zero-copy views (``date`` included)"""
+        columns = self._columns(ticker, fields)
+        if not columns:
+            return {'date': np.empty(0, dtype='datetime64[D]'),
+                    **{field: np.empty(0, dtype=FIELD_DTYPE) for field in fields}}
+
+        rows = self._date_slice(columns['date'], start, end)
+        return {'date': columns['date'][rows], **{field: columns[field][rows] for field in fields}}
+
+    @staticmethod
+    def _date_slice(dates: np.ndarray, start, end) -> slice:
+        lo = 0 if start is None else int(np.searchsorted(dates, np.datetime64(start, 'D'), side='left'))
+        hi = len(dates) if end is None else int(np.searchsorted(dates, np.datetime64(end, 'D'), side='right'))
+        return slice(lo, hi)
+
+    def append(self, ticker: str, dates, open_price, high, low, close, volume) -> int:
+        """Append bars newer than the last stored date; returns the number written.
+
+        Dates must be strictly increasing. Bars at or before the last stored date
+        are skipped, so re-ingesting an overlapping window is harmless.
+        """
+        days = _to_days(dates)
+        values = {field: np.asarray(column, dtype=FIELD_DTYPE)
+                  for field, column in zip(BAR_FIELDS, (open_price, high, low, close, volume))}
+        if any(len(column) != len(days) for column in values.values()):
+            raise ValueError(f"{ticker}: every field needs one value per date")
+        if len(days) > 1 and np.any(np.diff(days) <= 0):
+            raise ValueError(f"{ticker}: bar dates must be strictly increasing")
+
+        directory = self._ticker_dir(ticker)
+        os.makedirs(directory, exist_ok=True)
+        rows = self.length(ticker)
+        if rows:
+            last = np.memmap(os.path.join(directory, DATE_FILE), dtype=DATE_DTYPE, mode='r',
+                             offset=(rows - 1) * DATE_DTYPE.itemsize, shape=(1,))[0]
+            fresh = days > last
+            days = days[fresh]
+            values = {field: column[fresh] for field, column in values.items()}
+        if not len(days):
+            return 0
+
+        committed = rows * FIELD_DTYPE.itemsize
+        for field, column in values.items():
+            path = os.path.join(directory, _field_file(field))
+            # Drop any tail left by an append that died before committing its dates
+            if os.path.exists(path) and os.path.getsize(path) != committed:
+                os.truncate(path, committed)
+            with open(path, 'ab') as f:
+                f.write(column.tobytes())
+        with open(os.path.join(directory, DATE_FILE), 'ab') as f:
+            f.write(days.tobytes())
+        return len(days)
+
+    def append_bars(self, ticker: str, bars: Sequence[Dict]) -> int:
+        """Append Polygon-style aggregate dicts (``t`` ms timestamp, ``o/h/l/c/v``)"""
+        if not bars:
+            return 0
+        dates = np.asarray([bar['t'] for bar in bars], dtype='datetime64[ms]')
+        return self.append(ticker, dates, *([bar[key] for bar in bars] for key in ('o', 'h', 'l', 'c', 'v')))
+
+    def panel(self, tickers: Sequence[str], start=None, end=None,
+              fields: Sequence[str] = BAR_FIELDS) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        """Stack tickers that share one date index into ``(bars, tickers)`` arrays"""
+        slices = [self.read(ticker, start, end, fields) for ticker in tickers]
+        dates = slices[0]['date'] if slices else np.empty(0, dtype='datetime64[D]')
+        for ticker, bars in zip(tickers, slices):
+            if not np.array_equal(bars['date'], dates):
+                raise ValueError(f"{ticker}: date index differs from {tickers[0]}")
+        return np.array(dates), {field: np.stack([bars[field] for bars in slices], axis=1) if slices
+                                 else np.empty((0, 0)) for field in fields}
+
+    def calendar_groups(self, tickers: Sequence[str], start=None, end=None) -> List[List[str]]:
+        """Partition tickers by identical date index over the window (listing dates, halts)"""
+        groups = {}
+        for ticker in tickers:
+            dates = self.read(ticker, start, end, fields=())['date']
+            key = (len(dates), dates[0] if len(dates) else None, dates[-1] if len(dates) else None,
+                   hash(dates.tobytes()))
+            groups.setdefault(key, []).append(ticker)
+        return list(groups.values())
+
+    def backfill_indicators(self, tickers: Optional[Sequence[str]] = None, start=None, end=None,
+                            block: int = BACKFILL_BLOCK
+                            ) -> Iterator[Tuple[List[str], np.ndarray, Dict[str, np.ndarray]]]:
+        """Yield ``(tickers, dates, indicators)`` blocks for the whole store.
+
+        Tickers sharing a calendar are stacked ``block`` at a time and run through
+        the vectorized indicator engine, so the work per block is a few large
+        array passes over data streamed from the memory maps.
+        """
+        tickers = self.tickers() if tickers is None else list(tickers)
+        for group in self.calendar_groups(tickers, start, end):
+            for i in range(0, len(group), block):
+                chunk = group[i:i + block]
+                dates, bars = self.panel(chunk, start, end, ('high', 'low', 'close', 'volume'))
+                if not len(dates):
+                    continue
+                yield chunk, dates, compute_indicators(bars['high'], bars['low'], bars['close'], bars['volume'])
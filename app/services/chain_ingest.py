@@ -0,0 +1,305 @@
+"""
+Option Chain Ingestion
+Streaming parse of option-chain snapshot files into typed columnar blocks and chain features
+"""
+
+import json
+import numpy as np
+from datetime import date
+from typing import Dict, Iterator, Optional
+
+from exposure import dealer_exposure
+from metrics import metrics
+from options_pricing import black_scholes_chain, iv_rank_percentile
+
+# Column name -> dtype of an ingested chain; NaN marks a missing quote or Greek
+CHAIN_COLUMNS = {
+    'strike': np.float64,
+    'expiry_days': np.int16,        # calendar days from the as-of date, negative once expired
+    'is_call': np.bool_,
+    'bid': np.float64,
+    'ask': np.float64,
+    'volume': np.float64,
+    'open_interest': np.float64,
+    'iv': np.float64,               # decimal
+    'delta': np.float64,
+    'gamma': np.float64,
+    'underlying_price': np.float64,
+}
+
+# Contracts per yielded block; bounds the per-row Python lists the parser fills
+CHAIN_BLOCK = 16384
+# Characters read per refill of the parse buffer
+READ_CHUNK = 1 << 20
+# Expiries closer than this are skipped when picking the ATM IV
+ATM_MIN_DAYS = 7
+# Live contracts held while no underlying price is known; later ones go unpriced
+PENDING_LIMIT = CHAIN_BLOCK
+
+_WHITESPACE = ' \t\r\n'
+_DELIMITERS = _WHITESPACE + ',:]}'
+_EMPTY = {}
+
+class _Reader:
+    """Sliding text buffer over a file that decodes one JSON value at a time"""
+
+    def __init__(self, handle, chunk: int = READ_CHUNK):
+        self.handle = handle
+        self.chunk = chunk
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        text = self.handle.read(self.chunk)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        self.eof = not text
+        return bool(text)
+
+    def peek(self, skip: str = _WHITESPACE) -> str:
+        """Next character that is not in ``skip`` ('' at end of file)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in skip:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at {self.buffer[self.pos:self.pos + 20]!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the value at the cursor, reading more until it is complete"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # A number cut at the buffer edge still decodes ('1.' of '1.25'); a complete
+                # value is always followed by a delimiter
+                if self.eof or (end < len(self.buffer) and self.buffer[end] in _DELIMITERS):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
+def iter_contracts(path: str, chunk: int = READ_CHUNK) -> Iterator[Dict]:
+    """Yield contract records from a snapshot file one at a time.
+
+    Accepts a snapshot page (``{"results": [...], ...}``), a bare array of
+    contracts, or NDJSON with one page or contract per line. Only one contract
+    (plus the read buffer) is held in memory at a time; top-level objects
+    without a ``results`` array are treated as contracts.
+    """
+    with open(path, 'r', encoding='utf-8') as handle:
+        reader = _Reader(handle, chunk)
+        while True:
+            char = reader.peek(_WHITESPACE + ',')
+            if not char:
+                return
+            if char == '[':
+                yield from _iter_array(reader)
+            elif char == '{':
+                reader.pos += 1
+                record, paged = {}, False
+                while reader.peek(_WHITESPACE + ',') != '}':
+                    key = reader.value()
+                    reader.expect(':')
+                    if key == 'results' and reader.peek() == '[':
+                        paged = True
+                        yield from _iter_array(reader)
+                    else:
+                        record[key] = reader.value()
+                reader.pos += 1
+                if not paged:
+                    yield record
+            else:
+                raise ValueError(f"unexpected {char!r} in option chain snapshot")
+
+def _iter_array(reader: _Reader) -> Iterator:
+    reader.expect('[')
+    while reader.peek(_WHITESPACE + ',') != ']':
+        yield reader.value()
+    reader.pos += 1
+
+def iter_chain_blocks(path: str, as_of: Optional[date] = None,
+                      block_rows: int = CHAIN_BLOCK) -> Iterator[Dict[str, np.ndarray]]:
+    """Stream a snapshot file as blocks of at most ``block_rows`` contracts in CHAIN_COLUMNS.
+
+    Polygon-style nested records (``details``/``last_quote``/``day``/``greeks``/
+    ``underlying_asset``) are read, with flat ``strike``/``expiration_date``/
+    ``type`` fields as a fallback. ``expiry_days`` counts from ``as_of`` (today).
+    """
+    as_of = np.datetime64(as_of or date.today(), 'D')
+    rows = {name: [] for name in CHAIN_COLUMNS if name != 'expiry_days'}
+    expirations = []
+
+    def flush() -> Dict[str, np.ndarray]:
+        # Missing fields were appended as None, which NumPy reads as NaN
+        block = {name: np.array(values, dtype=CHAIN_COLUMNS[name]) for name, values in rows.items()}
+        days = np.array(expirations, dtype='datetime64[D]') - as_of
+        block['expiry_days'] = np.clip(days.astype(np.int64), -32768, 32767).astype(CHAIN_COLUMNS['expiry_days'])
+        for values in rows.values():
+            values.clear()
+        expirations.clear()
+        metrics.record_batch('chain.ingest', len(block['strike']))
+        return {name: block[name] for name in CHAIN_COLUMNS}
+
+    strike, is_call, bid, ask, volume, open_interest, iv, delta, gamma, underlying = (
+        rows[name].append for name in ('strike', 'is_call', 'bid', 'ask', 'volume', 'open_interest', 'iv',
+                                       'delta', 'gamma', 'underlying_price'))
+    expiration = expirations.append
+    for record in iter_contracts(path):
+        details = record.get('details') or record
+        quote = record.get('last_quote') or record
+        greeks = record.get('greeks') or _EMPTY
+        strike(details.get('strike_price', details.get('strike')))
+        is_call(str(details.get('contract_type', details.get('type', ''))).lower().startswith('c'))
+        bid(quote.get('bid'))
+        ask(quote.get('ask'))
+        volume((record.get('day') or record).get('volume'))
+        open_interest(record.get('open_interest'))
+        iv(record.get('implied_volatility'))
+        delta(greeks.get('delta'))
+        gamma(greeks.get('gamma'))
+        underlying((record.get('underlying_asset') or _EMPTY).get('price'))
+        expiration(details.get('expiration_date', 'NaT'))
+        if len(expirations) >= block_rows:
+            yield flush()
+    if expirations:
+        yield flush()
+
+@metrics.timed('chain.read')
+def read_chain(path: str, as_of: Optional[date] = None) -> Dict[str, np.ndarray]:
+    """Whole snapshot file as one set of CHAIN_COLUMNS arrays"""
+    blocks = list(iter_chain_blocks(path, as_of))
+    if not blocks:
+        return {name: np.zeros(0, dtype=dtype) for name, dtype in CHAIN_COLUMNS.items()}
+    return {name: np.concatenate([block[name] for block in blocks]) for name in CHAIN_COLUMNS}
+
+def as_options_chain(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Quoted contracts in the ``strike``/``expiry_days``/``is_call``/``price`` (mid) format
+    used for ``market_data['options_chain']``"""
+    mid = (columns['bid'] + columns['ask']) / 2
+    quoted = np.isfinite(mid) & (mid > 0) & (columns['expiry_days'] > 0)
+    return {
+        'strike': columns['strike'][quoted],
+        'expiry_days': columns['expiry_days'][quoted].astype(float),
+        'is_call': columns['is_call'][quoted],
+        'price': mid[quoted],
+    }
+
+class ChainFeatureAccumulator:
+    """Running put/call volume, dealer gamma/delta exposure and ATM IV over chain blocks.
+
+    Blocks are folded in one at a time, so features of an arbitrarily large
+    snapshot need only one block in memory. Greeks missing from a block are
+    priced from its IVs. ``spot`` defaults to the snapshot's underlying price;
+    volume and open interest are counted from the first block, but contracts
+    read before any block carries that price are held back from exposure and
+    ATM IV until one does, up to PENDING_LIMIT of them. Contracts past that
+    limit are counted in ``unpriced``, and while any contract is unpriced the
+    exposure totals are left out of ``features`` rather than reported short.
+    Pass ``spot`` for snapshots whose records carry no underlying price.
+    """
+
+    def __init__(self, spot: Optional[float] = None):
+        self.spot = spot
+        self.volume = np.zeros(2)           # calls, puts
+        self.open_interest = np.zeros(2)
+        self.gamma_exposure = 0.0
+        self.delta_exposure = 0.0
+        self.atm = {}                       # expiry_days -> (distance, iv sum, quotes)
+        self.pending = []                   # live contracts seen before the spot was known
+        self.pending_rows = 0
+        self.unpriced = 0                   # live contracts dropped for want of a spot
+
+    def add(self, block: Dict[str, np.ndarray]):
+        live = block['expiry_days'] > 0
+        contracts = {name: block[name][live] for name in ('strike', 'expiry_days', 'is_call', 'iv', 'delta', 'gamma')}
+        side = np.where(contracts['is_call'], 0, 1)
+        self.volume += np.bincount(side, np.nan_to_num(block['volume'][live]), minlength=2)
+        contracts['open_interest'] = np.nan_to_num(block['open_interest'][live])
+        self.open_interest += np.bincount(side, contracts['open_interest'], minlength=2)
+
+        if self.spot is None:
+            prices = block['underlying_price'][np.isfinite(block['underlying_price'])]
+            if not len(prices):
+                # Exposure and ATM IV need a spot; hold these contracts until a block brings one
+                rows = len(contracts['strike'])
+                if self.pending_rows + rows <= PENDING_LIMIT:
+                    self.pending.append(contracts)
+                    self.pending_rows += rows
+                else:
+                    self.unpriced += rows
+                return
+            self.spot = float(prices[0])
+        for held in self.pending:
+            self._price(held)
+        self.pending.clear()
+        self.pending_rows = 0
+        self._price(contracts)
+
+    def _price(self, contracts: Dict[str, np.ndarray]):
+        """Fold live contracts into the exposure totals and ATM IVs at ``self.spot``"""
+        spot = self.spot
+        strike, days, is_call, iv = (contracts[name] for name in ('strike', 'expiry_days', 'is_call', 'iv'))
+        delta, gamma = contracts['delta'], contracts['gamma']
+        missing = np.flatnonzero((np.isnan(delta) | np.isnan(gamma)) & (iv > 0))
+        if len(missing):
+            priced = black_scholes_chain(spot, strike[missing], days[missing], iv[missing], is_call[missing])
+            delta, gamma = delta.copy(), gamma.copy()
+            delta[missing], gamma[missing] = priced['delta'], priced['gamma']
+        gex, dex = dealer_exposure(spot, is_call, gamma, delta, contracts['open_interest'])
+        self.gamma_exposure += float(np.nansum(gex))
+        self.delta_exposure += float(np.nansum(dex))
+
+        # Nearest-the-money IV per expiry, averaged over its call and put
+        quoted = np.flatnonzero(iv > 0)
+        distance = np.abs(strike[quoted] - spot)
+        for expiry in np.unique(days[quoted]):
+            rows = days[quoted] == expiry
+            nearest = distance[rows].min()
+            at = rows & (distance == nearest)
+            best = self.atm.get(int(expiry), (np.inf, 0.0, 0))
+            if nearest < best[0]:
+                self.atm[int(expiry)] = (nearest, float(iv[quoted][at].sum()), int(at.sum()))
+            elif nearest == best[0]:
+                self.atm[int(expiry)] = (nearest, best[1] + float(iv[quoted][at].sum()), best[2] + int(at.sum()))
+
+    def features(self, iv_history=None) -> Dict[str, float]:
+        """Features in the ``calculate_options_features`` vocabulary (IV in percent)"""
+        features = {}
+        unpriced = self.unpriced + self.pending_rows
+        if unpriced:
+            print(f"Error in chain features: {unpriced} contracts have no underlying price to value them at; "
+                  f"pass spot for exposure and ATM IV")
+            metrics.record_error('chain.features')
+        else:
+            features.update({'gamma_exposure': self.gamma_exposure, 'delta_exposure': self.delta_exposure})
+        calls, puts = self.volume if self.volume.sum() > 0 else self.open_interest
+        if calls > 0:
+            features['put_call_ratio'] = float(puts / calls)
+        expiries = sorted(self.atm)
+        if expiries:
+            expiry = next((days for days in expiries if days >= ATM_MIN_DAYS), expiries[-1])
+            _, total, count = self.atm[expiry]
+            features['implied_volatility'] = total / count * 100
+            if iv_history is not None:
+                features.update(iv_rank_percentile(features['implied_volatility'], iv_history))
+        return features
+
+@metrics.timed('chain.features')
+def snapshot_features(path: str, spot: Optional[float] = None, iv_history=None,
+                      as_of: Optional[date] = None) -> Dict[str, float]:
+    """Real options features for one snapshot file, streamed block by block"""
+    accumulator = ChainFeatureAccumulator(spot)
+    for block in iter_chain_blocks(path, as_of):
+        accumulator.add(block)
+    return accumulator.features(iv_history)
@@ -0,0 +1,178 @@
+"""
+Dealer Exposure
+Gamma/delta exposure (GEX/DEX) profiles by strike and expiry with in-place contract updates
+"""
+
+import math
+import numpy as np
+from typing import Dict, Optional
+
+from metrics import metrics
+from options_pricing import (
+    DAYS_PER_YEAR, MIN_TIME, MIN_VOL, RISK_FREE_RATE, black_scholes_chain, implied_volatility
+)
+
+SHARES_PER_CONTRACT = 100
+# Spot levels searched for the gamma flip, as a fraction either side of spot
+FLIP_RANGE = 0.20
+FLIP_LEVELS = 81
+# Contracts repriced per pass of the flip search (bounds the levels x contracts matrices)
+FLIP_BLOCK = 2048
+
+def dealer_exposure(spot, is_call, gamma, delta, open_interest):
+    """Per-contract dealer GEX (dollars per 1% move) and DEX (dollars per $1 of underlying).
+
+    Dealers are assumed long the calls and short the puts the public trades,
+    so call gamma counts positive and put gamma negative.
+    """
+    shares = np.asarray(open_interest, dtype=float) * SHARES_PER_CONTRACT
+    gex = np.where(is_call, 1.0, -1.0) * gamma * shares * (spot * spot * 0.01)
+    dex = delta * shares * spot
+    return gex, dex
+
+def _greeks(spot: float, strike: float, expiry_days: float, iv: float, is_call: bool, rate: float):
+    """Scalar Black-Scholes delta and gamma, matching ``black_scholes_chain``"""
+    t = max(expiry_days / DAYS_PER_YEAR, MIN_TIME)
+    sigma_sqrt_t = max(iv, MIN_VOL) * math.sqrt(t)
+    d1 = (math.log(spot / strike) + (rate + 0.5 * max(iv, MIN_VOL) ** 2) * t) / sigma_sqrt_t
+    cdf = 0.5 * math.erfc(-d1 / math.sqrt(2))
+    gamma = math.exp(-0.5 * d1 * d1) / math.sqrt(2 * math.pi) / (spot * sigma_sqrt_t)
+    return (cdf if is_call else cdf - 1.0), gamma
+
+class ExposureProfile:
+    """GEX/DEX of one underlying's chain, totalled per strike, per expiry and overall.
+
+    Every contract's contribution is kept, so ``update`` applies a new IV,
+    quote or open interest by adding the change to its strike, expiry and
+    overall totals instead of re-summing the chain. A move in ``spot`` changes
+    every contract and goes through ``set_spot``. Expired contracts and
+    contracts without an IV contribute nothing. ``version`` counts changes,
+    so caches can tell an updated profile from the one they saw.
+    """
+
+    def __init__(self, spot: float, strike, expiry_days, is_call, open_interest, iv,
+                 rate: float = RISK_FREE_RATE):
+        self.spot = float(spot)
+        self.rate = rate
+        self.strike = np.asarray(strike, dtype=float)
+        self.expiry_days = np.asarray(expiry_days, dtype=float)
+        self.is_call = np.asarray(is_call, dtype=bool)
+        self.open_interest = np.asarray(open_interest, dtype=float).copy()
+        self.iv = np.asarray(iv, dtype=float).copy()
+
+        self.strikes, self.strike_index = np.unique(self.strike, return_inverse=True)
+        self.expiries, self.expiry_index = np.unique(self.expiry_days, return_inverse=True)
+        self._contracts = {key: row for row, key in enumerate(zip(self.strike.tolist(), self.expiry_days.tolist(),
+                                                                  self.is_call.tolist()))}
+        self.version = 0
+        self.set_spot(spot)
+
+    def _live(self) -> np.ndarray:
+        # Zero open interest still gets Greeks, so a later ``update`` of it takes effect
+        return (self.expiry_days > 0) & (self.iv > 0)
+
+    def set_spot(self, spot: float):
+        """Reprice every contract at a new spot and rebuild all totals"""
+        metrics.record_batch('exposure.profile', len(self.strike))
+        self.version += 1
+        self.spot = float(spot)
+        self.delta = np.zeros(len(self.strike))
+        self.gamma = np.zeros(len(self.strike))
+        live = np.flatnonzero(self._live())
+        if len(live):
+            priced = black_scholes_chain(self.spot, self.strike[live], self.expiry_days[live], self.iv[live],
+                                         self.is_call[live], self.rate)
+            self.delta[live], self.gamma[live] = priced['delta'], priced['gamma']
+        self.gex, self.dex = dealer_exposure(self.spot, self.is_call, self.gamma, self.delta, self.open_interest)
+        self.refresh()
+
+    def refresh(self):
+        """Re-sum the totals from the per-contract contributions (clears update drift)"""
+        self.gex_by_strike = np.bincount(self.strike_index, self.gex, minlength=len(self.strikes))
+        self.dex_by_strike = np.bincount(self.strike_index, self.dex, minlength=len(self.strikes))
+        self.gex_by_expiry = np.bincount(self.expiry_index, self.gex, minlength=len(self.expiries))
+        self.dex_by_expiry = np.bincount(self.expiry_index, self.dex, minlength=len(self.expiries))
+        self.total_gex = float(self.gex.sum())
+        self.total_dex = float(self.dex.sum())
+
+    def contract(self, strike: float, expiry_days: float, is_call: bool) -> int:
+        """Row of a contract, for ``update``"""
+        return self._contracts[(float(strike), float(expiry_days), bool(is_call))]
+
+    def update(self, row: int, open_interest: Optional[float] = None, iv: Optional[float] = None,
+               price: Optional[float] = None):
+        """Apply a new open interest, IV (decimal) or premium quote to one contract.
+
+        A ``price`` is inverted to an IV first, which costs a solver call; the IV
+        and open-interest paths only touch this contract's contribution.
+        """
+        if price is not None:
+            solved = implied_volatility(price, self.spot, self.strike[row], self.expiry_days[row],
+                                        self.is_call[row], self.rate)
+            iv = float(solved['iv']) if solved['converged'] else np.nan
+        self.version += 1
+        if open_interest is not None:
+            self.open_interest[row] = open_interest
+        if iv is not None:
+            self.iv[row] = iv
+            if self.expiry_days[row] > 0 and iv > 0:
+                self.delta[row], self.gamma[row] = _greeks(self.spot, self.strike[row], self.expiry_days[row],
+                                                           iv, self.is_call[row], self.rate)
+            else:
+                self.delta[row] = self.gamma[row] = 0.0
+
+        shares = max(self.open_interest[row], 0.0) * SHARES_PER_CONTRACT
+        gex = (1.0 if self.is_call[row] else -1.0) * self.gamma[row] * shares * self.spot * self.spot * 0.01
+        dex = self.delta[row] * shares * self.spot
+        gex_change, dex_change = gex - self.gex[row], dex - self.dex[row]
+        self.gex[row], self.dex[row] = gex, dex
+        strike, expiry = self.strike_index[row], self.expiry_index[row]
+        self.gex_by_strike[strike] += gex_change
+        self.dex_by_strike[strike] += dex_change
+        self.gex_by_expiry[expiry] += gex_change
+        self.dex_by_expiry[expiry] += dex_change
+        self.total_gex += gex_change
+        self.total_dex += dex_change
+
+    def gamma_flip(self, levels: int = FLIP_LEVELS, width: float = FLIP_RANGE) -> float:
+        """Spot level nearest the current spot where total GEX changes sign (NaN if none in range)"""
+        spots = self.spot * np.linspace(1 - width, 1 + width, levels)
+        log_spots = np.log(spots)[:, None]
+        live = np.flatnonzero(self._live())
+        total = np.zeros(levels)
+        for start in range(0, len(live), FLIP_BLOCK):
+            rows = live[start:start + FLIP_BLOCK]
+            # Gamma only, built in place on one levels x contracts buffer
+            t = np.maximum(self.expiry_days[rows] / DAYS_PER_YEAR, MIN_TIME)
+            sigma_sqrt_t = np.maximum(self.iv[rows], MIN_VOL) * np.sqrt(t)
+            offset = (self.rate + 0.5 * np.maximum(self.iv[rows], MIN_VOL) ** 2) * t - np.log(self.strike[rows])
+            d1 = log_spots + offset
+            d1 /= sigma_sqrt_t
+            np.square(d1, out=d1)
+            d1 *= -0.5
+            np.exp(d1, out=d1)
+            weight = np.where(self.is_call[rows], 1.0, -1.0) * self.open_interest[rows] / sigma_sqrt_t
+            total += d1 @ weight
+        total *= SHARES_PER_CONTRACT * spots * 0.01 / math.sqrt(2 * math.pi)
+
+        crossings = np.flatnonzero(np.sign(total[:-1]) * np.sign(total[1:]) < 0)
+        if not len(crossings):
+            return float('nan')
+        low = crossings[np.argmin(np.abs(spots[crossings] - self.spot))]
+        # Linear interpolation between the bracketing levels
+        weight = total[low] / (total[low] - total[low + 1])
+        return float(spots[low] + weight * (spots[low + 1] - spots[low]))
+
+    def features(self) -> Dict[str, float]:
+        """Totals in the ``calculate_options_features`` vocabulary"""
+        return {'gamma_exposure': self.total_gex, 'delta_exposure': self.total_dex}
+
+    @classmethod
+    def from_chain(cls, columns: Dict[str, np.ndarray], spot: Optional[float] = None,
+                   rate: float = RISK_FREE_RATE) -> 'ExposureProfile':
+        """Profile of an ingested chain (``chain_ingest.CHAIN_COLUMNS`` arrays)"""
+        if spot is None:
+            prices = columns['underlying_price'][np.isfinite(columns['underlying_price'])]
+            spot = float(prices[0])
+        return cls(spot, columns['strike'], columns['expiry_days'], columns['is_call'],
+                   np.nan_to_num(columns['open_interest']), columns['iv'], rate)
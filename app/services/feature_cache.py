@@ -0,0 +1,103 @@
+"""
+Feature Cache
+Bounded LRU cache with per-group TTLs for engineered features
+"""
+
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Seconds a cached feature group stays valid; options inputs move slower than ticks
+DEFAULT_TTL = {
+    'technical': 60.0,
+    'options': 300.0,
+}
+
+# Width of the implicit bar used when market data carries no timestamp
+DEFAULT_BAR_SECONDS = 60
+
+def fingerprint(value: Any) -> Hashable:
+    """Hashable, order-independent summary of nested feature inputs"""
+    if isinstance(value, dict):
+        return tuple(sorted((key, fingerprint(item)) for key, item in value.items()))
+    if isinstance(value, np.ndarray):
+        return (value.shape, value.dtype.str, hash(np.ascontiguousarray(value).tobytes()))
+    if isinstance(value, (list, tuple)):
+        return tuple(fingerprint(item) for item in value)
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        # NaN never equals itself, so a key holding one would never hit
+        return None
+    if hasattr(value, 'version'):
+        # Mutable inputs (e.g. an ExposureProfile) count their own changes
+        return (type(value).__name__, id(value), value.version)
+    return value
+
+class FeatureCache:
+    """LRU cache keyed by (group, ticker, bar timestamp, input hash).
+
+    Entries expire after the TTL of their feature group and the least recently
+    used entry is evicted once ``max_entries`` is reached. Hit, miss, expiry and
+    eviction counters are kept for monitoring.
+    """
+
+    def __init__(self, max_entries: int = 20000, ttl: Optional[Dict[str, float]] = None,
+                 bar_seconds: int = DEFAULT_BAR_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = {**DEFAULT_TTL, **(ttl or {})}
+        self.bar_seconds = bar_seconds
+        self.clock = clock
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def bar_timestamp(self, market_data: Dict) -> Any:
+        """Bar identifier from the snapshot, or the current wall-clock bar"""
+        timestamp = market_data.get('timestamp') if market_data else None
+        if timestamp is not None:
+            return timestamp
+        return int(time.time() // self.bar_seconds)
+
+    def get_or_compute(self, group: str, ticker: str, bar_timestamp: Any, inputs: Any,
+                       compute: Callable[[], Dict]) -> Dict:
+        """Return cached features for the key, computing and storing them on a miss"""
+        key = (group, ticker, bar_timestamp, hash(fingerprint(inputs)))
+        now = self.clock()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if now < expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return dict(value)
+            del self._entries[key]
+            self.expirations += 1
+
+        self.misses += 1
+        value = compute()
+        # Failed computations return {} and are not worth caching
+        if value and self.max_entries > 0:
+            self._entries[key] = (now + self.ttl.get(group, 0.0), value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return dict(value)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict:
+        requests = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'size': len(self._entries),
+            'hit_rate': self.hits / requests if requests else 0.0,
+        }
@@ -0,0 +1,235 @@
+"""
+Incremental Recompute
+Universe refreshes that re-run analysis only for tickers whose inputs moved materially
+"""
+
+import time
+import numpy as np
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from metrics import metrics
+from ml_models import QuantumMLEngine, get_ml_engine
+from recommendation_engine import RecommendationBatch, RiskLevel, TradeRecommendationEngine, get_recommendation_engine
+
+# Relative change of an input column that marks its ticker dirty; the options columns
+# are read by analyze_batch (and IV by the option rules) when market data supplies them
+CHANGE_THRESHOLDS = {
+    'price': 0.005,
+    'high': 0.005,
+    'low': 0.005,
+    'volume': 0.25,
+    'implied_volatility': 0.05,
+    'put_call_ratio': 0.10,
+}
+# ...for columns not listed above (indicator columns, short data)
+DEFAULT_CHANGE_THRESHOLD = 0.05
+# Seconds a retained result is served before its ticker is recomputed regardless
+DEFAULT_MAX_AGE = 300.0
+# Short-data columns are tracked under this prefix, apart from market data columns
+SHORT_PREFIX = 'short.'
+
+def _input_columns(market_data, short_data=None) -> Dict[str, np.ndarray]:
+    """Market and short data (DataFrames or mappings of columns) as one set of float columns"""
+    columns = {}
+    for prefix, data in (('', market_data), (SHORT_PREFIX, short_data)):
+        if data is not None:
+            keys = data.columns if hasattr(data, 'columns') else data.keys()
+            columns.update({prefix + key: np.asarray(data[key], dtype=float) for key in keys})
+    return columns
+
+def _grow(tree: Any, capacity: int) -> Any:
+    """Extend every per-ticker array of a columnar result tree to ``capacity`` rows"""
+    if isinstance(tree, dict):
+        return {key: _grow(value, capacity) for key, value in tree.items()}
+    if isinstance(tree, np.ndarray) and tree.ndim:
+        return np.concatenate([tree, np.zeros(capacity - len(tree), dtype=tree.dtype)])
+    return tree
+
+def _scatter(tree: Any, rows: np.ndarray, values: Any, capacity: int) -> Any:
+    """Write ``values`` (a result tree for ``rows``) into ``tree``; scalars take the new value"""
+    if isinstance(values, dict):
+        tree = tree if isinstance(tree, dict) else {}
+        return {key: _scatter(tree.get(key), rows, value, capacity) for key, value in values.items()}
+    if isinstance(values, np.ndarray) and values.ndim:
+        if not isinstance(tree, np.ndarray) or not tree.ndim:
+            tree = np.zeros(capacity, dtype=values.dtype)
+        elif np.result_type(tree, values) != tree.dtype:
+            # e.g. a longer label than any retained so far
+            tree = tree.astype(np.result_type(tree, values))
+        tree[rows] = values
+        return tree
+    return values
+
+def _take(tree: Any, rows) -> Any:
+    """Copy of the given rows (an index array or a slice) of every per-ticker array"""
+    if isinstance(tree, dict):
+        return {key: _take(value, rows) for key, value in tree.items()}
+    if isinstance(tree, np.ndarray) and tree.ndim:
+        return tree[rows].copy() if isinstance(rows, slice) else tree[rows]
+    return tree
+
+class IncrementalScanner:
+    """Retains each ticker's last inputs, analysis and recommendations between refreshes.
+
+    ``refresh`` marks a ticker dirty when it is new, when any input column moved
+    by more than its CHANGE_THRESHOLDS fraction since the inputs its retained
+    result was computed from, or when that result is older than ``max_age``.
+    Only dirty tickers go through ``analyze_batch`` and
+    ``generate_recommendations_batch`` (as one batch); the rest are served from
+    the retained columns. A change in the set of input columns, or in the
+    sizing parameters, invalidates the retained analysis or recommendations.
+    """
+
+    def __init__(self, engine: Optional[QuantumMLEngine] = None,
+                 recommender: Optional[TradeRecommendationEngine] = None,
+                 thresholds: Optional[Dict[str, float]] = None, max_age: float = DEFAULT_MAX_AGE,
+                 clock: Callable[[], float] = time.monotonic):
+        self.engine = engine or get_ml_engine()
+        self.recommender = recommender or get_recommendation_engine()
+        self.thresholds = {**CHANGE_THRESHOLDS, **(thresholds or {})}
+        self.max_age = max_age
+        self.clock = clock
+        self.slots = {}
+        self.tickers = []
+        self.capacity = 0
+        self._request = ([], np.zeros(0, dtype=np.int64), np.zeros(0, dtype=str))
+        self.clear()
+
+    def clear(self):
+        """Drop every retained input and result"""
+        self.inputs = {}
+        self.computed_at = np.full(self.capacity, -np.inf)
+        self.analysis = None
+        self.recommendations = RecommendationBatch.empty()
+        self.recommended = np.zeros(self.capacity, dtype=bool)
+        self.recommend_key = None
+        self.refreshes = 0
+        self.recomputed = 0
+        self.served = 0
+
+    def invalidate(self, tickers: Optional[Sequence[str]] = None):
+        """Force the given tickers (all by default) to be recomputed on the next refresh"""
+        if tickers is None:
+            self.computed_at[:] = -np.inf
+        else:
+            self.computed_at[[self.slots[ticker] for ticker in tickers if ticker in self.slots]] = -np.inf
+
+    def _slots_for(self, tickers: list) -> Tuple[np.ndarray, np.ndarray]:
+        """State slot of every ticker, assigning slots (and growing the state) for new ones,
+        and the tickers as an array; a repeat of the previous universe reuses both"""
+        previous, slots, names = self._request
+        if tickers == previous:
+            return slots, names
+        for ticker in tickers:
+            if ticker not in self.slots:
+                self.slots[ticker] = len(self.tickers)
+                self.tickers.append(ticker)
+        if len(self.tickers) > self.capacity:
+            capacity = max(len(self.tickers), 2 * self.capacity)
+            extra = capacity - self.capacity
+            self.inputs = {name: np.r_[values, np.full(extra, np.nan)] for name, values in self.inputs.items()}
+            self.computed_at = np.r_[self.computed_at, np.full(extra, -np.inf)]
+            self.recommended = np.r_[self.recommended, np.zeros(extra, dtype=bool)]
+            self.analysis = _grow(self.analysis, capacity)
+            self.capacity = capacity
+        slots = np.fromiter((self.slots[ticker] for ticker in tickers), dtype=np.int64, count=len(tickers))
+        self._request = (tickers, slots, np.asarray(tickers))
+        return self._request[1:]
+
+    def dirty(self, slots: np.ndarray, columns: Dict[str, np.ndarray]) -> np.ndarray:
+        """Which of ``slots`` need recomputing for the new input ``columns``"""
+        dirty = self.clock() - self.computed_at[slots] >= self.max_age
+        for name, values in columns.items():
+            previous = self.inputs[name][slots]
+            threshold = self.thresholds.get(name.replace(SHORT_PREFIX, '', 1), DEFAULT_CHANGE_THRESHOLD)
+            with np.errstate(invalid='ignore'):
+                # NaN inputs compare False, so a ticker missing a value is recomputed
+                dirty |= ~(np.abs(values - previous) <= threshold * np.abs(previous))
+        return dirty
+
+    @metrics.timed('incremental.refresh')
+    def refresh(self, tickers: Sequence[str], market_data, short_data=None,
+                account_size: float = 100000, risk_level: RiskLevel = RiskLevel.MODERATE,
+                top_n: int = 5) -> Tuple[Dict, RecommendationBatch]:
+        """Analysis tree (as ``analyze_batch``) and recommendations (as ``generate_recommendations_batch``)
+        for ``tickers``, recomputing only the dirty ones"""
+        try:
+            tickers = list(tickers)
+            columns = _input_columns(market_data, short_data)
+            if set(columns) != set(self.inputs):
+                # New or dropped inputs change the shape of the analysis
+                self.clear()
+                self.inputs = {name: np.full(self.capacity, np.nan) for name in columns}
+            if (account_size, risk_level, top_n) != self.recommend_key:
+                self.recommendations = RecommendationBatch.empty()
+                self.recommended[:] = False
+                self.recommend_key = (account_size, risk_level, top_n)
+
+            slots, names = self._slots_for(tickers)
+            dirty = self.dirty(slots, columns)
+            rows = np.flatnonzero(dirty)
+            metrics.record_batch('incremental.dirty', len(rows))
+            self.refreshes += 1
+            self.recomputed += len(rows)
+            self.served += len(tickers) - len(rows)
+
+            if len(rows):
+                subset = {name: values[rows] for name, values in columns.items()}
+                market = {name: values for name, values in subset.items() if not name.startswith(SHORT_PREFIX)}
+                short = {name[len(SHORT_PREFIX):]: values for name, values in subset.items()
+                         if name.startswith(SHORT_PREFIX)} or None
+                analysis = self.engine.analyze_batch(names[rows], market, short)
+                if 'error' in analysis:
+                    raise RuntimeError(analysis['error'])
+                self.analysis = _scatter(self.analysis, slots[rows], analysis, self.capacity)
+                for name, values in subset.items():
+                    self.inputs[name][slots[rows]] = values
+                self.computed_at[slots[rows]] = self.clock()
+                self.recommended[slots[rows]] = False
+
+            stale = np.flatnonzero(~self.recommended[slots])
+            if len(stale):
+                stale_slots = slots[stale]
+                batch = self.recommender.generate_recommendations_batch(
+                    _take(self.analysis, stale_slots),
+                    {name: columns[name][stale] for name in ('price', 'implied_volatility') if name in columns},
+                    account_size, risk_level, top_n
+                )
+                batch.columns['ticker_index'] = stale_slots[batch.columns['ticker_index']]
+                retained = self.recommendations
+                keep = np.flatnonzero(~np.isin(retained.columns['ticker_index'], stale_slots))
+                self.recommendations = RecommendationBatch.concat((), [retained.take(keep), batch])
+                self.recommended[stale_slots] = True
+
+            # The universe in slot order (the usual case) is copied as one slice per column
+            ordered = len(slots) and slots[0] == 0 and slots[-1] == len(slots) - 1 and np.all(np.diff(slots) == 1)
+            analysis = _take(self.analysis, slice(0, len(slots)) if ordered else slots)
+            analysis['ticker'] = names
+            return analysis, self._recommendations_for(names, slots)
+
+        except Exception as e:
+            print(f"Error in incremental refresh: {e}")
+            metrics.record_error('incremental.refresh')
+            return {'ticker': np.asarray(tickers), 'error': str(e)}, RecommendationBatch.empty(tickers)
+
+    def _recommendations_for(self, tickers: np.ndarray, slots: np.ndarray) -> RecommendationBatch:
+        """Retained recommendations of ``slots``, indexed into ``tickers`` and grouped in its order"""
+        position = np.full(self.capacity, -1, dtype=np.int64)
+        position[slots] = np.arange(len(slots))
+        index = position[self.recommendations.columns['ticker_index']]
+        rows = np.flatnonzero(index >= 0)
+        rows = rows[np.argsort(index[rows], kind='stable')]
+        batch = self.recommendations.take(rows)
+        batch.tickers = tickers
+        batch.columns['ticker_index'] = index[rows].astype(batch.columns['ticker_index'].dtype)
+        return batch
+
+    def stats(self) -> Dict:
+        requested = self.recomputed + self.served
+        return {
+            'tickers': len(self.tickers),
+            'refreshes': self.refreshes,
+            'recomputed': self.recomputed,
+            'served': self.served,
+            'served_rate': self.served / requested if requested else 0.0,
+        }
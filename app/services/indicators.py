@@ -0,0 +1,411 @@
+"""
+Rolling Technical Indicator Engine
+Vectorized backfill from OHLCV arrays plus O(1) per-bar incremental updates
+"""
+
+import numpy as np
+from typing import Dict, Optional, Sequence
+
+MOMENTUM_PERIOD = 10
+RSI_PERIOD = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+BOLLINGER_PERIOD = 20
+BOLLINGER_WIDTH = 2.0
+STOCH_PERIOD = 14
+VWAP_PERIOD = 20
+MFI_PERIOD = 14
+OBV_PERIOD = 20
+
+# Tickers processed per column block during backfill; keeps temporaries cache-sized
+BACKFILL_BLOCK = 128
+
+INDICATOR_FEATURES = (
+    'price_momentum',
+    'rsi_14',
+    'macd_signal',
+    'bollinger_position',
+    'stoch_k',
+    'vwap_deviation',
+    'money_flow_index',
+    'on_balance_volume',
+)
+
+def _pad_front(values: np.ndarray, width: int, mode: str) -> np.ndarray:
+    """Pad the time axis (axis 0) with edge values or zeros"""
+    pad = [(width, 0)] + [(0, 0)] * (values.ndim - 1)
+    return np.pad(values, pad, mode='edge' if mode == 'edge' else 'constant')
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing-window sums (partial windows at the start) via a cumulative sum"""
+    totals = np.cumsum(values, axis=0)
+    totals[window:] = totals[window:] - totals[:-window]
+    return totals
+
+def _rolling_extreme(values: np.ndarray, window: int, func) -> np.ndarray:
+    """Trailing-window max/min, one shifted pass per window slot"""
+    padded = _pad_front(values, window - 1, 'edge')
+    out = values.copy()
+    for lag in range(1, window):
+        func(out, padded[window - 1 - lag:len(padded) - lag], out=out)
+    return out
+
+def _lagged(values: np.ndarray, lag: int, mode: str) -> np.ndarray:
+    """Value ``lag`` bars back, edge- or zero-filled before the first bar"""
+    return _pad_front(values, lag, mode)[:len(values)]
+
+def _ema(values: np.ndarray, span: int) -> np.ndarray:
+    """Exponential moving average seeded with the first observation"""
+    alpha = 2 / (span + 1)
+    out = np.empty_like(values)
+    out[0] = values[0]
+    for t in range(1, len(values)):
+        out[t] = out[t - 1] + alpha * (values[t] - out[t - 1])
+    return out
+
+def _wilder(values: np.ndarray, period: int) -> np.ndarray:
+    """Wilder smoothing seeded with the first change (bar 1)"""
+    out = np.zeros_like(values)
+    if len(values) > 1:
+        out[1] = values[1]
+        for t in range(2, len(values)):
+            out[t] = out[t - 1] + (values[t] - out[t - 1]) / period
+    return out
+
+def _rsi(avg_gain, avg_loss):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    rsi = np.where(avg_loss > 0, rsi, 100.0)
+    return np.where((avg_gain > 0) | (avg_loss > 0), rsi, 50.0)
+
+def _mfi(positive_flow, negative_flow):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mfi = 100 - 100 / (1 + positive_flow / negative_flow)
+    mfi = np.where(negative_flow > 0, mfi, 100.0)
+    return np.where((positive_flow > 0) | (negative_flow > 0), mfi, 50.0)
+
+def _bollinger_position(close, total, total_sq, count):
+    mean = total / count
+    std = np.sqrt(np.maximum(total_sq / count - mean * mean, 0))
+    lower = mean - BOLLINGER_WIDTH * std
+    with np.errstate(divide='ignore', invalid='ignore'):
+        position = (close - lower) / (2 * BOLLINGER_WIDTH * std)
+    return np.where(std > 0, np.clip(position, 0, 1), 0.5)
+
+def _stoch_k(close, highest, lowest):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stoch = 100 * (close - lowest) / (highest - lowest)
+    return np.where(highest > lowest, stoch, 50.0)
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, numerator / denominator, 0.0)
+
+def _compute(high, low, close, volume):
+    """Full-history indicator arrays plus the recursive state at the last bar"""
+    high, low, close, volume = (np.asarray(a, dtype=float) for a in (high, low, close, volume))
+    count = np.minimum(np.arange(1, len(close) + 1), BOLLINGER_PERIOD)
+    count = count.reshape((-1,) + (1,) * (close.ndim - 1))
+
+    typical = (high + low + close) / 3
+    money_flow = typical * volume
+
+    change = np.diff(close, axis=0, prepend=close[:1])
+    gains = np.maximum(change, 0)
+    losses = np.maximum(-change, 0)
+    avg_gain = _wilder(gains, RSI_PERIOD)
+    avg_loss = _wilder(losses, RSI_PERIOD)
+
+    ema_fast = _ema(close, MACD_FAST)
+    ema_slow = _ema(close, MACD_SLOW)
+    macd = ema_fast - ema_slow
+    macd_signal = _ema(macd, MACD_SIGNAL)
+
+    typical_change = np.diff(typical, axis=0, prepend=typical[:1])
+    positive_flow = np.where(typical_change > 0, money_flow, 0.0)
+    negative_flow = np.where(typical_change < 0, money_flow, 0.0)
+
+    obv = np.cumsum(np.sign(change) * volume, axis=0)
+    vwap_volume = _rolling_sum(volume, VWAP_PERIOD)
+
+    features = {
+        'price_momentum': _ratio(close, _lagged(close, MOMENTUM_PERIOD, 'edge')) - 1,
+        'rsi_14': _rsi(avg_gain, avg_loss),
+        'macd_signal': _ratio(macd - macd_signal, close),
+        'bollinger_position': _bollinger_position(
+            close,
+            _rolling_sum(close, BOLLINGER_PERIOD),
+            _rolling_sum(close * close, BOLLINGER_PERIOD),
+            count,
+        ),
+        'stoch_k': _stoch_k(
+            close,
+            _rolling_extreme(high, STOCH_PERIOD, np.maximum),
+            _rolling_extreme(low, STOCH_PERIOD, np.minimum),
+        ),
+        'vwap_deviation': _ratio(
+            close * vwap_volume,
+            _rolling_sum(money_flow, VWAP_PERIOD),
+        ) - np.where(vwap_volume > 0, 1.0, 0.0),
+        'money_flow_index': _mfi(
+            _rolling_sum(positive_flow, MFI_PERIOD),
+            _rolling_sum(negative_flow, MFI_PERIOD),
+        ),
+        'on_balance_volume': _ratio(
+            obv - _lagged(obv, OBV_PERIOD, 'zero'),
+            _rolling_sum(volume, OBV_PERIOD),
+        ),
+    }
+
+    state = {
+        'avg_gain': avg_gain[-1],
+        'avg_loss': avg_loss[-1],
+        'ema_fast': ema_fast[-1],
+        'ema_slow': ema_slow[-1],
+        'macd_signal': macd_signal[-1],
+        'obv': obv,
+        'typical': typical,
+        'money_flow': money_flow,
+        'positive_flow': positive_flow,
+        'negative_flow': negative_flow,
+    }
+    return features, state
+
+def compute_indicators(high, low, close, volume) -> Dict[str, np.ndarray]:
+    """Vectorized indicator backfill.
+
+    Inputs are OHLCV arrays with time on axis 0, either ``(bars,)`` for one ticker
+    or ``(bars, tickers)`` for a universe. Every output has the same shape.
+    """
+    try:
+        high, low, close, volume = (np.asarray(a, dtype=float) for a in (high, low, close, volume))
+        if close.ndim == 1:
+            features, _ = _compute(high, low, close, volume)
+            return features
+
+        features = {name: np.empty_like(close) for name in INDICATOR_FEATURES}
+        for start in range(0, close.shape[1], BACKFILL_BLOCK):
+            block = slice(start, start + BACKFILL_BLOCK)
+            block_features, _ = _compute(high[:, block], low[:, block], close[:, block], volume[:, block])
+            for name, values in block_features.items():
+                features[name][:, block] = values
+        return features
+    except Exception as e:
+        print(f"Error computing indicators: {e}")
+        return {}
+
+class _Ring:
+    """Per-ticker ring buffer of the last ``width`` bars with a running sum.
+
+    Bar ``t`` lives in slot ``t % width``, so the slot about to be written always
+    holds the value leaving the window.
+    """
+
+    def __init__(self, n: int, width: int):
+        self.width = width
+        self.values = np.zeros((n, width))
+        self.total = np.zeros(n)
+
+    def seed(self, history: np.ndarray, mode: str, rows=slice(None)):
+        """Fill ``rows`` from ``(bars, tickers)`` history"""
+        tail = history[-self.width:]
+        self.total[rows] = tail.sum(axis=0)
+        if len(tail) < self.width:
+            tail = _pad_front(tail, self.width - len(tail), mode)
+        self.values[rows] = np.roll(tail.T, len(history) % self.width, axis=1)
+
+    def ago(self, rows, bars, lag: int):
+        """Value ``lag`` bars before the bar about to be written"""
+        return self.values[rows, (bars - lag) % self.width]
+
+    def push(self, rows, bars, value):
+        """Overwrite the outgoing slot and keep the running sum in step"""
+        slot = bars % self.width
+        outgoing = np.where(bars >= self.width, self.values[rows, slot], 0.0)
+        self.total[rows] += value - outgoing
+        self.values[rows, slot] = value
+        # Exact resync once per revolution stops floating-point drift
+        wrapped = rows[(bars + 1) % self.width == 0]
+        if len(wrapped):
+            self.total[wrapped] = self.values[wrapped].sum(axis=1)
+
+class IndicatorState:
+    """Per-ticker rolling indicator state with constant-time bar updates.
+
+    Holds Wilder averages, EMA states and fixed-width ring buffers for a fixed
+    universe, so each new bar costs the same regardless of how much history has
+    been seen. Rows are addressed by ticker order; ``update`` can advance any
+    subset of tickers.
+    """
+
+    def __init__(self, tickers: Sequence[str]):
+        self.tickers = list(tickers)
+        self.index = {ticker: row for row, ticker in enumerate(self.tickers)}
+        n = len(self.tickers)
+
+        self.bars = np.zeros(n, dtype=np.int64)
+        self.last_close = np.zeros(n)
+        self.last_typical = np.zeros(n)
+        self.obv = np.zeros(n)
+        self.avg_gain = np.zeros(n)
+        self.avg_loss = np.zeros(n)
+        self.ema_fast = np.zeros(n)
+        self.ema_slow = np.zeros(n)
+        self.macd_signal = np.zeros(n)
+
+        self.close = _Ring(n, max(BOLLINGER_PERIOD, MOMENTUM_PERIOD))
+        self.close_sq = _Ring(n, BOLLINGER_PERIOD)
+        self.high = _Ring(n, STOCH_PERIOD)
+        self.low = _Ring(n, STOCH_PERIOD)
+        self.volume = _Ring(n, VWAP_PERIOD)
+        self.money_flow = _Ring(n, VWAP_PERIOD)
+        self.positive_flow = _Ring(n, MFI_PERIOD)
+        self.negative_flow = _Ring(n, MFI_PERIOD)
+        self.obv_volume = _Ring(n, OBV_PERIOD)
+        self.obv_history = _Ring(n, OBV_PERIOD)
+
+        self.features = {name: np.zeros(n) for name in INDICATOR_FEATURES}
+
+    @classmethod
+    def from_history(cls, tickers: Sequence[str], high, low, close, volume) -> 'IndicatorState':
+        """Seed state from ``(bars, tickers)`` OHLCV history with the vectorized backfill"""
+        high, low, close, volume = (np.asarray(a, dtype=float) for a in (high, low, close, volume))
+        if close.ndim == 1:
+            high, low, close, volume = (a[:, None] for a in (high, low, close, volume))
+        state = cls(tickers)
+        state.bars[:] = len(close)
+
+        for start in range(0, close.shape[1], BACKFILL_BLOCK):
+            rows = slice(start, start + BACKFILL_BLOCK)
+            h, l, c, v = high[:, rows], low[:, rows], close[:, rows], volume[:, rows]
+            features, recursive = _compute(h, l, c, v)
+
+            state.last_close[rows] = c[-1]
+            state.last_typical[rows] = recursive['typical'][-1]
+            state.obv[rows] = recursive['obv'][-1]
+            for name in ('avg_gain', 'avg_loss', 'ema_fast', 'ema_slow', 'macd_signal'):
+                getattr(state, name)[rows] = recursive[name]
+
+            state.close.seed(c, 'edge', rows)
+            state.close.total[rows] = c[-BOLLINGER_PERIOD:].sum(axis=0)
+            state.close_sq.seed(c * c, 'zero', rows)
+            state.high.seed(h, 'edge', rows)
+            state.low.seed(l, 'edge', rows)
+            state.volume.seed(v, 'zero', rows)
+            state.money_flow.seed(recursive['money_flow'], 'zero', rows)
+            state.positive_flow.seed(recursive['positive_flow'], 'zero', rows)
+            state.negative_flow.seed(recursive['negative_flow'], 'zero', rows)
+            state.obv_volume.seed(v, 'zero', rows)
+            state.obv_history.seed(recursive['obv'], 'zero', rows)
+
+            for name, values in features.items():
+                state.features[name][rows] = values[-1]
+        return state
+
+    def update(self, high, low, close, volume, rows: Optional[Sequence[int]] = None) -> Dict[str, np.ndarray]:
+        """Apply one new bar per ticker and return the refreshed indicator values.
+
+        ``rows`` selects which tickers the bar arrays belong to (default: all, in
+        order). The cost per ticker depends only on the fixed indicator periods,
+        never on how many bars have been seen.
+        """
+        rows = np.arange(len(self.tickers)) if rows is None else np.asarray(rows, dtype=np.int64)
+        high, low, close, volume = (np.asarray(a, dtype=float) for a in (high, low, close, volume))
+        bars = self.bars[rows]
+        first = bars == 0
+
+        # On the first bar the edge-filled rings start out holding that bar
+        if first.any():
+            seed_rows = rows[first]
+            self.close.values[seed_rows] = close[first, None]
+            self.high.values[seed_rows] = high[first, None]
+            self.low.values[seed_rows] = low[first, None]
+
+        typical = (high + low + close) / 3
+        money_flow = typical * volume
+        change = np.where(first, 0.0, close - self.last_close[rows])
+        typical_change = np.where(first, 0.0, typical - self.last_typical[rows])
+        positive_flow = np.where(typical_change > 0, money_flow, 0.0)
+        negative_flow = np.where(typical_change < 0, money_flow, 0.0)
+
+        # Wilder RSI: seeded on the second bar, smoothed afterwards
+        gain = np.maximum(change, 0)
+        loss = np.maximum(-change, 0)
+        second = bars == 1
+        avg_gain = self.avg_gain[rows]
+        avg_loss = self.avg_loss[rows]
+        avg_gain = np.where(second, gain, avg_gain + (gain - avg_gain) / RSI_PERIOD)
+        avg_loss = np.where(second, loss, avg_loss + (loss - avg_loss) / RSI_PERIOD)
+        avg_gain[first] = 0.0
+        avg_loss[first] = 0.0
+
+        # EMA states seeded with the first observation
+        ema_fast = self.ema_fast[rows]
+        ema_slow = self.ema_slow[rows]
+        signal = self.macd_signal[rows]
+        ema_fast = np.where(first, close, ema_fast + 2 / (MACD_FAST + 1) * (close - ema_fast))
+        ema_slow = np.where(first, close, ema_slow + 2 / (MACD_SLOW + 1) * (close - ema_slow))
+        macd = ema_fast - ema_slow
+        signal = np.where(first, macd, signal + 2 / (MACD_SIGNAL + 1) * (macd - signal))
+
+        obv = self.obv[rows] + np.sign(change) * volume
+        momentum_base = self.close.ago(rows, bars, MOMENTUM_PERIOD)
+        obv_base = self.obv_history.ago(rows, bars, OBV_PERIOD)
+
+        self.close.push(rows, bars, close)
+        self.close_sq.push(rows, bars, close * close)
+        self.high.push(rows, bars, high)
+        self.low.push(rows, bars, low)
+        self.volume.push(rows, bars, volume)
+        self.money_flow.push(rows, bars, money_flow)
+        self.positive_flow.push(rows, bars, positive_flow)
+        self.negative_flow.push(rows, bars, negative_flow)
+        self.obv_volume.push(rows, bars, volume)
+        self.obv_history.push(rows, bars, obv)
+
+        self.bars[rows] = bars + 1
+        self.last_close[rows] = close
+        self.last_typical[rows] = typical
+        self.obv[rows] = obv
+        self.avg_gain[rows] = avg_gain
+        self.avg_loss[rows] = avg_loss
+        self.ema_fast[rows] = ema_fast
+        self.ema_slow[rows] = ema_slow
+        self.macd_signal[rows] = signal
+
+        volume_sum = self.volume.total[rows]
+        features = {
+            'price_momentum': _ratio(close, momentum_base) - 1,
+            'rsi_14': _rsi(avg_gain, avg_loss),
+            'macd_signal': _ratio(macd - signal, close),
+            'bollinger_position': _bollinger_position(
+                close,
+                self.close.total[rows],
+                self.close_sq.total[rows],
+                np.minimum(bars + 1, BOLLINGER_PERIOD),
+            ),
+            'stoch_k': _stoch_k(close, self.high.values[rows].max(axis=1), self.low.values[rows].min(axis=1)),
+            'vwap_deviation': _ratio(close * volume_sum, self.money_flow.total[rows])
+                              - np.where(volume_sum > 0, 1.0, 0.0),
+            'money_flow_index': _mfi(self.positive_flow.total[rows], self.negative_flow.total[rows]),
+            'on_balance_volume': _ratio(obv - obv_base, self.obv_volume.total[rows]),
+        }
+
+        for name, values in features.items():
+            self.features[name][rows] = values
+        return features
+
+    def update_ticker(self, ticker: str, bar: Dict) -> Dict[str, float]:
+        """Single-ticker convenience wrapper around ``update``"""
+        price = bar.get('close', bar.get('price', 0))
+        features = self.update(
+            [bar.get('high', price)], [bar.get('low', price)], [price], [bar.get('volume', 0)],
+            rows=[self.index[ticker]],
+        )
+        return {name: float(values[0]) for name, values in features.items()}
+
+    def latest(self, ticker: str) -> Dict[str, float]:
+        """Most recent indicator values for one ticker"""
+        row = self.index[ticker]
+        return {name: float(values[row]) for name, values in self.features.items()}
@@ -0,0 +1,225 @@
+"""
+Market Data Client
+Pooled async snapshot client with bulk requests, request coalescing, rate limiting and retries
+"""
+
+import asyncio
+import os
+import random
+import time
+import numpy as np
+import aiohttp
+from typing import Dict, Iterable, Optional, Sequence
+
+from metrics import metrics
+
+DEFAULT_BASE_URL = os.environ.get('SCANNER_MARKET_DATA_URL', 'https://api.polygon.io')
+SNAPSHOT_PATH = '/v2/snapshot/locale/us/markets/stocks/tickers'
+
+# Symbols per bulk snapshot request (keeps the query string well under URL limits)
+SNAPSHOT_BATCH = 500
+MAX_CONNECTIONS = 16
+# Token bucket: sustained requests per second and burst size
+RATE_LIMIT = 10.0
+RATE_BURST = 20
+# Retries on connection errors and RETRY_STATUSES, with full-jitter exponential backoff
+MAX_RETRIES = 4
+RETRY_BASE = 0.2
+RETRY_CAP = 5.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+REQUEST_TIMEOUT = 10.0
+# Single-symbol ``snapshot`` calls are held this long to be merged into one bulk request
+COALESCE_WINDOW = 0.002
+
+# Column name -> snapshot field path, for ``snapshot_columns``
+SNAPSHOT_COLUMNS = {
+    'price': (('day', 'c'), ('prevDay', 'c')),
+    'volume': (('day', 'v'),),
+    'high': (('day', 'h'),),
+    'low': (('day', 'l'),),
+    'open': (('day', 'o'),),
+    'previous_close': (('prevDay', 'c'),),
+    'change_percent': (('todaysChangePerc',),),
+}
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, at most ``burst`` banked"""
+
+    def __init__(self, rate: float = RATE_LIMIT, burst: int = RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class MarketDataClient:
+    """Polygon-style REST client sharing one connection pool across all requests.
+
+    Identical in-flight GETs are coalesced into one, every request passes a
+    token bucket, and throttled (429/5xx) or failed requests are retried with
+    jittered exponential backoff, honouring ``Retry-After``. ``snapshots``
+    fetches any number of symbols in SNAPSHOT_BATCH-sized bulk requests;
+    ``snapshot`` merges concurrent single-symbol calls the same way.
+    """
+
+    def __init__(self, base_url: str = DEFAULT_BASE_URL, api_key: Optional[str] = None,
+                 max_connections: int = MAX_CONNECTIONS, rate: float = RATE_LIMIT, burst: int = RATE_BURST,
+                 max_retries: int = MAX_RETRIES, batch_size: int = SNAPSHOT_BATCH,
+                 coalesce_window: float = COALESCE_WINDOW, timeout: float = REQUEST_TIMEOUT):
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key if api_key is not None else os.environ.get('POLYGON_API_KEY')
+        self.max_connections = max_connections
+        self.bucket = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.batch_size = batch_size
+        self.coalesce_window = coalesce_window
+        self.timeout = timeout
+        self.session = None
+        self.requests = 0
+        self.retries = 0
+        self._inflight = {}
+        self._waiting = {}
+        self._flush_handle = None
+        # The event loop keeps only weak references to tasks, so pending flushes are held here
+        self._flushes = set()
+
+    async def __aenter__(self) -> 'MarketDataClient':
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _session(self) -> aiohttp.ClientSession:
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector,
+                                                 timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self.session
+
+    async def get_json(self, path: str, params: Optional[Dict[str, str]] = None) -> Dict:
+        """GET ``path`` as JSON; concurrent calls with the same path and params share one request"""
+        key = (path, tuple(sorted((params or {}).items())))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request(path, params or {}))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            metrics.record_batch('market_data.coalesced', 1)
+        return await asyncio.shield(task)
+
+    async def _request(self, path: str, params: Dict[str, str]) -> Dict:
+        if self.api_key:
+            params = {**params, 'apiKey': self.api_key}
+        url = self.base_url + path
+        for attempt in range(self.max_retries + 1):
+            await self.bucket.acquire()
+            self.requests += 1
+            delay = None
+            try:
+                async with self._session().get(url, params=params) as response:
+                    if response.status not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        return await response.json()
+                    retry_after = response.headers.get('Retry-After')
+                    delay = float(retry_after) if retry_after and retry_after.isdigit() else None
+                    error = aiohttp.ClientResponseError(response.request_info, response.history,
+                                                        status=response.status)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = e
+            if attempt == self.max_retries:
+                metrics.record_error('market_data.request')
+                raise error
+            self.retries += 1
+            await asyncio.sleep(delay if delay is not None
+                                else random.uniform(0, min(RETRY_CAP, RETRY_BASE * 2 ** attempt)))
+
+    @metrics.timed('market_data.snapshots')
+    async def snapshots(self, tickers: Iterable[str]) -> Dict[str, Dict]:
+        """Snapshot per symbol for every ticker, in ceil(n / batch_size) concurrent bulk requests"""
+        tickers = list(dict.fromkeys(tickers))
+        metrics.record_batch('market_data.snapshots', len(tickers))
+        chunks = [tickers[i:i + self.batch_size] for i in range(0, len(tickers), self.batch_size)]
+        pages = await asyncio.gather(*(self.get_json(SNAPSHOT_PATH, {'tickers': ','.join(chunk)})
+                                       for chunk in chunks))
+        return {item['ticker']: item for page in pages for item in page.get('tickers') or ()}
+
+    async def market_snapshot(self) -> Dict[str, Dict]:
+        """Whole-market snapshot (one request)"""
+        page = await self.get_json(SNAPSHOT_PATH)
+        return {item['ticker']: item for item in page.get('tickers') or ()}
+
+    async def snapshot(self, ticker: str) -> Optional[Dict]:
+        """One symbol's snapshot; concurrent calls within the coalescing window share a bulk request"""
+        future = self._waiting.get(ticker)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._waiting[ticker] = future
+            if len(self._waiting) >= self.batch_size:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.coalesce_window, self._flush)
+        return await asyncio.shield(future)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        waiting, self._waiting = self._waiting, {}
+        task = asyncio.ensure_future(self._resolve(waiting))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _resolve(self, waiting: Dict[str, asyncio.Future]):
+        try:
+            found = await self.snapshots(waiting)
+        except Exception as e:
+            for future in waiting.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for ticker, future in waiting.items():
+            if not future.done():
+                future.set_result(found.get(ticker))
+
+def _field(snapshot: Dict, paths: Sequence[Sequence[str]]) -> float:
+    """First present value along ``paths`` (NaN if none).
+
+    A zero falls through to the next path (an unfilled ``day.c`` before the
+    open defers to ``prevDay.c``), but on the last path it is a real value.
+    """
+    for i, path in enumerate(paths):
+        value = snapshot
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is not None and (value != 0 or i == len(paths) - 1):
+            return float(value)
+    return np.nan
+
+def snapshot_columns(snapshots: Dict[str, Dict], tickers: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Snapshot fields as per-ticker columns in ``tickers`` order (the ``analyze_batch`` input
+    format); symbols with no snapshot get NaN"""
+    empty = {}
+    rows = [snapshots.get(ticker, empty) for ticker in tickers]
+    return {name: np.array([_field(row, paths) for row in rows]) for name, paths in SNAPSHOT_COLUMNS.items()}
+
+def to_market_data(snapshot: Dict) -> Dict[str, float]:
+    """One snapshot as the ``market_data`` dict ``analyze_stock`` takes"""
+    return {name: 0.0 if np.isnan(value) else value
+            for name, value in ((name, _field(snapshot, paths)) for name, paths in SNAPSHOT_COLUMNS.items())}
@@ -0,0 +1,211 @@
+"""
+Pipeline Metrics
+Low-overhead per-stage latency histograms, call/error counters and batch sizes
+"""
+
+import asyncio
+import json
+import os
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Sequence
+
+# Histogram upper bounds in seconds (Prometheus ``le`` labels); +Inf is implicit
+LATENCY_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+
+class Histogram:
+    """Fixed-bucket histogram (non-cumulative counts, cumulated on export)"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf if it falls past the last bound)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (float('inf'),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+class _StageTimer:
+    """Context manager returned by ``MetricsRegistry.stage`` while enabled"""
+
+    __slots__ = ('registry', 'name', 'start')
+
+    def __init__(self, registry: 'MetricsRegistry', name: str):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.start, error=exc_type is not None)
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class MetricsRegistry:
+    """Per-process registry of stage timings, counters and batch sizes.
+
+    Switch with ``enable()``/``disable()`` at runtime (or SCANNER_METRICS=0 at
+    startup). While disabled, ``timed`` wrappers cost one attribute check and a
+    call, and ``stage`` returns a shared no-op context manager.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.reset()
+
+    def reset(self):
+        self.latency: Dict[str, Histogram] = {}
+        self.calls: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.batch_sizes: Dict[str, Histogram] = {}
+        self.started = time.time()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def observe(self, stage: str, seconds: float, error: bool = False):
+        histogram = self.latency.get(stage)
+        if histogram is None:
+            histogram = self.latency[stage] = Histogram(LATENCY_BUCKETS)
+        histogram.observe(seconds)
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+        if error:
+            self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    def record_error(self, stage: str):
+        """Count a failure that the stage handled itself (the pipeline's print-and-fallback paths)"""
+        if self.enabled:
+            self.errors[stage] = self.errors.get(stage, 0) + 1
+
+    def record_batch(self, stage: str, size: int):
+        if self.enabled:
+            histogram = self.batch_sizes.get(stage)
+            if histogram is None:
+                histogram = self.batch_sizes[stage] = Histogram(BATCH_SIZE_BUCKETS)
+            histogram.observe(size)
+
+    def stage(self, name: str):
+        """``with metrics.stage('name'):`` times the block"""
+        return _StageTimer(self, name) if self.enabled else _NULL_TIMER
+
+    def timed(self, name: str) -> Callable:
+        """Decorator timing every call of a sync or async function as stage ``name``"""
+        def decorate(func):
+            if asyncio.iscoroutinefunction(func):
+                @wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    if not self.enabled:
+                        return await func(*args, **kwargs)
+                    start = time.perf_counter()
+                    error = True
+                    try:
+                        result = await func(*args, **kwargs)
+                        error = False
+                        return result
+                    finally:
+                        self.observe(name, time.perf_counter() - start, error)
+                return async_wrapper
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                error = True
+                try:
+                    result = func(*args, **kwargs)
+                    error = False
+                    return result
+                finally:
+                    self.observe(name, time.perf_counter() - start, error)
+            return wrapper
+        return decorate
+
+    def snapshot(self) -> Dict:
+        """Per-stage summary: calls, errors, mean/p50/p95/p99 ms (bucket upper bounds) and batch sizes"""
+        stages = {}
+        for stage in sorted(set(self.calls) | set(self.errors) | set(self.batch_sizes)):
+            summary = {'calls': self.calls.get(stage, 0), 'errors': self.errors.get(stage, 0)}
+            histogram = self.latency.get(stage)
+            if histogram is not None:
+                summary.update({
+                    'mean_ms': histogram.sum / histogram.count * 1000,
+                    'p50_ms': histogram.quantile(0.50) * 1000,
+                    'p95_ms': histogram.quantile(0.95) * 1000,
+                    'p99_ms': histogram.quantile(0.99) * 1000,
+                })
+            sizes = self.batch_sizes.get(stage)
+            if sizes is not None:
+                summary['batches'] = sizes.count
+                summary['mean_batch_size'] = sizes.sum / sizes.count
+            stages[stage] = summary
+        return {'enabled': self.enabled, 'uptime_seconds': time.time() - self.started, 'stages': stages}
+
+    def log_line(self) -> str:
+        """Single-line JSON record for structured log shipping"""
+        return json.dumps({'event': 'pipeline_metrics', 'timestamp': time.time(), **self.snapshot()},
+                          separators=(',', ':'))
+
+    def to_prometheus(self, prefix: str = 'scanner') -> str:
+        """Prometheus text exposition format"""
+        lines = []
+
+        def histogram_lines(metric, label, histograms, scale_bounds):
+            lines.append(f'# TYPE {metric} histogram')
+            for stage, histogram in sorted(histograms.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.bounds, histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{{label}="{stage}",le="{scale_bounds(bound)}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{{label}="{stage}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{metric}_sum{{{label}="{stage}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{{label}="{stage}"}} {histogram.count}')
+
+        histogram_lines(f'{prefix}_stage_duration_seconds', 'stage', self.latency, repr)
+        for name, counter in (('calls', self.calls), ('errors', self.errors)):
+            lines.append(f'# TYPE {prefix}_stage_{name}_total counter')
+            for stage, value in sorted(counter.items()):
+                lines.append(f'{prefix}_stage_{name}_total{{stage="{stage}"}} {value}')
+        histogram_lines(f'{prefix}_batch_size', 'stage', self.batch_sizes, str)
+        lines.append(f'# TYPE {prefix}_metrics_enabled gauge')
+        lines.append(f'{prefix}_metrics_enabled {int(self.enabled)}')
+        return '\n'.join(lines) + '\n'
+
+# Process-wide registry; pool workers each hold their own
+metrics = MetricsRegistry(enabled=os.environ.get('SCANNER_METRICS', '1') != '0')
@@ -3,29 +3,72 @@ Advanced ML Models for Trading Signals and Predictions
 Adapted from quantum-trading-suite for integration with scanner
 """
 
+import os
 import numpy as np
-import pandas as pd
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
-import asyncio
-import aiohttp
-import json
+
+from chain_ingest import snapshot_features
+from feature_cache import FeatureCache
+from metrics import metrics
+from model_runtime import (
+    DEFAULT_MODEL_DIR, CompiledModel, latest_artifact, linear_terms, load_models, publish, save_models
+)
+from options_pricing import atm_implied_volatility, iv_rank_percentile
+
+MODEL_VERSION = '2.1.0'
+
+SHORT_DATA_FIELDS = {
+    'short_interest': 'shortInterestPercent',
+    'utilization_rate': 'utilizationRate',
+    'cost_to_borrow': 'costToBorrow',
+    'days_to_cover': 'daystocover',
+}
+
+TECHNICAL_FEATURES = (
+    'price_momentum', 'volume_ratio', 'volatility', 'price_position',
+    'rsi_14', 'macd_signal', 'bollinger_position', 'stoch_k',
+    'vwap_deviation', 'money_flow_index', 'on_balance_volume',
+)
+# Options features a caller may supply (e.g. solved chain IVs, ExposureProfile totals)
+OPTIONS_FEATURES = (
+    'implied_volatility', 'iv_rank', 'iv_percentile',
+    'put_call_ratio', 'gamma_exposure', 'delta_exposure',
+)
+# Composite score ratings, worst first
+RATINGS = ('C', 'C+', 'B', 'B+', 'A', 'A+')
+
+def _as_columns(data) -> Dict[str, np.ndarray]:
+    """Normalize a DataFrame or mapping of sequences into float column arrays"""
+    if data is None:
+        return {}
+    keys = data.columns if hasattr(data, 'columns') else data.keys()
+    return {key: np.asarray(data[key], dtype=float) for key in keys}
 
 class FeatureEngineer:
     """Advanced feature engineering for trading signals"""
     
     @staticmethod
+    @metrics.timed('features.technical')
     def calculate_technical_features(data: Dict) -> Dict:
-        """Calculate technical analysis features"""
+        """Calculate technical analysis features.
+        
+        Real indicator values (e.g. from ``indicators.IndicatorState``) can be passed
+        under ``data['indicators']``; any indicator missing there is simulated.
+        """
         try:
             price = data.get('price', 0)
             volume = data.get('volume', 0)
             high = data.get('high', price)
             low = data.get('low', price)
+            indicators = data.get('indicators') or {}
+            
+            def indicator(name, simulate):
+                return indicators[name] if name in indicators else simulate()
             
             # Basic technical features
             features = {
-                'price_momentum': np.random.normal(0, 0.1),  # Simulated for now
+                'price_momentum': indicator('price_momentum', lambda: np.random.normal(0, 0.1)),
                 'volume_ratio': min(volume / 1000000, 10) if volume > 0 else 0,
                 'volatility': abs(high - low) / price if price > 0 else 0,
                 'price_position': (price - low) / (high - low) if high > low else 0.5,
@@ -33,28 +76,40 @@ class FeatureEngineer:
             
             # Advanced momentum indicators
             features.update({
-                'rsi_14': np.clip(np.random.normal(50, 15), 0, 100),
-                'macd_signal': np.random.normal(0, 0.05),
-                'bollinger_position': np.clip(np.random.normal(0.5, 0.2), 0, 1),
-                'stoch_k': np.clip(np.random.normal(50, 20), 0, 100),
+                'rsi_14': indicator('rsi_14', lambda: np.clip(np.random.normal(50, 15), 0, 100)),
+                'macd_signal': indicator('macd_signal', lambda: np.random.normal(0, 0.05)),
+                'bollinger_position': indicator('bollinger_position', lambda: np.clip(np.random.normal(0.5, 0.2), 0, 1)),
+                'stoch_k': indicator('stoch_k', lambda: np.clip(np.random.normal(50, 20), 0, 100)),
             })
             
             # Volume-price indicators
             features.update({
-                'vwap_deviation': np.random.normal(0, 0.02),
-                'money_flow_index': np.clip(np.random.normal(50, 15), 0, 100),
-                'on_balance_volume': np.random.normal(0, 0.1),
+                'vwap_deviation': indicator('vwap_deviation', lambda: np.random.normal(0, 0.02)),
+                'money_flow_index': indicator('money_flow_index', lambda: np.clip(np.random.normal(50, 15), 0, 100)),
+                'on_balance_volume': indicator('on_balance_volume', lambda: np.random.normal(0, 0.1)),
             })
             
             return features
             
         except Exception as e:
             print(f"Error calculating technical features: {e}")
+            metrics.record_error('features.technical')
             return {}
     
     @staticmethod
-    def calculate_options_features(ticker: str, short_data: Dict = None) -> Dict:
-        """Calculate options-specific features"""
+    @metrics.timed('features.options')
+    def calculate_options_features(ticker: str, short_data: Dict = None, options_data: Dict = None) -> Dict:
+        """Calculate options-specific features.
+        
+        ``options_data`` may carry a current ``implied_volatility`` (percent) or an
+        ``options_chain`` of market quotes (``strike``/``expiry_days``/``is_call``/
+        ``price`` columns plus ``spot``) to solve it from, and an ``iv_history`` to
+        rank it against. A ``chain_snapshot`` file path instead streams the full
+        chain through ``snapshot_features`` for real IV, put/call ratio and
+        gamma/delta exposure, and a live ``exposure`` (``ExposureProfile``)
+        supplies current GEX/DEX totals. Any other OPTIONS_FEATURES value in
+        ``options_data`` is used as-is. Anything not supplied is simulated.
+        """
         try:
             features = {
                 'implied_volatility': np.clip(np.random.normal(30, 10), 10, 100),
@@ -64,74 +119,205 @@ class FeatureEngineer:
                 'gamma_exposure': np.random.normal(0, 1000000),
                 'delta_exposure': np.random.normal(0, 500000),
             }
+            if options_data:
+                features.update({name: options_data[name] for name in OPTIONS_FEATURES
+                                 if options_data.get(name) is not None})
+            
+            if options_data and options_data.get('chain_snapshot'):
+                features.update(snapshot_features(
+                    options_data['chain_snapshot'], options_data.get('spot'), options_data.get('iv_history')
+                ))
+            elif options_data:
+                current_iv = options_data.get('implied_volatility')
+                chain = options_data.get('options_chain')
+                if current_iv is None and chain:
+                    solved = atm_implied_volatility(
+                        options_data.get('spot', 0), chain['strike'], chain['expiry_days'],
+                        chain['is_call'], chain['price']
+                    )
+                    current_iv = solved * 100 if np.isfinite(solved) else None
+                if current_iv is not None:
+                    features['implied_volatility'] = current_iv
+                    if options_data.get('iv_history') is not None:
+                        features.update(iv_rank_percentile(current_iv, options_data['iv_history']))
+            
+            if options_data and options_data.get('exposure') is not None:
+                features.update(options_data['exposure'].features())
             
             # Add short interest data if available
             if short_data:
                 features.update({
-                    'short_interest': short_data.get('shortInterestPercent', 0),
-                    'utilization_rate': short_data.get('utilizationRate', 0),
-                    'cost_to_borrow': short_data.get('costToBorrow', 0),
-                    'days_to_cover': short_data.get('daystocover', 0),
+                    feature: short_data.get(field, 0)
+                    for feature, field in SHORT_DATA_FIELDS.items()
                 })
             
             return features
             
         except Exception as e:
             print(f"Error calculating options features: {e}")
+            metrics.record_error('features.options')
+            return {}
+    
+    @staticmethod
+    @metrics.timed('features.technical_batch')
+    def calculate_technical_features_batch(data) -> Dict[str, np.ndarray]:
+        """Vectorized technical features for a whole universe (one row per ticker).
+        
+        Indicator columns named like the features (e.g. the output of
+        ``indicators.IndicatorState.update``) are used as-is; missing ones are simulated.
+        """
+        try:
+            columns = _as_columns(data)
+            price = columns['price']
+            n = len(price)
+            volume = columns.get('volume', np.zeros(n))
+            high = columns.get('high', price)
+            low = columns.get('low', price)
+            
+            def indicator(name, simulate):
+                return columns[name] if name in columns else simulate()
+            
+            with np.errstate(divide='ignore', invalid='ignore'):
+                volatility = np.where(price > 0, np.abs(high - low) / price, 0.0)
+                price_position = np.where(high > low, (price - low) / (high - low), 0.5)
+            
+            return {
+                'price_momentum': indicator('price_momentum', lambda: np.random.normal(0, 0.1, n)),
+                'volume_ratio': np.where(volume > 0, np.minimum(volume / 1000000, 10), 0.0),
+                'volatility': volatility,
+                'price_position': price_position,
+                'rsi_14': indicator('rsi_14', lambda: np.clip(np.random.normal(50, 15, n), 0, 100)),
+                'macd_signal': indicator('macd_signal', lambda: np.random.normal(0, 0.05, n)),
+                'bollinger_position': indicator('bollinger_position', lambda: np.clip(np.random.normal(0.5, 0.2, n), 0, 1)),
+                'stoch_k': indicator('stoch_k', lambda: np.clip(np.random.normal(50, 20, n), 0, 100)),
+                'vwap_deviation': indicator('vwap_deviation', lambda: np.random.normal(0, 0.02, n)),
+                'money_flow_index': indicator('money_flow_index', lambda: np.clip(np.random.normal(50, 15, n), 0, 100)),
+                'on_balance_volume': indicator('on_balance_volume', lambda: np.random.normal(0, 0.1, n)),
+            }
+            
+        except Exception as e:
+            print(f"Error calculating batch technical features: {e}")
+            metrics.record_error('features.technical_batch')
+            return {}
+    
+    @staticmethod
+    @metrics.timed('features.options_batch')
+    def calculate_options_features_batch(n: int, short_data=None, options_data=None) -> Dict[str, np.ndarray]:
+        """Vectorized options features for n tickers, with optional short-data columns.
+        
+        ``options_data`` columns named like OPTIONS_FEATURES (e.g. IVs in percent
+        solved from each ticker's chain, or ``ExposureProfile`` GEX/DEX totals) are
+        used where finite; only the missing entries are simulated.
+        """
+        try:
+            supplied = _as_columns(options_data)
+            
+            def feature(name, simulate):
+                if name not in supplied:
+                    return simulate(n)
+                values = supplied[name].copy()
+                missing = np.isnan(values)
+                if missing.any():
+                    values[missing] = simulate(int(missing.sum()))
+                return values
+            
+            features = {
+                'implied_volatility': feature('implied_volatility', lambda k: np.clip(np.random.normal(30, 10, k), 10, 100)),
+                'iv_rank': feature('iv_rank', lambda k: np.clip(np.random.normal(50, 20, k), 0, 100)),
+                'iv_percentile': feature('iv_percentile', lambda k: np.clip(np.random.normal(50, 25, k), 0, 100)),
+                'put_call_ratio': feature('put_call_ratio', lambda k: np.clip(np.random.normal(1.0, 0.3, k), 0.3, 3.0)),
+                'gamma_exposure': feature('gamma_exposure', lambda k: np.random.normal(0, 1000000, k)),
+                'delta_exposure': feature('delta_exposure', lambda k: np.random.normal(0, 500000, k)),
+            }
+            
+            # Add short interest columns if available
+            if short_data is not None:
+                columns = _as_columns(short_data)
+                for feature, field in SHORT_DATA_FIELDS.items():
+                    features[feature] = np.nan_to_num(columns.get(field, np.zeros(n)))
+            
+            return features
+            
+        except Exception as e:
+            print(f"Error calculating batch options features: {e}")
+            metrics.record_error('features.options_batch')
             return {}
 
 class MLPredictor:
-    """Machine Learning prediction engine"""
+    """Machine Learning prediction engine backed by the compiled model runtime"""
     
-    def __init__(self):
-        self.models = {
-            'price_direction': self._initialize_price_model(),
-            'volatility_forecast': self._initialize_volatility_model(),
-            'options_flow': self._initialize_options_model(),
-        }
+    def __init__(self, artifact_dir: Optional[str] = None):
+        if artifact_dir:
+            self.runtime = load_models(artifact_dir)
+        else:
+            self.runtime = {
+                'price_direction': self._initialize_price_model(),
+                'volatility_forecast': self._initialize_volatility_model(),
+                'options_flow': self._initialize_options_model(),
+            }
+        self.models = {key: model.metadata for key, model in self.runtime.items()}
     
-    def _initialize_price_model(self):
-        """Initialize price direction prediction model (simulated)"""
-        return {
-            'type': 'gradient_boost',
-            'accuracy': 0.67,
-            'last_trained': datetime.now() - timedelta(days=1),
-            'features': ['price_momentum', 'volume_ratio', 'rsi_14', 'macd_signal']
-        }
+    def save(self, artifact_dir: str):
+        """Write the current models as a memory-mappable artifact directory"""
+        save_models(self.runtime, artifact_dir, version=MODEL_VERSION)
     
-    def _initialize_volatility_model(self):
-        """Initialize volatility forecasting model (simulated)"""
-        return {
-            'type': 'lstm',
-            'accuracy': 0.72,
-            'last_trained': datetime.now() - timedelta(hours=6),
-            'features': ['implied_volatility', 'iv_rank', 'volatility', 'gamma_exposure']
-        }
+    def _initialize_price_model(self) -> CompiledModel:
+        """Price direction model: logistic over momentum, volume and RSI terms"""
+        features = ['price_momentum', 'volume_ratio', 'rsi_14']
+        return CompiledModel(
+            'price_direction', features, defaults=[0, 0, 50],
+            terms=linear_terms([
+                {'feature': 'price_momentum', 'weight': 0.4},
+                {'feature': 'volume_ratio', 'scale': 1 / 5, 'hi': 1, 'weight': 0.3},
+                {'feature': 'rsi_14', 'offset': -50, 'scale': 1 / 50, 'weight': 0.3},
+            ], features),
+            output_scale=3, link='logistic',
+            metadata={
+                'type': 'gradient_boost',
+                'accuracy': 0.67,
+                'last_trained': datetime.now() - timedelta(days=1),
+            },
+        )
     
-    def _initialize_options_model(self):
-        """Initialize options flow prediction model (simulated)"""
-        return {
-            'type': 'random_forest',
-            'accuracy': 0.64,
-            'last_trained': datetime.now() - timedelta(hours=12),
-            'features': ['put_call_ratio', 'gamma_exposure', 'delta_exposure', 'iv_percentile']
-        }
+    def _initialize_volatility_model(self) -> CompiledModel:
+        """Volatility expansion model: IV rank sigmoid plus a gamma adjustment"""
+        features = ['iv_rank', 'gamma_exposure']
+        return CompiledModel(
+            'volatility_forecast', features, defaults=[50, 0],
+            terms=linear_terms([
+                {'feature': 'iv_rank', 'offset': -30, 'scale': 1 / 10, 'transform': 'sigmoid'},
+                {'feature': 'gamma_exposure', 'scale': 1e-6, 'transform': 'abs', 'weight': 0.1},
+            ], features),
+            output_clip=(0, 1),
+            metadata={
+                'type': 'lstm',
+                'accuracy': 0.72,
+                'last_trained': datetime.now() - timedelta(hours=6),
+            },
+        )
+    
+    def _initialize_options_model(self) -> CompiledModel:
+        """Options flow model: put/call, gamma and contrarian IV terms"""
+        features = ['put_call_ratio', 'gamma_exposure', 'iv_percentile']
+        return CompiledModel(
+            'options_flow', features, defaults=[1.0, 0, 50],
+            terms=linear_terms([
+                {'feature': 'put_call_ratio', 'transform': 'inv1p', 'weight': 0.4},
+                {'feature': 'gamma_exposure', 'scale': 1e-6, 'transform': 'tanh', 'weight': 0.3},
+                {'feature': 'iv_percentile', 'offset': -100, 'scale': -1 / 100, 'weight': 0.3},
+            ], features),
+            metadata={
+                'type': 'random_forest',
+                'accuracy': 0.64,
+                'last_trained': datetime.now() - timedelta(hours=12),
+            },
+        )
     
+    @metrics.timed('model.price_direction')
     async def predict_price_direction(self, features: Dict) -> Dict:
         """Predict price direction with confidence"""
         try:
-            # Simulate ML prediction based on features
-            momentum_score = features.get('price_momentum', 0)
-            volume_score = min(features.get('volume_ratio', 0) / 5, 1)
-            rsi_score = (features.get('rsi_14', 50) - 50) / 50
-            
-            # Weighted prediction
-            raw_prediction = (momentum_score * 0.4 + 
-                            volume_score * 0.3 + 
-                            rsi_score * 0.3)
-            
-            # Apply sigmoid to get probability
-            probability = 1 / (1 + np.exp(-raw_prediction * 3))
+            probability = self.runtime['price_direction'].predict_row(features)
             
             direction = 'BULLISH' if probability > 0.6 else 'BEARISH' if probability < 0.4 else 'NEUTRAL'
             confidence = abs(probability - 0.5) * 2  # Scale to 0-1
@@ -147,19 +333,15 @@ class MLPredictor:
             
         except Exception as e:
             print(f"Error in price prediction: {e}")
+            metrics.record_error('model.price_direction')
             return {'direction': 'NEUTRAL', 'probability': 0.5, 'confidence': 0}
     
+    @metrics.timed('model.volatility')
     async def predict_volatility(self, features: Dict) -> Dict:
         """Predict volatility expansion/contraction"""
         try:
             iv_rank = features.get('iv_rank', 50)
-            current_vol = features.get('volatility', 0.02)
-            gamma_impact = abs(features.get('gamma_exposure', 0)) / 1000000
-            
-            # Volatility prediction logic
-            vol_expansion_prob = 1 / (1 + np.exp(-(iv_rank - 30) / 10))
-            vol_expansion_prob += gamma_impact * 0.1  # Gamma can increase volatility
-            vol_expansion_prob = np.clip(vol_expansion_prob, 0, 1)
+            vol_expansion_prob = self.runtime['volatility_forecast'].predict_row(features)
             
             prediction = 'EXPANSION' if vol_expansion_prob > 0.6 else 'CONTRACTION' if vol_expansion_prob < 0.4 else 'STABLE'
             
@@ -174,23 +356,17 @@ class MLPredictor:
             
         except Exception as e:
             print(f"Error in volatility prediction: {e}")
+            metrics.record_error('model.volatility')
             return {'prediction': 'STABLE', 'expansion_probability': 0.5}
     
+    @metrics.timed('model.options_flow')
     async def analyze_options_flow(self, features: Dict) -> Dict:
         """Analyze options flow for directional bias"""
         try:
             put_call_ratio = features.get('put_call_ratio', 1.0)
-            gamma_exposure = features.get('gamma_exposure', 0)
             iv_percentile = features.get('iv_percentile', 50)
-            
-            # Options flow analysis
-            bullish_flow = 1 / (1 + put_call_ratio)  # Lower P/C ratio = more bullish
-            gamma_bias = np.tanh(gamma_exposure / 1000000)  # Normalized gamma impact
-            iv_contrarian = (100 - iv_percentile) / 100  # High IV = contrarian bearish
-            
-            flow_score = (bullish_flow * 0.4 + 
-                         gamma_bias * 0.3 + 
-                         iv_contrarian * 0.3)
+            gamma_bias = np.tanh(features.get('gamma_exposure', 0) / 1000000)  # Normalized gamma impact
+            flow_score = self.runtime['options_flow'].predict_row(features)
             
             flow_direction = 'BULLISH_FLOW' if flow_score > 0.6 else 'BEARISH_FLOW' if flow_score < 0.4 else 'NEUTRAL_FLOW'
             
@@ -206,24 +382,119 @@ class MLPredictor:
             
         except Exception as e:
             print(f"Error in options flow analysis: {e}")
+            metrics.record_error('model.options_flow')
             return {'flow_direction': 'NEUTRAL_FLOW', 'flow_strength': 0}
+    
+    @metrics.timed('model.price_direction_batch')
+    def predict_price_direction_batch(self, features: Dict[str, np.ndarray]) -> Dict:
+        """Vectorized price direction prediction over feature columns"""
+        probability = self.runtime['price_direction'].predict(features)
+        confidence = np.abs(probability - 0.5) * 2
+        
+        return {
+            'direction': np.where(probability > 0.6, 'BULLISH',
+                                  np.where(probability < 0.4, 'BEARISH', 'NEUTRAL')),
+            'probability': probability,
+            'confidence': confidence,
+            'strength': np.where(confidence > 0.7, 'STRONG',
+                                 np.where(confidence > 0.4, 'MODERATE', 'WEAK')),
+            'model_accuracy': self.models['price_direction']['accuracy'],
+        }
+    
+    @metrics.timed('model.volatility_batch')
+    def predict_volatility_batch(self, features: Dict[str, np.ndarray]) -> Dict:
+        """Vectorized volatility expansion/contraction prediction"""
+        iv_rank = features['iv_rank']
+        vol_expansion_prob = self.runtime['volatility_forecast'].predict(features)
+        
+        return {
+            'prediction': np.where(vol_expansion_prob > 0.6, 'EXPANSION',
+                                   np.where(vol_expansion_prob < 0.4, 'CONTRACTION', 'STABLE')),
+            'expansion_probability': vol_expansion_prob,
+            'current_iv_rank': iv_rank,
+            'expected_vol_change': (vol_expansion_prob - 0.5) * 0.1,
+            'model_accuracy': self.models['volatility_forecast']['accuracy'],
+        }
+    
+    @metrics.timed('model.options_flow_batch')
+    def analyze_options_flow_batch(self, features: Dict[str, np.ndarray]) -> Dict:
+        """Vectorized options flow analysis"""
+        put_call_ratio = features['put_call_ratio']
+        iv_percentile = features['iv_percentile']
+        gamma_bias = np.tanh(features['gamma_exposure'] / 1000000)
+        flow_score = self.runtime['options_flow'].predict(features)
+        
+        return {
+            'flow_direction': np.where(flow_score > 0.6, 'BULLISH_FLOW',
+                                       np.where(flow_score < 0.4, 'BEARISH_FLOW', 'NEUTRAL_FLOW')),
+            'flow_strength': np.abs(flow_score - 0.5) * 2,
+            'put_call_ratio': put_call_ratio,
+            'gamma_impact': gamma_bias,
+            'sentiment': np.where(iv_percentile < 25, 'GREEDY',
+                                  np.where(iv_percentile > 75, 'FEARFUL', 'NEUTRAL')),
+            'model_accuracy': self.models['options_flow']['accuracy'],
+        }
 
 class QuantumMLEngine:
     """Main ML engine combining all prediction models"""
     
-    def __init__(self):
+    def __init__(self, feature_cache: Optional[FeatureCache] = None, cache_features: bool = True,
+                 model_dir: Optional[str] = DEFAULT_MODEL_DIR):
         self.feature_engineer = FeatureEngineer()
-        self.predictor = MLPredictor()
+        self.predictor = self._load_predictor(model_dir)
+        self.feature_cache = (feature_cache or FeatureCache()) if cache_features else None
+    
+    def save_snapshot(self, root: str = DEFAULT_MODEL_DIR, version: Optional[str] = None) -> str:
+        """Publish the current models under ``root`` so cold starts memory-map them instead of rebuilding"""
+        version = version or f"{MODEL_VERSION}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        directory = os.path.join(root, version)
+        self.predictor.save(directory)
+        publish(root, version)
+        return directory
+    
+    @staticmethod
+    def _load_predictor(model_dir: Optional[str]) -> MLPredictor:
+        """Predictor from the published trained artifacts under ``model_dir``, else the built-in models"""
+        artifact_dir = latest_artifact(model_dir) if model_dir else None
+        if artifact_dir:
+            try:
+                return MLPredictor(artifact_dir)
+            except Exception as e:
+                print(f"Error loading model artifacts from {artifact_dir}: {e}")
+        return MLPredictor()
+    
+    def _extract_features(self, ticker: str, market_data: Dict, short_data: Dict = None,
+                          options_data: Dict = None) -> Dict:
+        """Technical and options features, served from the feature cache when possible"""
+        if self.feature_cache is None:
+            technical_features = self.feature_engineer.calculate_technical_features(market_data)
+            options_features = self.feature_engineer.calculate_options_features(ticker, short_data, options_data)
+            return {**technical_features, **options_features}
+        
+        bar = self.feature_cache.bar_timestamp(market_data)
+        technical_features = self.feature_cache.get_or_compute(
+            'technical', ticker, bar, market_data,
+            lambda: self.feature_engineer.calculate_technical_features(market_data)
+        )
+        options_inputs = (short_data, options_data)
+        snapshot = options_data.get('chain_snapshot') if options_data else None
+        if isinstance(snapshot, (str, os.PathLike)) and os.path.exists(snapshot):
+            # A snapshot file rewritten in place keeps its path; key on its contents' stamp too
+            stat = os.stat(snapshot)
+            options_inputs += (stat.st_mtime_ns, stat.st_size)
+        options_features = self.feature_cache.get_or_compute(
+            'options', ticker, bar, options_inputs,
+            lambda: self.feature_engineer.calculate_options_features(ticker, short_data, options_data)
+        )
+        return {**technical_features, **options_features}
     
-    async def analyze_stock(self, ticker: str, market_data: Dict, short_data: Dict = None) -> Dict:
+    @metrics.timed('ml.analyze_stock')
+    async def analyze_stock(self, ticker: str, market_data: Dict, short_data: Dict = None,
+                            options_data: Dict = None) -> Dict:
         """Complete ML analysis for a stock"""
         try:
-            # Extract features
-            technical_features = self.feature_engineer.calculate_technical_features(market_data)
-            options_features = self.feature_engineer.calculate_options_features(ticker, short_data)
-            
-            # Combine all features
-            all_features = {**technical_features, **options_features}
+            # Extract and combine all features
+            all_features = self._extract_features(ticker, market_data, short_data, options_data)
             
             # Run predictions
             price_prediction = await self.predictor.predict_price_direction(all_features)
@@ -245,13 +516,60 @@ class QuantumMLEngine:
                 },
                 'features': all_features,
                 'timestamp': datetime.now().isoformat(),
-                'model_version': '2.1.0'
+                'model_version': MODEL_VERSION
             }
             
         except Exception as e:
             print(f"Error in ML analysis for {ticker}: {e}")
+            metrics.record_error('ml.analyze_stock')
             return {'ticker': ticker, 'error': str(e)}
     
+    @metrics.timed('ml.analyze_batch')
+    def analyze_batch(self, tickers, market_data, short_data=None) -> Dict:
+        """Columnar ML analysis for a whole universe.
+        
+        ``market_data`` and ``short_data`` are DataFrames or mappings of equal-length
+        columns (``price``/``volume``/``high``/``low`` and the ORTEX short fields);
+        market data columns named like OPTIONS_FEATURES (NaN where unknown) stand
+        in for the simulated options features. The result mirrors ``analyze_stock`` with every leaf replaced by an array
+        holding one entry per ticker.
+        """
+        try:
+            tickers = np.asarray(tickers)
+            metrics.record_batch('ml.analyze_batch', len(tickers))
+            technical_features = self.feature_engineer.calculate_technical_features_batch(market_data)
+            options_features = self.feature_engineer.calculate_options_features_batch(
+                len(tickers), short_data, {name: market_data[name] for name in OPTIONS_FEATURES if name in market_data}
+            )
+            all_features = {**technical_features, **options_features}
+            
+            price_prediction = self.predictor.predict_price_direction_batch(all_features)
+            volatility_prediction = self.predictor.predict_volatility_batch(all_features)
+            options_analysis = self.predictor.analyze_options_flow_batch(all_features)
+            
+            composite_score = self._calculate_composite_score_batch(
+                price_prediction, volatility_prediction, options_analysis
+            )
+            
+            return {
+                'ticker': tickers,
+                'ml_analysis': {
+                    'price_prediction': price_prediction,
+                    'volatility_forecast': volatility_prediction,
+                    'options_flow': options_analysis,
+                    'composite_score': composite_score,
+                },
+                'features': all_features,
+                'timestamp': datetime.now().isoformat(),
+                'model_version': MODEL_VERSION
+            }
+            
+        except Exception as e:
+            print(f"Error in batch ML analysis: {e}")
+            metrics.record_error('ml.analyze_batch')
+            return {'ticker': np.asarray(tickers), 'error': str(e)}
+    
+    @metrics.timed('model.composite_score')
     def _calculate_composite_score(self, price_pred: Dict, vol_pred: Dict, options_analysis: Dict) -> Dict:
         """Calculate overall ML confidence score"""
         try:
@@ -305,7 +623,70 @@ class QuantumMLEngine:
             
         except Exception as e:
             print(f"Error calculating composite score: {e}")
+            metrics.record_error('model.composite_score')
             return {'rating': 'C', 'confidence_score': 0.5}
+    
+    @metrics.timed('model.composite_score_batch')
+    def _calculate_composite_score_batch(self, price_pred: Dict, vol_pred: Dict, options_analysis: Dict) -> Dict:
+        """Vectorized counterpart of ``_calculate_composite_score``"""
+        price_weight = 0.4
+        vol_weight = 0.3
+        options_weight = 0.3
+        
+        price_confidence = price_pred['confidence']
+        price_direction = price_pred['direction']
+        price_bullish = (price_direction == 'BULLISH').astype(float) - (price_direction == 'BEARISH')
+        
+        vol_opportunity = vol_pred['expansion_probability']
+        
+        options_confidence = options_analysis['flow_strength']
+        flow_direction = options_analysis['flow_direction']
+        options_bullish = (flow_direction == 'BULLISH_FLOW').astype(float) - (flow_direction == 'BEARISH_FLOW')
+        
+        directional_score = (price_bullish * price_confidence * price_weight + 
+                             options_bullish * options_confidence * options_weight)
+        
+        opportunity_score = (price_confidence * price_weight + 
+                             vol_opportunity * vol_weight + 
+                             options_confidence * options_weight)
+        
+        overall_confidence = np.clip(opportunity_score, 0, 1)
+        overall_direction = np.where(directional_score > 0.2, 'BULLISH',
+                                     np.where(directional_score < -0.2, 'BEARISH', 'NEUTRAL'))
+        
+        rating = np.select(
+            [overall_confidence > 0.8, overall_confidence > 0.7, overall_confidence > 0.6,
+             overall_confidence > 0.5, overall_confidence > 0.4],
+            ['A+', 'A', 'B+', 'B', 'C+'],
+            default='C'
+        )
+        
+        return {
+            'overall_direction': overall_direction,
+            'confidence_score': overall_confidence,
+            'rating': rating,
+            'opportunity_level': np.where(overall_confidence > 0.7, 'HIGH',
+                                          np.where(overall_confidence > 0.5, 'MEDIUM', 'LOW')),
+            'risk_adjusted_score': overall_confidence * (1 - np.abs(directional_score)),
+            'components': {
+                'price_impact': price_confidence * price_weight,
+                'volatility_impact': vol_opportunity * vol_weight,
+                'options_impact': options_confidence * options_weight
+            }
+        }
+
+# Global ML engine instance, built on first use so importing this module stays cheap
+_ml_engine = None
+
+def get_ml_engine() -> QuantumMLEngine:
+    """The process-wide QuantumMLEngine"""
+    global _ml_engine
+    if _ml_engine is None:
+        _ml_engine = QuantumMLEngine()
+    return _ml_engine
 
-# Global ML engine instance
-ml_engine = QuantumMLEngine()
\ No newline at end of file
+def __getattr__(name):
+    # ``from ml_models import ml_engine`` keeps working, it just builds the engine at that point
+    if name == 'ml_engine':
+        return get_ml_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
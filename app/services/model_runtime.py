@@ -0,0 +1,292 @@
+"""
+Model Runtime
+Array-compiled linear/logistic models and tree ensembles with memory-mapped artifacts
+"""
+
+import json
+import math
+import os
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Mapping, Optional, Sequence
+
+# Per-term transforms, applied to (x + offset) * scale before clipping and weighting
+TRANSFORMS = ('identity', 'abs', 'tanh', 'inv1p', 'sigmoid')
+LINKS = ('identity', 'logistic')
+
+MANIFEST_FILE = 'manifest.json'
+RUNTIME_FORMAT = 1
+
+# Versioned artifact directories live under the model root; LATEST names the active one
+LATEST_FILE = 'LATEST'
+DEFAULT_MODEL_DIR = os.environ.get(
+    'SCANNER_MODEL_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'models')
+)
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-x))
+
+_ARRAY_TRANSFORMS = (None, np.abs, np.tanh, lambda x: 1 / (1 + x), _sigmoid)
+_SCALAR_TRANSFORMS = (None, abs, math.tanh, lambda x: 1 / (1 + x), lambda x: 1 / (1 + math.exp(-x)))
+
+class TreeEnsemble:
+    """Regression trees flattened into parallel node arrays.
+
+    Node ``i`` splits on ``feature[i]`` (-1 marks a leaf) at ``threshold[i]``;
+    rows with ``x <= threshold`` go to ``left[i]``, the rest to ``right[i]``
+    (node indices into the same arrays). ``value[i]`` is the leaf output and
+    ``roots`` the first node of each tree. The ensemble output is
+    ``learning_rate * sum(leaf values)``.
+    """
+
+    ARRAYS = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+    def __init__(self, feature, threshold, left, right, value, roots, learning_rate: float = 1.0):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.learning_rate = learning_rate
+        self.depth = self._max_depth()
+
+    def _max_depth(self) -> int:
+        depth = 0
+        frontier = list(self.roots)
+        while frontier:
+            frontier = [child for node in frontier if self.feature[node] >= 0
+                        for child in (self.left[node], self.right[node])]
+            depth += bool(frontier)
+        return depth
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Sum of leaf values for every row of ``X`` (rows x model features).
+
+        All trees advance one level per pass over a (rows x trees) node matrix,
+        so the Python loop runs ``depth`` times regardless of rows or trees.
+        """
+        rows = np.arange(len(X))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.depth):
+            feature = self.feature[nodes]
+            split = feature >= 0
+            if not split.any():
+                break
+            go_left = X[rows, np.maximum(feature, 0)] <= self.threshold[nodes]
+            nodes = np.where(split, np.where(go_left, self.left[nodes], self.right[nodes]), nodes)
+        return self.learning_rate * self.value[nodes].sum(axis=1)
+
+    def predict_row(self, x: Sequence[float]) -> float:
+        total = 0.0
+        for node in self.roots:
+            while self.feature[node] >= 0:
+                node = self.left[node] if x[self.feature[node]] <= self.threshold[node] else self.right[node]
+            total += self.value[node]
+        return self.learning_rate * float(total)
+
+class CompiledModel:
+    """One prediction model evaluated column-wise over a batch of feature rows.
+
+    ``z = intercept + sum(pre terms) + trees``; ``y = link(output_scale * z)
+    + sum(post terms)``, clipped to ``output_clip``. Each term is
+    ``weight * clip(transform((x + offset) * scale), lo, hi)`` of one feature.
+    Post-link terms let additive adjustments sit outside the sigmoid. Inputs
+    are named columns (or scalars); missing names fall back to ``defaults``.
+    """
+
+    TERM_ARRAYS = ('term_feature', 'term_transform', 'term_offset', 'term_scale',
+                   'term_lo', 'term_hi', 'term_weight', 'term_post')
+
+    def __init__(self, name: str, features: Sequence[str], defaults: Sequence[float],
+                 terms: Optional[Dict[str, np.ndarray]] = None, intercept: float = 0.0,
+                 output_scale: float = 1.0, link: str = 'identity',
+                 output_clip: Sequence[float] = (-np.inf, np.inf),
+                 trees: Optional[TreeEnsemble] = None, metadata: Optional[Dict] = None):
+        self.name = name
+        self.features = list(features)
+        self.defaults = np.asarray(defaults, dtype=np.float64)
+        terms = terms or {}
+        self.terms = {key: np.asarray(terms.get(key, ()), dtype=np.int32 if key in ('term_feature', 'term_transform', 'term_post')
+                                      else np.float64) for key in self.TERM_ARRAYS}
+        self.intercept = float(intercept)
+        self.output_scale = float(output_scale)
+        self.link = LINKS.index(link)
+        self.output_clip = tuple(float(bound) for bound in output_clip)
+        self.trees = trees
+        self.metadata = dict(metadata or {})
+
+        self._compile()
+
+    def _compile(self):
+        """Unpack the term arrays into per-term Python tuples, dropping no-op steps,
+        so evaluation touches each input column once with plain float constants"""
+        t = self.terms
+        self._plan = []
+        for i in range(len(t['term_feature'])):
+            index = int(t['term_feature'][i])
+            lo, hi = float(t['term_lo'][i]), float(t['term_hi'][i])
+            self._plan.append((
+                self.features[index], float(self.defaults[index]), int(t['term_transform'][i]),
+                float(t['term_offset'][i]), float(t['term_scale'][i]),
+                None if lo == -np.inf else lo, None if hi == np.inf else hi,
+                float(t['term_weight'][i]), bool(t['term_post'][i]),
+            ))
+        self._clip = tuple(None if abs(bound) == np.inf else bound for bound in self.output_clip)
+
+    def feature_matrix(self, features: Mapping) -> np.ndarray:
+        """(rows x model features) matrix from named columns or scalars; missing names use defaults"""
+        columns = [np.asarray(features.get(name, default), dtype=np.float64)
+                   for name, default in zip(self.features, self.defaults)]
+        rows = max((column.size for column in columns if column.ndim), default=1)
+        return np.column_stack([np.broadcast_to(column, (rows,)) for column in columns])
+
+    def predict(self, features: Mapping) -> np.ndarray:
+        """Model output for every row of named feature columns"""
+        z = self.intercept
+        post = 0.0
+        for name, default, transform, offset, scale, lo, hi, weight, is_post in self._plan:
+            x = features.get(name, default)
+            if offset:
+                x = x + offset
+            if scale != 1:
+                x = x * scale
+            if transform:
+                x = _ARRAY_TRANSFORMS[transform](x)
+            if lo is not None or hi is not None:
+                x = np.clip(x, lo, hi)
+            if is_post:
+                post = post + weight * x
+            else:
+                z = z + weight * x
+        if self.trees is not None:
+            z = z + self.trees.predict(self.feature_matrix(features))
+        y = z * self.output_scale if self.output_scale != 1 else z
+        if self.link == 1:
+            y = _sigmoid(y)
+        y = y + post
+        if self._clip != (None, None):
+            y = np.clip(y, *self._clip)
+        return np.asarray(y, dtype=np.float64)
+
+    def predict_row(self, features: Mapping) -> float:
+        """Single-row output from a mapping of scalars, evaluated without array overhead"""
+        z = self.intercept
+        post = 0.0
+        for name, default, transform, offset, scale, lo, hi, weight, is_post in self._plan:
+            x = (features.get(name, default) + offset) * scale
+            if transform:
+                x = _SCALAR_TRANSFORMS[transform](x)
+            if lo is not None and x < lo:
+                x = lo
+            if hi is not None and x > hi:
+                x = hi
+            if is_post:
+                post += weight * x
+            else:
+                z += weight * x
+        if self.trees is not None:
+            z += self.trees.predict_row([features.get(name, default)
+                                         for name, default in zip(self.features, self.defaults)])
+        y = z * self.output_scale
+        if self.link == 1:
+            y = 1 / (1 + math.exp(-y))
+        y += post
+        lo, hi = self._clip
+        if lo is not None and y < lo:
+            y = lo
+        if hi is not None and y > hi:
+            y = hi
+        return float(y)
+
+def linear_terms(specs: Sequence[Dict], features: Sequence[str]) -> Dict[str, np.ndarray]:
+    """Term arrays from readable specs: ``{'feature', 'weight', 'transform', 'offset', 'scale', 'lo', 'hi', 'post'}``"""
+    return {
+        'term_feature': [features.index(spec['feature']) for spec in specs],
+        'term_transform': [TRANSFORMS.index(spec.get('transform', 'identity')) for spec in specs],
+        'term_offset': [spec.get('offset', 0.0) for spec in specs],
+        'term_scale': [spec.get('scale', 1.0) for spec in specs],
+        'term_lo': [spec.get('lo', -np.inf) for spec in specs],
+        'term_hi': [spec.get('hi', np.inf) for spec in specs],
+        'term_weight': [spec.get('weight', 1.0) for spec in specs],
+        'term_post': [int(spec.get('post', False)) for spec in specs],
+    }
+
+def _jsonable(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def save_models(models: Mapping[str, CompiledModel], directory: str, version: Optional[str] = None):
+    """Write models as a manifest plus one .npy file per array"""
+    os.makedirs(directory, exist_ok=True)
+    manifest = {'format': RUNTIME_FORMAT, 'version': version, 'created': datetime.now().isoformat(), 'models': {}}
+    for key, model in models.items():
+        arrays = {'defaults': model.defaults, **model.terms}
+        entry = {
+            'name': model.name,
+            'features': model.features,
+            'intercept': model.intercept,
+            'output_scale': model.output_scale,
+            'link': LINKS[model.link],
+            'output_clip': list(model.output_clip),
+            'metadata': {k: _jsonable(v) for k, v in model.metadata.items()},
+        }
+        if model.trees is not None:
+            arrays.update({f'tree_{name}': getattr(model.trees, name) for name in TreeEnsemble.ARRAYS})
+            entry['learning_rate'] = model.trees.learning_rate
+        entry['arrays'] = {}
+        for name, values in arrays.items():
+            filename = f'{key}.{name}.npy'
+            np.save(os.path.join(directory, filename), np.ascontiguousarray(values))
+            entry['arrays'][name] = filename
+        manifest['models'][key] = entry
+    with open(os.path.join(directory, MANIFEST_FILE), 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+def load_models(directory: str) -> Dict[str, CompiledModel]:
+    """Load a saved model set; arrays are memory-mapped read-only, not copied"""
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != RUNTIME_FORMAT:
+        raise ValueError(f"Unsupported model artifact format: {manifest.get('format')}")
+
+    models = {}
+    for key, entry in manifest['models'].items():
+        arrays = {name: np.load(os.path.join(directory, filename), mmap_mode='r')
+                  for name, filename in entry['arrays'].items()}
+        trees = None
+        if 'tree_roots' in arrays:
+            trees = TreeEnsemble(*(arrays[f'tree_{name}'] for name in TreeEnsemble.ARRAYS),
+                                 learning_rate=entry.get('learning_rate', 1.0))
+        metadata = dict(entry.get('metadata', {}))
+        metadata.setdefault('version', manifest.get('version'))
+        models[key] = CompiledModel(
+            entry['name'], entry['features'], arrays['defaults'],
+            terms={name: arrays[name] for name in CompiledModel.TERM_ARRAYS if name in arrays},
+            intercept=entry['intercept'], output_scale=entry['output_scale'], link=entry['link'],
+            output_clip=entry['output_clip'], trees=trees, metadata=metadata,
+        )
+    return models
+
+def model_names(directory: str) -> List[str]:
+    with open(os.path.join(directory, MANIFEST_FILE)) as f:
+        return list(json.load(f)['models'])
+
+def latest_artifact(root: str = DEFAULT_MODEL_DIR) -> Optional[str]:
+    """Directory of the active model version under ``root``, or None if nothing is published"""
+    try:
+        with open(os.path.join(root, LATEST_FILE)) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    directory = os.path.join(root, version)
+    return directory if version and os.path.exists(os.path.join(directory, MANIFEST_FILE)) else None
+
+def publish(root: str, version: str):
+    """Point LATEST at ``root/version`` (atomic rename, so loaders never see a partial name)"""
+    staging = os.path.join(root, f'.{LATEST_FILE}.tmp')
+    with open(staging, 'w') as f:
+        f.write(version + '\n')
+    os.replace(staging, os.path.join(root, LATEST_FILE))
@@ -0,0 +1,286 @@
+"""
+Vectorized Options Pricing
+Black-Scholes-Merton prices and Greeks for whole option chains in one pass
+"""
+
+import math
+import numpy as np
+from typing import Dict
+
+# Annualized continuously-compounded rate used when the caller does not supply one
+RISK_FREE_RATE = 0.045
+DAYS_PER_YEAR = 365.0
+
+# Floors that keep d1/d2 finite at expiry or zero volatility (prices collapse to intrinsic)
+MIN_TIME = 1e-6
+MIN_VOL = 1e-6
+
+# Contracts priced per block; keeps temporaries cache-resident on large chains
+PRICING_BLOCK = 32768
+
+_INV_SQRT_2PI = 0.3989422804014327
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal density"""
+    return _INV_SQRT_2PI * np.exp(-0.5 * x * x)
+
+# Rational approximation coefficients for norm_cdf, highest power first
+_CDF_NUMERATOR = (3.52624965998911e-02, 0.700383064443688, 6.37396220353165, 33.912866078383,
+                  112.079291497871, 221.213596169931, 220.206867912376)
+_CDF_DENOMINATOR = (8.83883476483184e-02, 1.75566716318264, 16.064177579207, 86.7807322029461,
+                    296.564248779674, 637.333633378831, 793.826512519948, 440.413735824752)
+
+def _horner(z: np.ndarray, coefficients) -> np.ndarray:
+    """Polynomial in ``z`` evaluated in one buffer"""
+    result = z * coefficients[0]
+    result += coefficients[1]
+    for coefficient in coefficients[2:]:
+        result *= z
+        result += coefficient
+    return result
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal CDF to double precision (Hart 1968, as given by West 2005).
+
+    Pure NumPy so pricing does not depend on SciPy; absolute error is below 1e-14.
+    Polynomials are evaluated in place and the continued-fraction tail only for
+    |x| >= 7.07, which keeps large batches free of temporaries.
+    """
+    x = np.asarray(x, dtype=float)
+    if x.ndim == 0:
+        # Single values skip the array machinery; erfc is exact to double precision
+        value = float(x)
+        return np.asarray(0.5 * math.erfc(-value / math.sqrt(2)) if value == value else 0.0)
+    z = np.abs(x)
+    e = z * z
+    e *= -0.5
+    np.exp(e, out=e)
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        lower = _horner(z, _CDF_NUMERATOR)
+        lower *= e
+        lower /= _horner(z, _CDF_DENOMINATOR)
+
+    far = ~(z < 7.07106781186547)
+    if far.any():
+        z_far = z[far]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            fraction = z_far + 1 / (z_far + 2 / (z_far + 3 / (z_far + 4 / (z_far + 0.65))))
+            lower[far] = np.where(z_far < 37, e[far] / fraction / 2.506628274631, 0.0)
+    return np.where(x > 0, 1 - lower, lower)
+
+def _price_block(spot, strike, expiry_days, iv, is_call, rate, dividend_yield) -> Dict[str, np.ndarray]:
+    """Black-Scholes-Merton prices and Greeks for equal-shaped arrays"""
+    t = np.maximum(expiry_days / DAYS_PER_YEAR, MIN_TIME)
+    sigma = np.maximum(iv, MIN_VOL)
+    sqrt_t = np.sqrt(t)
+    sigma_sqrt_t = sigma * sqrt_t
+    sign = np.where(is_call, 1.0, -1.0)
+
+    dividend_discount = np.exp(-dividend_yield * t)
+    carry = dividend_discount * spot
+    discount = np.exp(-rate * t) * strike
+
+    d1 = (np.log(spot / strike) + (rate - dividend_yield + 0.5 * sigma * sigma) * t) / sigma_sqrt_t
+    d2 = d1 - sigma_sqrt_t
+    cdf_d1 = norm_cdf(sign * d1)
+    cdf_d2 = norm_cdf(sign * d2)
+    pdf_d1 = norm_pdf(d1)
+
+    premium = np.maximum(sign * (carry * cdf_d1 - discount * cdf_d2), 0.0)
+    decay = -carry * pdf_d1 * sigma / (2 * sqrt_t)
+    theta = decay - sign * rate * discount * cdf_d2 + sign * dividend_yield * carry * cdf_d1
+    intrinsic = np.maximum(sign * (spot - strike), 0.0)
+
+    return {
+        'premium': premium,
+        'delta': sign * dividend_discount * cdf_d1,
+        'gamma': dividend_discount * pdf_d1 / (spot * sigma_sqrt_t),
+        'theta': theta / DAYS_PER_YEAR,
+        'vega': carry * pdf_d1 * sqrt_t / 100,
+        'rho': sign * discount * t * cdf_d2 / 100,
+        'intrinsic_value': intrinsic,
+        'time_value': premium - intrinsic,
+        'break_even': strike + sign * premium,
+    }
+
+def black_scholes_chain(spot, strike, expiry_days, iv, is_call,
+                        rate: float = RISK_FREE_RATE, dividend_yield: float = 0.0) -> Dict[str, np.ndarray]:
+    """Price a chain of European options and their Greeks in a single vectorized pass.
+
+    All arguments broadcast against each other, so a flat chain (one entry per
+    contract) and a strikes x expiries x IVs grid work the same way. ``iv``,
+    ``rate`` and ``dividend_yield`` are annualized decimals; ``expiry_days`` is in
+    calendar days. Theta is per calendar day; vega and rho are per 1 point (1%).
+    """
+    arrays = np.broadcast_arrays(
+        np.asarray(spot, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(expiry_days, dtype=float), np.asarray(iv, dtype=float),
+        np.asarray(is_call, dtype=bool), np.asarray(rate, dtype=float),
+        np.asarray(dividend_yield, dtype=float),
+    )
+    shape = arrays[0].shape
+    size = arrays[0].size
+    if size <= PRICING_BLOCK:
+        return _price_block(*arrays)
+
+    flat = [np.ravel(a) for a in arrays]
+    results = None
+    for start in range(0, size, PRICING_BLOCK):
+        block = slice(start, start + PRICING_BLOCK)
+        priced = _price_block(*(a[block] for a in flat))
+        if results is None:
+            results = {key: np.empty(size) for key in priced}
+        for key, values in priced.items():
+            results[key][block] = values
+    return {key: values.reshape(shape) for key, values in results.items()}
+
+def _premium_and_vega(spot, strike, t, sigma, sign, rate, dividend_yield):
+    """Lean BSM premium plus raw vega (per 1.00 of vol) for the IV solver"""
+    sqrt_t = np.sqrt(t)
+    sigma_sqrt_t = sigma * sqrt_t
+    carry = np.exp(-dividend_yield * t) * spot
+    discount = np.exp(-rate * t) * strike
+    d1 = (np.log(spot / strike) + (rate - dividend_yield + 0.5 * sigma * sigma) * t) / sigma_sqrt_t
+    d2 = d1 - sigma_sqrt_t
+    premium = sign * (carry * norm_cdf(sign * d1) - discount * norm_cdf(sign * d2))
+    return premium, carry * norm_pdf(d1) * sqrt_t
+
+def option_premium(spot, strike, expiry_days, iv, is_call,
+                   rate: float = RISK_FREE_RATE, dividend_yield: float = 0.0) -> np.ndarray:
+    """BSM premium only (no Greeks) for broadcastable inputs; for repricing paths and grids"""
+    spot, strike, expiry_days, iv, is_call = np.broadcast_arrays(
+        np.asarray(spot, dtype=float), np.asarray(strike, dtype=float),
+        np.asarray(expiry_days, dtype=float), np.asarray(iv, dtype=float), np.asarray(is_call, dtype=bool)
+    )
+    t = np.maximum(expiry_days / DAYS_PER_YEAR, MIN_TIME)
+    sign = np.where(is_call, 1.0, -1.0)
+    premium, _ = _premium_and_vega(spot, strike, t, np.maximum(iv, MIN_VOL), sign, rate, dividend_yield)
+    return np.maximum(premium, 0.0)
+
+def implied_volatility(price, spot, strike, expiry_days, is_call,
+                       rate: float = RISK_FREE_RATE, dividend_yield: float = 0.0,
+                       tol: float = 1e-8, max_iter: int = 100,
+                       min_vol: float = 1e-4, max_vol: float = 5.0) -> Dict[str, np.ndarray]:
+    """Back implied volatility out of option prices for a whole chain at once.
+
+    Each contract is solved on its out-of-the-money side (ITM prices are mapped
+    through put-call parity), starting from the Corrado-Miller estimate. Newton
+    steps are taken while they stay inside a per-contract [low, high] bracket and
+    bisection is used otherwise, so every contract either converges or is flagged.
+
+    Returns ``iv`` (annualized decimal, NaN where unsolved), a boolean
+    ``converged`` mask and the ``iterations`` each contract needed.
+    """
+    arrays = np.broadcast_arrays(
+        np.asarray(price, dtype=float), np.asarray(spot, dtype=float),
+        np.asarray(strike, dtype=float), np.asarray(expiry_days, dtype=float),
+        np.asarray(is_call, dtype=bool), np.asarray(rate, dtype=float),
+        np.asarray(dividend_yield, dtype=float),
+    )
+    shape = arrays[0].shape
+    price, spot, strike, expiry_days, is_call, rate, dividend_yield = (np.ravel(a) for a in arrays)
+    n = len(price)
+
+    t = np.maximum(expiry_days / DAYS_PER_YEAR, MIN_TIME)
+    carry = np.exp(-dividend_yield * t) * spot
+    discount = np.exp(-rate * t) * strike
+
+    # Solve on the OTM side: parity-convert ITM quotes to the other option type
+    otm_call = strike >= carry * np.exp(rate * t)
+    parity = np.where(is_call, -1.0, 1.0) * (carry - discount)
+    target = np.where(is_call == otm_call, price, price + parity)
+    sign = np.where(otm_call, 1.0, -1.0)
+
+    # Quotes outside the no-arbitrage bounds, or with no measurable time value, are unsolvable
+    upper = np.where(otm_call, carry, discount)
+    valid = (np.isfinite(target) & (target > 1e-9 * spot) & (target < upper)
+             & (spot > 0) & (strike > 0))
+
+    # Corrado-Miller initial guess (on the equivalent call price)
+    call_price = np.where(otm_call, target, target + carry - discount)
+    half_gap = (carry - discount) / 2
+    root = np.maximum((call_price - half_gap) ** 2 - (carry - discount) ** 2 / np.pi, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        guess = np.sqrt(2 * np.pi / t) / (carry + discount) * (call_price - half_gap + np.sqrt(root))
+    sigma = np.clip(np.where(np.isfinite(guess) & (guess > 0), guess, 0.3), min_vol * 10, max_vol / 2)
+
+    low = np.full(n, min_vol)
+    high = np.full(n, max_vol)
+    converged = np.zeros(n, dtype=bool)
+    iterations = np.zeros(n, dtype=np.int64)
+    active = np.flatnonzero(valid)
+
+    for _ in range(max_iter):
+        if not len(active):
+            break
+        s = sigma[active]
+        premium, vega = _premium_and_vega(
+            spot[active], strike[active], t[active], s, sign[active],
+            rate[active], dividend_yield[active],
+        )
+        diff = premium - target[active]
+        iterations[active] += 1
+
+        done = np.abs(diff) <= np.maximum(tol * target[active], 1e-12)
+        converged[active[done]] = True
+
+        # Tighten the bracket around the root (price is increasing in sigma)
+        too_high = diff > 0
+        high[active] = np.where(too_high, s, high[active])
+        low[active] = np.where(too_high, low[active], s)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = s - diff / vega
+        lo, hi = low[active], high[active]
+        safe = np.isfinite(newton) & (newton > lo) & (newton < hi)
+        sigma[active] = np.where(done, s, np.where(safe, newton, 0.5 * (lo + hi)))
+
+        # A collapsed bracket means the price is as close as float precision allows
+        collapsed = (hi - lo) <= 1e-12 * np.maximum(hi, 1.0)
+        converged[active[collapsed & ~done]] = True
+        active = active[~(done | collapsed)]
+
+    iv = np.where(converged, sigma, np.nan)
+    return {
+        'iv': iv.reshape(shape),
+        'converged': converged.reshape(shape),
+        'iterations': iterations.reshape(shape),
+    }
+
+def atm_implied_volatility(spot: float, strikes, expiry_days, is_call, prices,
+                           min_days: int = 7, rate: float = RISK_FREE_RATE,
+                           dividend_yield: float = 0.0) -> float:
+    """Representative at-the-money IV: median solved IV at the strikes nearest spot
+    in the nearest expiry with at least ``min_days`` to go (NaN if none solve)"""
+    strikes, expiry_days, is_call, prices = (np.asarray(a) for a in (strikes, expiry_days, is_call, prices))
+    eligible = expiry_days >= min_days
+    if not eligible.any():
+        eligible = expiry_days > 0
+    if not eligible.any():
+        return float('nan')
+
+    expiry = expiry_days[eligible].min()
+    in_expiry = np.flatnonzero(eligible & (expiry_days == expiry))
+    distance = np.abs(strikes[in_expiry] - spot)
+    nearest = in_expiry[distance <= np.partition(distance, min(3, len(distance) - 1))[min(3, len(distance) - 1)]]
+
+    solved = implied_volatility(prices[nearest], spot, strikes[nearest], expiry_days[nearest],
+                                is_call[nearest], rate, dividend_yield)
+    ivs = solved['iv'][solved['converged']]
+    return float(np.median(ivs)) if len(ivs) else float('nan')
+
+def iv_rank_percentile(current_iv: float, iv_history) -> Dict[str, float]:
+    """IV rank (position within the historical range) and IV percentile
+    (share of history below the current value), both on a 0-100 scale"""
+    history = np.asarray(iv_history, dtype=float)
+    history = history[np.isfinite(history)]
+    if not len(history) or not np.isfinite(current_iv):
+        return {'iv_rank': 50.0, 'iv_percentile': 50.0}
+
+    low, high = history.min(), history.max()
+    rank = 100 * (current_iv - low) / (high - low) if high > low else 50.0
+    return {
+        'iv_rank': float(np.clip(rank, 0, 100)),
+        'iv_percentile': float(100 * np.mean(history < current_iv)),
+    }
@@ -0,0 +1,181 @@
+"""
+Portfolio Risk
+Portfolio-level Greek/risk aggregation and budgeted position sizing across tickers
+"""
+
+import numpy as np
+from typing import Dict, Optional
+
+from metrics import metrics
+from options_pricing import black_scholes_chain
+from probability import CONTRACT_MULTIPLIER
+from recommendation_engine import STOCK_TRADE_CODES, TRADE_TYPE_CODES, RecommendationBatch, RiskLevel, TradeType
+
+# Total and per-ticker max risk as a fraction of the account, per risk level
+PORTFOLIO_LIMITS = {
+    RiskLevel.CONSERVATIVE: {'portfolio_risk_pct': 0.10, 'ticker_risk_pct': 0.03},
+    RiskLevel.MODERATE: {'portfolio_risk_pct': 0.20, 'ticker_risk_pct': 0.06},
+    RiskLevel.AGGRESSIVE: {'portfolio_risk_pct': 0.35, 'ticker_risk_pct': 0.12},
+    RiskLevel.SPECULATION: {'portfolio_risk_pct': 0.50, 'ticker_risk_pct': 0.25},
+}
+
+# Option legs per trade type as (is_call, quantity, strike column); types without a
+# template (calendars, whose legs expire apart) keep their stored Greeks, or zero
+LEG_TEMPLATES = {
+    TradeType.CALL_BUY: ((True, 1, 'strike_1'),),
+    TradeType.PUT_BUY: ((False, 1, 'strike_1'),),
+    TradeType.CALL_SPREAD: ((True, 1, 'strike_1'), (True, -1, 'strike_2')),
+    TradeType.PUT_SPREAD: ((False, 1, 'strike_1'), (False, -1, 'strike_2')),
+    TradeType.STRADDLE: ((False, 1, 'strike_1'), (True, 1, 'strike_2')),
+    TradeType.STRANGLE: ((False, 1, 'strike_1'), (True, 1, 'strike_2')),
+    TradeType.IRON_CONDOR: ((False, 1, 'strike_1'), (False, -1, 'strike_2'), (True, -1, 'strike_3'),
+                            (True, 1, 'strike_4')),
+}
+GREEKS = ('delta', 'gamma', 'theta', 'vega')
+# Per-unit exposures PortfolioRisk sums; 'dollar_delta' is delta x underlying price
+EXPOSURES = ('max_risk', 'expected_value', 'dollar_delta') + GREEKS
+
+def unit_exposures(batch: RecommendationBatch) -> Dict[str, np.ndarray]:
+    """Risk, expected value and Greeks of one unit (share or contract) of every row.
+
+    Stock rows carry a delta of +/-1 share. Option rows use their stored Greeks,
+    or reprice their legs from strike, IV and expiry when those are missing (as
+    for straddles and spreads), scaled by CONTRACT_MULTIPLIER. Rows with no
+    usable size or risk get zero exposure.
+    """
+    columns = batch.columns
+    size = columns['position_size'].astype(float)
+    sized = size > 0
+    per_unit = np.where(sized, 1 / np.where(sized, size, 1), 0.0)
+    exposures = {
+        'max_risk': np.nan_to_num(columns['max_risk'] * per_unit),
+        'expected_value': np.nan_to_num(columns['expected_value'] * per_unit),
+    }
+    greeks = {greek: np.nan_to_num(columns[greek]) for greek in GREEKS}
+
+    spot = columns['underlying_price']
+    expiry = columns['expiry_days']
+    iv = columns['implied_volatility'] / 100
+    for trade_type, legs in LEG_TEMPLATES.items():
+        rows = np.flatnonzero((columns['trade_type'] == TRADE_TYPE_CODES[trade_type]) & np.isnan(columns['delta'])
+                              & (spot > 0) & (expiry > 0) & (iv > 0))
+        if not len(rows):
+            continue
+        for greek in GREEKS:
+            greeks[greek][rows] = 0.0
+        for is_call, quantity, strike in legs:
+            priced = black_scholes_chain(spot[rows], columns[strike][rows], expiry[rows], iv[rows], is_call)
+            for greek in GREEKS:
+                greeks[greek][rows] += quantity * np.nan_to_num(priced[greek])
+
+    stock = np.isin(columns['trade_type'], STOCK_TRADE_CODES)
+    scale = np.where(stock, 1.0, CONTRACT_MULTIPLIER) * sized
+    for greek in GREEKS:
+        exposures[greek] = np.where(stock, 0.0, greeks[greek]) * scale
+    exposures['delta'] = np.where(stock, columns['direction'] * sized, exposures['delta'])
+    exposures['dollar_delta'] = np.nan_to_num(exposures['delta'] * spot)
+    return exposures
+
+class PortfolioRisk:
+    """Running totals of risk and Greeks over the rows of a RecommendationBatch.
+
+    ``quantity`` holds the units held per row. ``add`` and ``remove`` adjust one
+    row and update ``totals`` and the per-ticker risk/delta in O(1), so a
+    position can be resized without re-aggregating the portfolio.
+    """
+
+    def __init__(self, batch: RecommendationBatch, quantity: Optional[np.ndarray] = None):
+        self.batch = batch
+        self.units = unit_exposures(batch)
+        self.ticker_index = batch.columns['ticker_index']
+        if quantity is None:
+            quantity = batch.columns['position_size']
+        self.quantity = np.asarray(quantity, dtype=float).copy()
+        self.totals = {name: float(self.quantity @ self.units[name]) for name in EXPOSURES}
+        self.ticker_risk = np.bincount(self.ticker_index, self.quantity * self.units['max_risk'],
+                                       minlength=len(batch.tickers))
+        self.ticker_delta = np.bincount(self.ticker_index, self.quantity * self.units['delta'],
+                                        minlength=len(batch.tickers))
+
+    def add(self, row: int, quantity: Optional[float] = None) -> Dict[str, float]:
+        """Add ``quantity`` units of ``row`` (its batch position size by default)"""
+        if quantity is None:
+            quantity = float(self.batch.columns['position_size'][row])
+        self.quantity[row] += quantity
+        for name in EXPOSURES:
+            self.totals[name] += quantity * self.units[name][row]
+        ticker = self.ticker_index[row]
+        self.ticker_risk[ticker] += quantity * self.units['max_risk'][row]
+        self.ticker_delta[ticker] += quantity * self.units['delta'][row]
+        return self.totals
+
+    def remove(self, row: int) -> Dict[str, float]:
+        """Close out ``row`` entirely"""
+        return self.add(row, -self.quantity[row])
+
+    def ticker_summary(self, ticker: str) -> Dict[str, float]:
+        row = int(np.flatnonzero(self.batch.tickers == ticker)[0])
+        return {'max_risk': float(self.ticker_risk[row]), 'delta': float(self.ticker_delta[row])}
+
+def _fill(order: np.ndarray, requested: np.ndarray, limit, groups: Optional[np.ndarray] = None) -> np.ndarray:
+    """Greedy fill of ``requested`` risk in ``order`` up to ``limit`` (per group when given)"""
+    wanted = requested[order]
+    before = np.cumsum(wanted) - wanted
+    if groups is not None:
+        group = groups[order]
+        starts = np.r_[0, np.flatnonzero(np.diff(group)) + 1]
+        before -= np.repeat(before[starts], np.diff(np.r_[starts, len(order)]))
+    filled = np.empty_like(requested)
+    filled[order] = np.clip(limit - before, 0.0, wanted)
+    return filled
+
+@metrics.timed('portfolio.size')
+def size_portfolio(batch: RecommendationBatch, risk_budget: float, ticker_limit: Optional[float] = None,
+                   key: str = 'expected_value') -> RecommendationBatch:
+    """Resize a batch so total max risk fits ``risk_budget`` and each ticker fits ``ticker_limit``.
+
+    Rows are filled greedily by ``key`` per dollar of max risk (expected return
+    on risk by default, confidence breaking ties), first within each ticker's
+    limit and then against the total budget, both as cumulative sums over the
+    ranked rows. Sizes never grow past the batch's own and are rounded down to
+    whole units; rows left with no units are dropped. Max risk, max reward and
+    expected value are rescaled to the new sizes.
+    """
+    try:
+        columns = batch.columns
+        metrics.record_batch('portfolio.size', len(batch))
+        size = columns['position_size'].astype(float)
+        unit_risk = unit_exposures(batch)['max_risk']
+        usable = (size > 0) & (unit_risk > 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            score = columns[key] / columns['max_risk']
+        score = np.where(usable & np.isfinite(score), score, -np.inf)
+        order = np.lexsort((-columns['confidence_score'], -score))
+        order = order[usable[order]]
+
+        requested = np.where(usable, size * unit_risk, 0.0)
+        if ticker_limit is not None:
+            by_ticker = order[np.argsort(columns['ticker_index'][order], kind='stable')]
+            requested = _fill(by_ticker, requested, ticker_limit, columns['ticker_index'])
+            requested = np.floor(requested / np.where(usable, unit_risk, 1) + 1e-9) * unit_risk
+        units = np.floor(_fill(order, requested, risk_budget) / np.where(usable, unit_risk, 1) + 1e-9)
+
+        rows = np.flatnonzero(units > 0)
+        sized = batch.take(rows)
+        scale = units[rows] / size[rows]
+        sized.columns['position_size'] = units[rows].astype(sized.columns['position_size'].dtype)
+        for name in ('max_risk', 'max_reward', 'expected_value'):
+            sized.columns[name] = sized.columns[name] * scale
+        return sized
+
+    except Exception as e:
+        print(f"Error sizing portfolio: {e}")
+        metrics.record_error('portfolio.size')
+        return batch
+
+def size_recommendations(batch: RecommendationBatch, account_size: float = 100000,
+                         risk_level: RiskLevel = RiskLevel.MODERATE) -> RecommendationBatch:
+    """``size_portfolio`` with the PORTFOLIO_LIMITS of ``risk_level``"""
+    limits = PORTFOLIO_LIMITS[risk_level]
+    return size_portfolio(batch, account_size * limits['portfolio_risk_pct'],
+                          account_size * limits['ticker_risk_pct'])
@@ -0,0 +1,359 @@
+"""
+Probability of Profit Engine
+Lognormal POP and expected value: closed form where it exists, shared-path Monte Carlo otherwise
+"""
+
+import math
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from options_pricing import DAYS_PER_YEAR, MIN_TIME, MIN_VOL, RISK_FREE_RATE, norm_cdf, option_premium
+
+# Stock ideas are quoted as '2-4 weeks'; they are held (and scored) over this many calendar days
+STOCK_HORIZON_DAYS = 28
+# Annualized volatility (decimal) assumed when a trade carries none
+DEFAULT_VOLATILITY = 0.30
+CONTRACT_MULTIPLIER = 100
+
+# Terminal-price paths per simulation (antithetic pairs, so kept even)
+DEFAULT_PATHS = 20000
+# Positions scored per pass; bounds the (positions x paths) P&L matrix
+SIMULATION_BLOCK = 128
+
+# Simple structures with a closed form (``structure_odds`` / ``structure_odds_batch``)
+STRUCTURES = ('stock', 'call', 'put', 'straddle', 'call_spread', 'put_spread')
+STOCK, CALL, PUT, STRADDLE, CALL_SPREAD, PUT_SPREAD = range(len(STRUCTURES))
+
+# Leg kinds for simulated positions
+LEG_KINDS = ('stock', 'call', 'put')
+LEG_STOCK, LEG_CALL, LEG_PUT = range(len(LEG_KINDS))
+
+def _lognormal(spot, vol, days, drift):
+    """Mean and standard deviation of log(S_T)"""
+    t = np.maximum(np.asarray(days, dtype=float) / DAYS_PER_YEAR, MIN_TIME)
+    sigma = np.maximum(np.asarray(vol, dtype=float), MIN_VOL)
+    sd = sigma * np.sqrt(t)
+    return np.log(spot) + (drift - 0.5 * sigma * sigma) * t, sd, t
+
+def _expected_call(mean, sd, forward, strike):
+    """Undiscounted E[(S_T - K)+] from the log-price moments"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Zero strikes (stock legs) give d = inf and the forward as the call value
+        d2 = (mean - np.log(strike)) / sd
+        return np.maximum(forward * norm_cdf(d2 + sd) - strike * norm_cdf(d2), 0.0)
+
+def expected_payoffs(spot, strike, vol, days, drift: float = RISK_FREE_RATE) -> Tuple[np.ndarray, np.ndarray]:
+    """Undiscounted E[(S_T - K)+] and E[(K - S_T)+] under drift ``drift`` (put by parity)"""
+    mean, sd, t = _lognormal(spot, vol, days, drift)
+    strike = np.asarray(strike, dtype=float)
+    forward = spot * np.exp(drift * t)
+    call = _expected_call(mean, sd, forward, strike)
+    return call, np.maximum(call - forward + strike, 0.0)
+
+def _ncdf(x: float) -> float:
+    return 0.5 * math.erfc(-x / math.sqrt(2))
+
+def structure_odds(structure: int, spot: float, vol: float, days: float, cost: float,
+                   strike_1: float = 0.0, strike_2: float = 0.0, direction: int = 1,
+                   drift: float = RISK_FREE_RATE) -> Tuple[float, float]:
+    """POP and expected P&L per unit for one simple position, in plain floats.
+
+    The per-ticker generators score a handful of trades per call, where array
+    set-up would dominate, so this evaluates the lognormal formulas with
+    ``math``. ``structure`` codes (see STRUCTURES):
+
+    * stock: ``direction`` +1 long / -1 short, ``cost`` is the entry price
+    * call / put: long option at ``strike_1`` bought for ``cost``
+    * straddle: long put at ``strike_1`` plus call at ``strike_2`` (equal
+      strikes for a straddle) for a combined ``cost``
+    * call / put spread: long ``strike_1``, short ``strike_2``, net debit ``cost``
+
+    Targets and stops are not modelled; positions are marked at the horizon.
+    """
+    t = max(days / DAYS_PER_YEAR, MIN_TIME)
+    sigma = max(vol, MIN_VOL)
+    sd = sigma * math.sqrt(t)
+    mean = math.log(spot) + (drift - 0.5 * sigma * sigma) * t
+    forward = spot * math.exp(drift * t)
+
+    def above(level):
+        return 1.0 if level <= 0 else _ncdf((mean - math.log(level)) / sd)
+
+    def call(strike):
+        d2 = (mean - math.log(strike)) / sd
+        return max(forward * _ncdf(d2 + sd) - strike * _ncdf(d2), 0.0)
+
+    def put(strike):
+        return max(call(strike) - forward + strike, 0.0)
+
+    if structure == STOCK:
+        pop = above(cost) if direction >= 0 else 1 - above(cost)
+        return pop, (forward - cost) * (1 if direction >= 0 else -1)
+    if structure == CALL:
+        return above(strike_1 + cost), call(strike_1) - cost
+    if structure == PUT:
+        return 1 - above(strike_1 - cost), put(strike_1) - cost
+    if structure == CALL_SPREAD:
+        pop = above(strike_1 + cost) if strike_1 + cost < strike_2 else 0.0
+        return pop, call(strike_1) - call(strike_2) - cost
+    if structure == PUT_SPREAD:
+        pop = 1 - above(strike_1 - cost) if strike_1 - cost > strike_2 else 0.0
+        return pop, put(strike_1) - put(strike_2) - cost
+    lower = strike_1 - cost
+    pop = (1 - above(lower) if lower > 0 else 0.0) + above(strike_2 + cost)
+    return pop, call(strike_2) + put(strike_1) - cost
+
+def structure_odds_batch(structure, spot, vol, days, cost, strike_1, strike_2, direction=1,
+                         drift: float = RISK_FREE_RATE) -> Tuple[np.ndarray, np.ndarray]:
+    """Columnar ``structure_odds``: one row per position, same codes and conventions.
+
+    Every structure profits above one level and/or below another, so POP is two
+    CDFs per row; EV is at most two expected calls (puts by parity). Rows with
+    a missing strike the structure needs come back NaN.
+    """
+    structure = np.asarray(structure)
+    spot = np.asarray(spot, dtype=float)
+    cost = np.asarray(cost, dtype=float)
+    strike_1 = np.asarray(strike_1, dtype=float)
+    strike_2 = np.asarray(strike_2, dtype=float)
+    mean, sd, t = _lognormal(spot, vol, days, drift)
+    forward = spot * np.exp(drift * t)
+    stock = structure == STOCK
+    short = stock & (np.asarray(direction) < 0)
+    two_strike = (structure == STRADDLE) | (structure == CALL_SPREAD) | (structure == PUT_SPREAD)
+
+    # Profit when S_T > upper or S_T < lower (inf / 0 switch a side off)
+    upper = np.select([stock & ~short, structure == CALL, structure == STRADDLE, structure == CALL_SPREAD],
+                      [cost, strike_1 + cost, strike_2 + cost,
+                       np.where(strike_1 + cost < strike_2, strike_1 + cost, np.inf)], np.inf)
+    lower = np.select([short, (structure == PUT) | (structure == STRADDLE), structure == PUT_SPREAD],
+                      [cost, strike_1 - cost, np.where(strike_1 - cost > strike_2, strike_1 - cost, 0.0)], 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pop = norm_cdf((mean - np.log(np.maximum(upper, 0.0))) / sd) + \
+            norm_cdf((np.log(np.maximum(lower, 0.0)) - mean) / sd)
+
+    # Options: call(K1) [+/- call(K2)] with puts rewritten as call - forward + strike
+    ev = _expected_call(mean, sd, forward, strike_1) - cost
+    ev -= np.where((structure == PUT) | (structure == STRADDLE), forward - strike_1, 0.0)
+    second = _expected_call(mean, sd, forward, strike_2)
+    ev += np.select([structure == STRADDLE, structure == CALL_SPREAD, structure == PUT_SPREAD],
+                    [second, -second, strike_1 - strike_2 - second], 0.0)
+    ev = np.where(stock, np.where(short, -1.0, 1.0) * (forward - cost), ev)
+    return pop, np.where(stock | ~two_strike | np.isfinite(strike_2), ev, np.nan)
+
+def _padded_legs(n: int, legs: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Legs as (max legs, positions) matrices; stock legs become zero-strike calls, padding has zero quantity"""
+    position = np.asarray(legs['position'], dtype=np.int64)
+    order = np.argsort(position, kind='stable')
+    position = position[order]
+    starts = np.searchsorted(position, np.arange(n))
+    slot = np.arange(len(position)) - starts[position]
+    width = int(slot.max()) + 1 if len(slot) else 1
+    kind = np.asarray(legs['kind'], dtype=np.int8)[order]
+    matrices = {
+        'strike': np.zeros((width, n)),
+        'quantity': np.zeros((width, n)),
+        'is_call': np.ones((width, n), dtype=bool),
+    }
+    matrices['strike'][slot, position] = np.where(kind == LEG_STOCK, 0.0, np.asarray(legs['strike'], dtype=float)[order])
+    matrices['quantity'][slot, position] = np.asarray(legs['quantity'], dtype=float)[order]
+    matrices['is_call'][slot, position] = kind != LEG_PUT
+    return matrices
+
+def _pnl_at(prices: np.ndarray, strike, quantity, is_call, cost) -> np.ndarray:
+    """Expiry P&L per unit at (points, positions) prices"""
+    pnl = np.repeat(-cost[None, :], len(prices), axis=0)
+    for leg in range(len(strike)):
+        payoff = np.where(is_call[leg], prices - strike[leg], strike[leg] - prices)
+        np.maximum(payoff, 0.0, out=payoff)
+        payoff *= quantity[leg]
+        pnl += payoff
+    return pnl
+
+def expiry_analytic(positions: Dict[str, np.ndarray], legs: Dict[str, np.ndarray],
+                    drift: float = RISK_FREE_RATE) -> Tuple[np.ndarray, np.ndarray]:
+    """Exact lognormal POP and expected P&L for positions whose legs all expire at the horizon.
+
+    Expiry P&L is piecewise linear in the terminal price with kinks at the
+    strikes, so the profitable set is a union of intervals found from the P&L
+    at each kink and the slope beyond the last one. POP sums the lognormal
+    probability of those intervals and EV sums each leg's expected payoff, so
+    spreads, strangles and condors cost O(legs^2) array work and no paths.
+    The normal CDF is only evaluated at finite interval ends and option legs.
+    """
+    spot = np.asarray(positions['spot'], dtype=float)
+    vol = np.asarray(positions['vol'], dtype=float)
+    days = np.asarray(positions['days'], dtype=float)
+    cost = np.asarray(positions['cost'], dtype=float)
+    n = len(spot)
+    m = _padded_legs(n, legs)
+    strike, quantity, is_call = m['strike'], m['quantity'], m['is_call']
+    mean, sd, t = _lognormal(spot, vol, days, drift)
+
+    points = np.concatenate([np.zeros((1, n)), np.sort(strike, axis=0)])
+    pnl = _pnl_at(points, strike, quantity, is_call, cost)
+    slope = np.where(is_call, quantity, 0.0).sum(axis=0)
+
+    # Profitable intervals between kinks, then beyond the last kink: P&L = last + slope * (S - kink)
+    lo, hi = points[:-1], points[1:]
+    p_lo, p_hi = pnl[:-1], pnl[1:]
+    last, kink = pnl[-1], points[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        root = lo + (hi - lo) * p_lo / (p_lo - p_hi)
+        cross = kink - last / slope
+    start = np.concatenate([np.where(p_lo > 0, lo, np.where(p_hi > 0, root, hi)),
+                            np.where(last > 0, kink, np.where(slope > 0, cross, np.inf))[None]])
+    end = np.concatenate([np.where(p_hi > 0, hi, np.where(p_lo > 0, root, lo)),
+                          np.where((last > 0) & (slope < 0), cross, np.inf)[None]])
+
+    # POP = sum of P(S_T < end) - P(S_T < start) over non-empty intervals
+    open_ = end > start
+    rows = np.nonzero(open_)[1]
+    levels = np.concatenate([end[open_], start[open_]])
+    owner = np.concatenate([rows, rows])
+    below = (levels == np.inf).astype(float)
+    inside = (levels > 0) & np.isfinite(levels)
+    below[inside] = norm_cdf((np.log(levels[inside]) - mean[owner[inside]]) / sd[owner[inside]])
+    below[len(rows):] *= -1
+    pop = np.clip(np.bincount(owner, below, minlength=n), 0.0, 1.0)
+
+    # EV: stock legs are worth the forward, option legs their expected payoff
+    forward = spot * np.exp(drift * t)
+    leg_position = np.asarray(legs['position'], dtype=np.int64)
+    leg_kind = np.asarray(legs['kind'])
+    value = forward[leg_position]
+    options = np.flatnonzero(leg_kind != LEG_STOCK)
+    if len(options):
+        owner = leg_position[options]
+        call, put = expected_payoffs(spot[owner], np.asarray(legs['strike'], dtype=float)[options],
+                                     vol[owner], days[owner], drift)
+        value[options] = np.where(leg_kind[options] == LEG_CALL, call, put)
+    ev = np.bincount(leg_position, np.asarray(legs['quantity'], dtype=float) * value, minlength=n) - cost
+    return pop, ev
+
+class PathSet:
+    """Standard normal draws shared by every simulation in a scoring pass.
+
+    Draws come in antithetic pairs (z, -z), which halves the variance of the
+    symmetric part of any payoff. All positions on the same underlying, horizon
+    and volatility are priced on one set of terminal prices, and different
+    groups reuse the same draws (common random numbers keep rankings stable).
+    """
+
+    def __init__(self, paths: int = DEFAULT_PATHS, seed: Optional[int] = 0):
+        half = max(1, paths // 2)
+        z = np.random.default_rng(seed).standard_normal(half)
+        self.z = np.concatenate([z, -z])
+
+    def __len__(self) -> int:
+        return len(self.z)
+
+    def terminal(self, spot, vol, days, drift: float = RISK_FREE_RATE) -> np.ndarray:
+        """(groups, paths) terminal prices for column vectors of group parameters"""
+        mean, sd, _ = _lognormal(np.asarray(spot, dtype=float), vol, days, drift)
+        return np.exp(mean[:, None] + sd[:, None] * self.z[None, :])
+
+def simulate(positions: Dict[str, np.ndarray], legs: Dict[str, np.ndarray],
+             paths: Optional[PathSet] = None, drift: float = RISK_FREE_RATE,
+             rate: float = RISK_FREE_RATE) -> Tuple[np.ndarray, np.ndarray]:
+    """Monte Carlo POP and expected P&L per unit for arbitrary multi-leg positions.
+
+    ``positions`` columns (one row per position): ``underlying`` (any integer
+    id), ``spot``, ``vol`` (decimal), ``days`` (horizon) and ``cost`` (net
+    debit per unit; negative for a credit). ``legs`` columns: ``position``
+    (row in ``positions``), ``kind`` (LEG_KINDS), ``strike``, ``quantity``
+    (signed units per position unit), ``days`` (leg expiry) and ``vol``.
+
+    Legs expiring at the horizon pay intrinsic value; later legs are marked
+    with Black-Scholes at their remaining time, so calendars are covered.
+    Terminal prices are simulated once per distinct (underlying, spot, vol,
+    horizon) and shared by every position in that group.
+    """
+    paths = paths or PathSet()
+    n = len(positions['spot'])
+    pop = np.full(n, np.nan)
+    ev = np.full(n, np.nan)
+    if not n:
+        return pop, ev
+
+    keys = np.column_stack([np.asarray(positions[name], dtype=float)
+                            for name in ('underlying', 'spot', 'vol', 'days')])
+    groups, group_of = np.unique(keys, axis=0, return_inverse=True)
+    group_of = group_of.ravel()
+    horizon = np.asarray(positions['days'], dtype=float)
+    cost = np.asarray(positions['cost'], dtype=float)
+
+    # Positions are scored in group order, SIMULATION_BLOCK at a time; legs follow their position
+    by_group = np.argsort(group_of, kind='stable')
+    rank = np.empty(n, dtype=np.int64)
+    rank[by_group] = np.arange(n)
+    leg_position = np.asarray(legs['position'], dtype=np.int64)
+    order = np.argsort(rank[leg_position], kind='stable')
+    leg_position = leg_position[order]
+    leg_kind = np.asarray(legs['kind'], dtype=np.int8)[order]
+    leg_strike = np.asarray(legs['strike'], dtype=float)[order]
+    leg_quantity = np.asarray(legs['quantity'], dtype=float)[order]
+    leg_days = np.asarray(legs['days'], dtype=float)[order] if 'days' in legs else horizon[leg_position]
+    leg_vol = np.asarray(legs['vol'], dtype=float)[order] if 'vol' in legs \
+        else np.asarray(positions['vol'], dtype=float)[leg_position]
+    leg_rank = rank[leg_position]
+
+    for start in range(0, n, SIMULATION_BLOCK):
+        members = by_group[start:start + SIMULATION_BLOCK]
+        block_groups, member_group = np.unique(group_of[members], return_inverse=True)
+        terminal = paths.terminal(groups[block_groups, 1], groups[block_groups, 2], groups[block_groups, 3], drift)
+        pnl = np.repeat(-cost[members, None], len(paths), axis=1)
+
+        block = slice(*np.searchsorted(leg_rank, [start, start + SIMULATION_BLOCK]))
+        local = leg_rank[block] - start
+        prices = terminal[member_group.ravel()[local]]
+        kind, strike = leg_kind[block, None], leg_strike[block, None]
+        value = np.where(kind == LEG_STOCK, prices,
+                         np.where(kind == LEG_CALL, np.maximum(prices - strike, 0.0), np.maximum(strike - prices, 0.0)))
+        later = (leg_days[block] > horizon[leg_position[block]]) & (leg_kind[block] != LEG_STOCK)
+        if later.any():
+            remaining = leg_days[block] - horizon[leg_position[block]]
+            value[later] = option_premium(prices[later], strike[later], remaining[later, None],
+                                          leg_vol[block][later, None], kind[later] == LEG_CALL, rate)
+        np.add.at(pnl, local, leg_quantity[block, None] * value)
+
+        pop[members] = (pnl > 0).mean(axis=1)
+        ev[members] = pnl.mean(axis=1)
+    return pop, ev
+
+def score_positions(positions: Dict[str, np.ndarray], legs: Dict[str, np.ndarray],
+                    paths: Optional[PathSet] = None, drift: float = RISK_FREE_RATE,
+                    rate: float = RISK_FREE_RATE) -> Tuple[np.ndarray, np.ndarray]:
+    """POP and expected P&L per unit for a batch of positions (columns as in ``simulate``).
+
+    Positions whose legs all expire at the horizon are priced exactly by
+    ``expiry_analytic``; the rest (calendars, diagonals) go through one shared
+    Monte Carlo pass.
+    """
+    n = len(positions['spot'])
+    pop = np.full(n, np.nan)
+    ev = np.full(n, np.nan)
+    if not n:
+        return pop, ev
+    horizon = np.asarray(positions['days'], dtype=float)
+    position = np.asarray(legs['position'], dtype=np.int64)
+    later = np.zeros(n, dtype=bool)
+    if 'days' in legs:
+        outlives = (np.asarray(legs['days'], dtype=float) > horizon[position]) & \
+                   (np.asarray(legs['kind']) != LEG_STOCK)
+        later[position[outlives]] = True
+
+    for rows, simulated in ((np.flatnonzero(~later), False), (np.flatnonzero(later), True)):
+        if not len(rows):
+            continue
+        remap = np.full(n, -1, dtype=np.int64)
+        remap[rows] = np.arange(len(rows))
+        keep = remap[position] >= 0
+        subset = {name: np.asarray(values)[rows] for name, values in positions.items()}
+        subset_legs = {name: np.asarray(values)[keep] for name, values in legs.items()}
+        subset_legs['position'] = remap[position[keep]]
+        if simulated:
+            pop[rows], ev[rows] = simulate(subset, subset_legs, paths, drift, rate)
+        else:
+            pop[rows], ev[rows] = expiry_analytic(subset, subset_legs, drift)
+    return pop, ev
@@ -0,0 +1,164 @@
+"""
+Recommendation Ranking
+Streaming universe-wide top-K leaderboard with per-type and per-sector quotas
+"""
+
+import heapq
+import time
+import numpy as np
+from itertools import count
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from metrics import metrics
+from recommendation_engine import TRADE_TYPES, RecommendationBatch, TradeRecommendation, TradeType
+
+# Named ranking scores -> TradeRecommendation attribute / RecommendationBatch column
+RANK_KEYS = {
+    'confidence': 'confidence_score',
+    'expected_value': 'expected_value',
+    'risk_reward': 'risk_reward_ratio',
+    'probability': 'probability_of_profit',
+}
+DEFAULT_TOP_K = 50
+UNKNOWN_SECTOR = 'Unknown'
+# Minimum seconds between partial leaderboards from ``stream_leaderboard``
+EMIT_INTERVAL = 0.25
+
+Quota = Union[int, Dict, None]
+
+def _quota(quota: Quota, group) -> Optional[int]:
+    if isinstance(quota, dict):
+        return quota.get(group)
+    return quota
+
+class Leaderboard:
+    """Global top-``k`` recommendations of a scan, fed incrementally.
+
+    ``type_quota`` and ``sector_quota`` cap how many entries one trade type or
+    sector may hold (an int for every group, or a dict of group -> cap).
+    Candidates are kept in one bounded min-heap per (trade type, sector) cell
+    holding at most ``min(k, type cap, sector cap)`` entries; a recommendation
+    that drops out of its cell's heap has that many better ones sharing both
+    its type and sector, so it could never be picked. Memory is bounded by the
+    number of cells times ``k``, whatever the universe size, and
+    ``leaderboard`` fills the quotas greedily from the retained candidates.
+    """
+
+    def __init__(self, k: int = DEFAULT_TOP_K, key: Union[str, Callable[[TradeRecommendation], float]] = 'confidence',
+                 type_quota: Quota = None, sector_quota: Quota = None, sectors: Optional[Dict[str, str]] = None):
+        self.k = k
+        self.key = RANK_KEYS.get(key, key) if isinstance(key, str) else key
+        self.type_quota = type_quota
+        self.sector_quota = sector_quota
+        self.sectors = sectors or {}
+        self.cells = {}
+        self.sequence = count()
+        self.seen = 0
+        self.version = 0
+
+    def _score(self, recommendation: TradeRecommendation) -> float:
+        score = self.key(recommendation) if callable(self.key) else getattr(recommendation, self.key)
+        return np.nan if score is None else float(score)
+
+    def _cap(self, trade_type: TradeType, sector: str) -> int:
+        caps = [self.k, _quota(self.type_quota, trade_type), _quota(self.sector_quota, sector)]
+        return min(cap for cap in caps if cap is not None)
+
+    def _offer(self, score: float, trade_type: TradeType, sector: str, make: Callable[[], TradeRecommendation]):
+        """Push a candidate if it beats its cell's weakest; ``make`` materializes it only then"""
+        cell = (trade_type, sector)
+        heap = self.cells.get(cell)
+        if heap is None:
+            heap = self.cells[cell] = []
+        # Earlier arrivals win ties: they sort above later ones in the min-heap
+        entry = (score, -next(self.sequence))
+        if len(heap) < self._cap(trade_type, sector):
+            heapq.heappush(heap, entry + (make(),))
+        elif heap and entry > heap[0][:2]:
+            heapq.heapreplace(heap, entry + (make(),))
+        else:
+            return
+        self.version += 1
+
+    def add(self, recommendations: Iterable[TradeRecommendation]):
+        """Offer TradeRecommendation objects (or RecommendationViews); unscored ones are skipped"""
+        for recommendation in recommendations:
+            self.seen += 1
+            score = self._score(recommendation)
+            if np.isfinite(score):
+                sector = self.sectors.get(recommendation.ticker, UNKNOWN_SECTOR)
+                self._offer(score, recommendation.trade_type, sector, lambda: recommendation)
+
+    def add_batch(self, batch: RecommendationBatch):
+        """Offer every row of a RecommendationBatch.
+
+        Rows that cannot beat the best ``cap`` of their cell within the batch
+        are dropped with array operations, and only rows that enter a heap
+        are materialized as TradeRecommendation objects.
+        """
+        if not len(batch):
+            return
+        metrics.record_batch('ranking.leaderboard', len(batch))
+        self.seen += len(batch)
+        columns = batch.columns
+        if callable(self.key):
+            score = np.array([self._score(view) for view in batch])
+        else:
+            score = columns[self.key].astype(float)
+        tickers = batch.tickers[columns['ticker_index']]
+        sector_names, sector = np.unique([self.sectors.get(ticker, UNKNOWN_SECTOR) for ticker in tickers],
+                                         return_inverse=True)
+        cell = columns['trade_type'].astype(np.int64) * len(sector_names) + sector.reshape(-1)
+
+        rows = np.flatnonzero(np.isfinite(score))
+        order = rows[np.lexsort((rows, -score[rows], cell[rows]))]
+        starts = np.r_[0, np.flatnonzero(np.diff(cell[order])) + 1]
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        caps = np.array([self._cap(TRADE_TYPES[code // len(sector_names)], sector_names[code % len(sector_names)])
+                         for code in cell[order][starts]])
+        keep = order[rank < np.repeat(caps, np.diff(np.r_[starts, len(order)]))]
+        for row in keep[np.lexsort((keep, -score[keep]))]:
+            self._offer(float(score[row]), TRADE_TYPES[columns['trade_type'][row]], str(sector_names[sector[row]]),
+                        lambda: batch[int(row)].to_recommendation())
+
+    def leaderboard(self) -> List[TradeRecommendation]:
+        """Best recommendations so far, highest score first, within ``k`` and the quotas"""
+        candidates = sorted((entry for heap in self.cells.values() for entry in heap), reverse=True)
+        board, by_type, by_sector = [], {}, {}
+        for _, _, recommendation in candidates:
+            trade_type = recommendation.trade_type
+            sector = self.sectors.get(recommendation.ticker, UNKNOWN_SECTOR)
+            type_cap, sector_cap = _quota(self.type_quota, trade_type), _quota(self.sector_quota, sector)
+            if type_cap is not None and by_type.get(trade_type, 0) >= type_cap:
+                continue
+            if sector_cap is not None and by_sector.get(sector, 0) >= sector_cap:
+                continue
+            board.append(recommendation)
+            by_type[trade_type] = by_type.get(trade_type, 0) + 1
+            by_sector[sector] = by_sector.get(sector, 0) + 1
+            if len(board) == self.k:
+                break
+        return board
+
+    def __len__(self) -> int:
+        return sum(len(heap) for heap in self.cells.values())
+
+async def stream_leaderboard(results: AsyncIterable[Tuple[str, List[TradeRecommendation]]], board: Leaderboard,
+                             interval: float = EMIT_INTERVAL) -> AsyncIterator[Tuple[int, List[TradeRecommendation]]]:
+    """Rank ``(ticker, recommendations)`` pairs as a scan produces them (e.g. from
+    ``generate_recommendations_many``), yielding ``(tickers done, leaderboard)``.
+
+    The first non-empty leaderboard is yielded as soon as it exists, then at
+    most once per ``interval`` seconds while it keeps changing, and the final
+    one when ``results`` is exhausted.
+    """
+    tickers = 0
+    emitted_version, emitted_at = 0, None
+    async for _, recommendations in results:
+        tickers += 1
+        board.add(recommendations)
+        now = time.monotonic()
+        if board.version != emitted_version and (emitted_at is None or now - emitted_at >= interval):
+            emitted_version, emitted_at = board.version, now
+            yield tickers, board.leaderboard()
+    yield tickers, board.leaderboard()
@@ -3,13 +3,23 @@ AI-Powered Trade Recommendation Engine
 Advanced trading strategies with ML-driven recommendations
 """
 
+import asyncio
+import os
 import numpy as np
-import pandas as pd
+from concurrent.futures import Executor
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterable, List, Tuple, Optional
 from dataclasses import dataclass
 from enum import Enum
 
+from metrics import metrics
+from ml_models import RATINGS
+from options_pricing import RISK_FREE_RATE, atm_implied_volatility, black_scholes_chain, implied_volatility
+from probability import (CALL, CALL_SPREAD, CONTRACT_MULTIPLIER, DEFAULT_VOLATILITY, PUT, PUT_SPREAD, STOCK,
+                         STOCK_HORIZON_DAYS, STRADDLE, structure_odds, structure_odds_batch)
+from strategy_search import SEARCH_STRUCTURES, search_strategies
+
 class TradeType(Enum):
     STOCK_LONG = "stock_long"
     STOCK_SHORT = "stock_short"
@@ -51,80 +61,504 @@ class TradeRecommendation:
     strike_prices: Optional[List[float]] = None
     premium: Optional[float] = None
     greeks: Optional[Dict] = None
+    expected_value: Optional[float] = None  # mean P&L in dollars at the horizon
+
+TRADE_TYPES = tuple(TradeType)
+RISK_LEVELS = tuple(RiskLevel)
+DIRECTIONS = ('BEARISH', 'NEUTRAL', 'BULLISH')  # coded as -1, 0, 1
+TRADE_TYPE_CODES = {trade_type: code for code, trade_type in enumerate(TRADE_TYPES)}
+RISK_LEVEL_CODES = {risk_level: code for code, risk_level in enumerate(RISK_LEVELS)}
+
+STOCK_TRADE_CODES = (TRADE_TYPE_CODES[TradeType.STOCK_LONG], TRADE_TYPE_CODES[TradeType.STOCK_SHORT])
+SINGLE_OPTION_CODES = (TRADE_TYPE_CODES[TradeType.CALL_BUY], TRADE_TYPE_CODES[TradeType.PUT_BUY])
+
+# Column name -> dtype for RecommendationBatch
+BATCH_COLUMNS = {
+    'ticker_index': np.int32,       # row in RecommendationBatch.tickers
+    'trade_type': np.int8,          # index into TRADE_TYPES
+    'direction': np.int8,           # -1/0/1, see DIRECTIONS
+    'entry_price': np.float64,
+    'target_price': np.float64,
+    'stop_loss': np.float64,
+    'position_size': np.int32,
+    'risk_reward_ratio': np.float64,
+    'probability_of_profit': np.float64,
+    'max_risk': np.float64,
+    'max_reward': np.float64,
+    'expiry_days': np.int16,        # 0 for stock trades
+    'confidence_score': np.float64,
+    'signal_confidence': np.float64,  # raw ML confidence quoted in the reasons
+    'ml_rating': np.int8,           # index into RATINGS
+    'risk_level': np.int8,          # index into RISK_LEVELS
+    'underlying_price': np.float64,
+    'strike_1': np.float64,         # NaN when unused
+    'strike_2': np.float64,
+    'strike_3': np.float64,         # iron condor call wing (short, then long)
+    'strike_4': np.float64,
+    'premium': np.float64,
+    'implied_volatility': np.float64,  # percent
+    'delta': np.float64,
+    'gamma': np.float64,
+    'theta': np.float64,
+    'vega': np.float64,
+    'rho': np.float64,
+    'break_even': np.float64,
+    'expected_value': np.float64,   # dollars for the whole position, NaN when unscored
+}
+
+STRIKE_COLUMNS = ('strike_1', 'strike_2', 'strike_3', 'strike_4')
+
+# Trade type -> closed-form structure used by ``score_probabilities``; two-strike types are
+# long ``strike_1`` (the put leg for straddles/strangles). Other types keep their stored POP.
+TRADE_STRUCTURES = {
+    TradeType.STOCK_LONG: STOCK,
+    TradeType.STOCK_SHORT: STOCK,
+    TradeType.CALL_BUY: CALL,
+    TradeType.PUT_BUY: PUT,
+    TradeType.CALL_SPREAD: CALL_SPREAD,
+    TradeType.PUT_SPREAD: PUT_SPREAD,
+    TradeType.STRADDLE: STRADDLE,
+    TradeType.STRANGLE: STRADDLE,
+}
+_STRUCTURE_CODES = np.array([TRADE_STRUCTURES.get(trade_type, -1) for trade_type in TRADE_TYPES], dtype=np.int8)
+# Rows scored per pass; bounds the temporaries on large scans
+PROBABILITY_BLOCK = 4096
+
+class RecommendationBatch:
+    """Struct-of-arrays container for many recommendations.
+    
+    Every field is a NumPy column (enums and labels as small integer codes), so a
+    universe scan can fill, rank and slice recommendations without allocating an
+    object per candidate. Indexing returns a ``RecommendationView`` that renders
+    the human-readable fields only when they are read.
+    """
+    
+    def __init__(self, tickers, columns: Dict[str, np.ndarray], created: Optional[datetime] = None):
+        self.tickers = np.asarray(tickers)
+        self.columns = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in BATCH_COLUMNS.items()}
+        self.created = created or datetime.now()
+    
+    @classmethod
+    def empty(cls, tickers=()) -> 'RecommendationBatch':
+        return cls(tickers, {name: np.zeros(0, dtype=dtype) for name, dtype in BATCH_COLUMNS.items()})
+    
+    @classmethod
+    def concat(cls, tickers, batches: List['RecommendationBatch']) -> 'RecommendationBatch':
+        """Join batches that share the same ``tickers`` array"""
+        if not batches:
+            return cls.empty(tickers)
+        batch = cls(tickers, {name: np.concatenate([b.columns[name] for b in batches]) for name in BATCH_COLUMNS},
+                    batches[0].created)
+        rendered, offset = {}, 0
+        for part in batches:
+            rendered.update({offset + row: text for row, text in getattr(part, '_rendered', {}).items()})
+            offset += len(part)
+        if rendered:
+            batch._rendered = rendered
+        return batch
+    
+    @classmethod
+    def from_recommendations(cls, recommendations: List[TradeRecommendation]) -> 'RecommendationBatch':
+        """Pack existing TradeRecommendation objects into columns"""
+        tickers = sorted({rec.ticker for rec in recommendations})
+        ticker_rows = {ticker: row for row, ticker in enumerate(tickers)}
+        columns = {name: [] for name in BATCH_COLUMNS}
+        for rec in recommendations:
+            greeks = rec.greeks or {}
+            strikes = list(rec.strike_prices or []) + [np.nan] * 4
+            is_stock = rec.trade_type in (TradeType.STOCK_LONG, TradeType.STOCK_SHORT)
+            values = {
+                'ticker_index': ticker_rows[rec.ticker],
+                'trade_type': TRADE_TYPE_CODES[rec.trade_type],
+                'direction': DIRECTIONS.index(rec.direction) - 1 if rec.direction in DIRECTIONS else 0,
+                'entry_price': rec.entry_price,
+                'target_price': rec.target_price,
+                'stop_loss': rec.stop_loss,
+                'position_size': rec.position_size,
+                'risk_reward_ratio': rec.risk_reward_ratio,
+                'probability_of_profit': rec.probability_of_profit,
+                'max_risk': rec.max_risk,
+                'max_reward': rec.max_reward,
+                'expiry_days': 0 if is_stock else int(rec.time_horizon.split()[0]),
+                'confidence_score': rec.confidence_score,
+                'signal_confidence': rec.confidence_score,
+                'ml_rating': RATINGS.index(rec.ml_rating) if rec.ml_rating in RATINGS else 0,
+                'risk_level': RISK_LEVEL_CODES[rec.risk_level],
+                'underlying_price': rec.entry_price if is_stock else np.nan,
+                'strike_1': strikes[0],
+                'strike_2': strikes[1],
+                'strike_3': strikes[2],
+                'strike_4': strikes[3],
+                'premium': rec.premium if rec.premium is not None else np.nan,
+                'implied_volatility': greeks.get('implied_volatility', np.nan),
+                'expected_value': rec.expected_value if rec.expected_value is not None else np.nan,
+            }
+            for greek in ('delta', 'gamma', 'theta', 'vega', 'rho', 'break_even'):
+                values[greek] = greeks.get(greek, np.nan)
+            for name in BATCH_COLUMNS:
+                columns[name].append(values[name])
+        
+        batch = cls(tickers, columns)
+        # Original objects keep their own text; views read it back from here
+        batch._rendered = {i: (rec.strategy_description, rec.reasons) for i, rec in enumerate(recommendations)}
+        return batch
+    
+    def __len__(self) -> int:
+        return len(self.columns['trade_type'])
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.columns[key]
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(key)
+        return RecommendationView(self, key)
+    
+    def __iter__(self):
+        return (RecommendationView(self, row) for row in range(len(self)))
+    
+    def take(self, rows) -> 'RecommendationBatch':
+        """New batch holding the given rows, in the given order"""
+        rows = np.asarray(rows, dtype=np.int64)
+        batch = RecommendationBatch(self.tickers, {name: col[rows] for name, col in self.columns.items()},
+                                    self.created)
+        rendered = getattr(self, '_rendered', None)
+        if rendered:
+            batch._rendered = {i: rendered[row] for i, row in enumerate(rows) if row in rendered}
+        return batch
+    
+    def top_per_ticker(self, k: int = 5, key: str = 'confidence_score') -> 'RecommendationBatch':
+        """Keep the ``k`` highest-``key`` rows per ticker (stable on ties)"""
+        if not len(self):
+            return self
+        order = np.lexsort((np.arange(len(self)), -self.columns[key], self.columns['ticker_index']))
+        tickers = self.columns['ticker_index'][order]
+        starts = np.r_[0, np.flatnonzero(np.diff(tickers)) + 1]
+        rank = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        return self.take(order[rank < k])
+    
+    def to_recommendations(self) -> List[TradeRecommendation]:
+        """Materialize every row as a TradeRecommendation dataclass"""
+        return [view.to_recommendation() for view in self]
+
+class RecommendationView:
+    """Read-only row of a RecommendationBatch with TradeRecommendation attributes.
+    
+    Numeric fields come straight from the columns; ``reasons``,
+    ``strategy_description`` and the other text fields are rendered on access.
+    """
+    
+    __slots__ = ('_batch', '_row')
+    
+    def __init__(self, batch: RecommendationBatch, row: int):
+        self._batch = batch
+        self._row = row
+    
+    def _value(self, name: str):
+        return self._batch.columns[name][self._row]
+    
+    @property
+    def ticker(self) -> str:
+        return str(self._batch.tickers[self._value('ticker_index')])
+    
+    @property
+    def trade_type(self) -> TradeType:
+        return TRADE_TYPES[self._value('trade_type')]
+    
+    @property
+    def direction(self) -> str:
+        return DIRECTIONS[self._value('direction') + 1]
+    
+    @property
+    def risk_level(self) -> RiskLevel:
+        return RISK_LEVELS[self._value('risk_level')]
+    
+    @property
+    def ml_rating(self) -> str:
+        return RATINGS[self._value('ml_rating')]
+    
+    @property
+    def position_size(self) -> int:
+        return int(self._value('position_size'))
+    
+    @property
+    def time_horizon(self) -> str:
+        if self._value('trade_type') in STOCK_TRADE_CODES:
+            return '2-4 weeks'
+        return f"{int(self._value('expiry_days'))} days"
+    
+    @property
+    def expiry_date(self) -> Optional[str]:
+        if self._value('trade_type') in STOCK_TRADE_CODES:
+            return None
+        return (self._batch.created + timedelta(days=int(self._value('expiry_days')))).strftime('%Y-%m-%d')
+    
+    @property
+    def strike_prices(self) -> Optional[List[float]]:
+        strikes = [float(self._value(name)) for name in STRIKE_COLUMNS]
+        strikes = [strike for strike in strikes if not np.isnan(strike)]
+        return strikes or None
+    
+    @property
+    def premium(self) -> Optional[float]:
+        premium = float(self._value('premium'))
+        return None if np.isnan(premium) else premium
+    
+    @property
+    def expected_value(self) -> Optional[float]:
+        expected_value = float(self._value('expected_value'))
+        return None if np.isnan(expected_value) else expected_value
+    
+    @property
+    def greeks(self) -> Optional[Dict]:
+        if self._value('trade_type') not in SINGLE_OPTION_CODES:
+            return None
+        greeks = {name: float(self._value(name))
+                  for name in ('premium', 'delta', 'gamma', 'theta', 'vega', 'rho', 'break_even', 'implied_volatility')}
+        sign = 1 if self._value('trade_type') == TRADE_TYPE_CODES[TradeType.CALL_BUY] else -1
+        greeks['intrinsic_value'] = max(0.0, sign * float(self._value('underlying_price') - self._value('strike_1')))
+        greeks['time_value'] = greeks['premium'] - greeks['intrinsic_value']
+        return {name: value for name, value in greeks.items() if not np.isnan(value)}
+    
+    def _rendered(self):
+        rendered = getattr(self._batch, '_rendered', None)
+        if rendered and self._row in rendered:
+            return rendered[self._row]
+        return None
+    
+    @property
+    def strategy_description(self) -> str:
+        rendered = self._rendered()
+        if rendered:
+            return rendered[0]
+        trade_type = self.trade_type
+        ticker = self.ticker
+        confidence = float(self._value('signal_confidence'))
+        if trade_type == TradeType.STOCK_LONG:
+            return f"Long {ticker} based on ML bullish prediction with {confidence:.1%} confidence"
+        if trade_type == TradeType.STOCK_SHORT:
+            return f"Short {ticker} based on ML bearish prediction with {confidence:.1%} confidence"
+        if trade_type == TradeType.CALL_BUY:
+            return f"Buy ${float(self._value('strike_1'))} calls based on bullish ML prediction"
+        if trade_type == TradeType.PUT_BUY:
+            return f"Buy ${float(self._value('strike_1'))} puts based on bearish ML prediction"
+        if trade_type == TradeType.STRADDLE:
+            return "Long straddle to profit from ML-predicted volatility expansion"
+        return f"{trade_type.value.replace('_', ' ').title()} on {ticker}"
+    
+    @property
+    def reasons(self) -> List[str]:
+        rendered = self._rendered()
+        if rendered:
+            return list(rendered[1])
+        trade_type = self.trade_type
+        confidence = float(self._value('signal_confidence'))
+        if trade_type in (TradeType.STOCK_LONG, TradeType.STOCK_SHORT):
+            move = float(self._value('target_price')) / float(self._value('entry_price')) - 1
+            if trade_type == TradeType.STOCK_LONG:
+                return [f"ML model shows {confidence:.1%} bullish probability",
+                        f"Rating: {self.ml_rating}",
+                        f"Target: {move * 100:.1f}% upside"]
+            return [f"ML model shows {confidence:.1%} bearish probability",
+                    f"Rating: {self.ml_rating}",
+                    f"Target: {-move * 100:.1f}% downside"]
+        if trade_type in (TradeType.CALL_BUY, TradeType.PUT_BUY):
+            bias = 'bullish' if trade_type == TradeType.CALL_BUY else 'bearish'
+            return [f"ML {bias} with {confidence:.1%} confidence",
+                    f"Strike ${float(self._value('strike_1')):.2f} offers good risk/reward",
+                    f"Implied volatility: {float(self._value('implied_volatility')):.1f}%"]
+        if trade_type == TradeType.STRADDLE:
+            return [f"ML predicts volatility expansion with {confidence:.1%} confidence",
+                    f"ATM straddle at ${int(self._value('strike_1'))}",
+                    "Benefits from movement in either direction"]
+        return [f"ML confidence {confidence:.1%}"]
+    
+    def __getattr__(self, name):
+        # Remaining numeric fields map straight onto their columns
+        if name in BATCH_COLUMNS:
+            return float(self._value(name))
+        raise AttributeError(name)
+    
+    def to_recommendation(self) -> TradeRecommendation:
+        return TradeRecommendation(
+            ticker=self.ticker,
+            trade_type=self.trade_type,
+            direction=self.direction,
+            entry_price=self.entry_price,
+            target_price=self.target_price,
+            stop_loss=self.stop_loss,
+            position_size=self.position_size,
+            risk_reward_ratio=self.risk_reward_ratio,
+            probability_of_profit=self.probability_of_profit,
+            max_risk=self.max_risk,
+            max_reward=self.max_reward,
+            time_horizon=self.time_horizon,
+            confidence_score=self.confidence_score,
+            ml_rating=self.ml_rating,
+            strategy_description=self.strategy_description,
+            risk_level=self.risk_level,
+            reasons=self.reasons,
+            expiry_date=self.expiry_date,
+            strike_prices=self.strike_prices,
+            premium=self.premium,
+            greeks=self.greeks,
+            expected_value=self.expected_value,
+        )
+    
+    def __repr__(self):
+        return f"RecommendationView({self.ticker}, {self.trade_type.value}, confidence={self.confidence_score:.3f})"
+
+@metrics.timed('recommendations.probability')
+def score_probabilities(batch: RecommendationBatch, volatility=None,
+                        drift: float = RISK_FREE_RATE) -> RecommendationBatch:
+    """Fill ``probability_of_profit`` and ``expected_value`` for every row in place.
+    
+    Each row is priced as its lognormal closed-form structure (see
+    ``TRADE_STRUCTURES``), held for STOCK_HORIZON_DAYS (stock) or to expiry
+    (options). Option rows use their own implied volatility; stock rows use
+    ``volatility`` (percent, one per ticker in ``batch.tickers``) or
+    DEFAULT_VOLATILITY. Rows missing a price, strike or volatility are left as is.
+    """
+    try:
+        columns = batch.columns
+        metrics.record_batch('recommendations.probability', len(batch))
+        ticker_vol = np.full(len(batch.tickers), DEFAULT_VOLATILITY * 100)
+        if volatility is not None:
+            volatility = np.asarray(volatility, dtype=float)
+            ticker_vol = np.where(np.isfinite(volatility) & (volatility > 0), volatility, ticker_vol)
+        
+        for start in range(0, len(batch), PROBABILITY_BLOCK):
+            block = slice(start, start + PROBABILITY_BLOCK)
+            structure = _STRUCTURE_CODES[columns['trade_type'][block]]
+            stock = structure == STOCK
+            iv = columns['implied_volatility'][block]
+            vol = np.where(stock | np.isnan(iv), ticker_vol[columns['ticker_index'][block]], iv) / 100
+            days = np.where(stock, STOCK_HORIZON_DAYS, columns['expiry_days'][block])
+            spot = np.where(stock, columns['entry_price'][block], columns['underlying_price'][block])
+            cost = np.where(stock, columns['entry_price'][block], columns['premium'][block])
+            pop, ev = structure_odds_batch(structure, spot, vol, days, cost, columns['strike_1'][block],
+                                           columns['strike_2'][block], columns['direction'][block], drift)
+            valid = (structure >= 0) & (spot > 0) & (vol > 0) & (days > 0) & np.isfinite(ev)
+            ev *= columns['position_size'][block]
+            ev *= np.where(stock, 1, CONTRACT_MULTIPLIER)
+            np.copyto(columns['probability_of_profit'][block], pop, where=valid)
+            np.copyto(columns['expected_value'][block], ev, where=valid)
+        
+    except Exception as e:
+        print(f"Error scoring recommendation probabilities: {e}")
+        metrics.record_error('recommendations.probability')
+    
+    return batch
 
 class OptionsStrategy:
     """Options strategy calculator and analyzer"""
     
     @staticmethod
+    @metrics.timed('options.metrics')
     def calculate_option_metrics(stock_price: float, strike: float, expiry_days: int, 
-                               iv: float, is_call: bool = True) -> Dict:
-        """Calculate option Greeks and pricing (simplified Black-Scholes)"""
+                               iv: float, is_call: bool = True, rate: float = RISK_FREE_RATE,
+                               dividend_yield: float = 0.0, market_price: Optional[float] = None) -> Dict:
+        """Calculate option Greeks and pricing (Black-Scholes-Merton, iv in percent).
+        
+        When ``market_price`` is given the IV is backed out of it, and ``iv`` is only
+        used if the quote cannot be inverted.
+        """
         try:
-            # Simplified option pricing and Greeks calculation
-            moneyness = stock_price / strike if strike > 0 else 1
-            time_decay = max(0.01, expiry_days / 365)
-            
-            # Simplified delta calculation
-            if is_call:
-                delta = np.clip(0.5 + (moneyness - 1) * 0.5, 0.01, 0.99)
-            else:
-                delta = np.clip(-0.5 - (moneyness - 1) * 0.5, -0.99, -0.01)
-            
-            # Other Greeks (simplified)
-            gamma = np.clip(0.1 / (abs(moneyness - 1) + 0.1), 0.01, 0.5)
-            theta = -0.05 * time_decay
-            vega = 0.1 * np.sqrt(time_decay)
-            
-            # Option premium (simplified)
-            intrinsic = max(0, (stock_price - strike) if is_call else (strike - stock_price))
-            time_value = iv / 100 * stock_price * np.sqrt(time_decay) * 0.4
-            premium = intrinsic + time_value
-            
-            return {
-                'premium': premium,
-                'delta': delta,
-                'gamma': gamma,
-                'theta': theta,
-                'vega': vega,
-                'intrinsic_value': intrinsic,
-                'time_value': time_value,
-                'break_even': strike + premium if is_call else strike - premium
-            }
+            if market_price is not None:
+                solved = implied_volatility(
+                    market_price, stock_price, strike, expiry_days, is_call, rate, dividend_yield
+                )
+                if solved['converged']:
+                    iv = float(solved['iv']) * 100
+            
+            result = black_scholes_chain(
+                stock_price, strike, expiry_days, iv / 100, is_call, rate, dividend_yield
+            )
+            result = {key: float(value) for key, value in result.items()}
+            result['implied_volatility'] = iv
+            return result
             
         except Exception as e:
             print(f"Error calculating option metrics: {e}")
+            metrics.record_error('options.metrics')
             return {}
     
     @staticmethod
+    @metrics.timed('options.chain_metrics')
+    def calculate_chain_metrics(stock_price: float, strikes, expiry_days, ivs, is_call,
+                              rate: float = RISK_FREE_RATE, dividend_yield: float = 0.0) -> Dict[str, np.ndarray]:
+        """Price a whole option chain at once (arrays broadcast, ivs in percent)"""
+        try:
+            return black_scholes_chain(
+                stock_price, strikes, expiry_days, np.asarray(ivs, dtype=float) / 100,
+                is_call, rate, dividend_yield
+            )
+            
+        except Exception as e:
+            print(f"Error calculating chain metrics: {e}")
+            metrics.record_error('options.chain_metrics')
+            return {}
+    
+    @staticmethod
+    @metrics.timed('options.implied_volatility')
+    def implied_volatility_chain(stock_price: float, premiums, strikes, expiry_days, is_call,
+                                 rate: float = RISK_FREE_RATE, dividend_yield: float = 0.0) -> Dict[str, np.ndarray]:
+        """Solve IVs (in percent) for a whole chain of market premiums"""
+        try:
+            solved = implied_volatility(
+                premiums, stock_price, strikes, expiry_days, is_call, rate, dividend_yield
+            )
+            solved['iv'] = solved['iv'] * 100
+            return solved
+            
+        except Exception as e:
+            print(f"Error solving chain implied volatility: {e}")
+            metrics.record_error('options.implied_volatility')
+            return {}
+    
+    @staticmethod
+    def strike_offsets(volatility, expiry_days):
+        """Near/mid/far strike offsets (fractions of spot) for a given IV in percent.
+        
+        Offsets widen with the expected move over the holding period but never get
+        narrower than the baseline 2%/5%/10% ladder. Works on scalars or arrays.
+        """
+        vol_adjustment = np.asarray(volatility) / 100 * np.sqrt(np.asarray(expiry_days) / 365)
+        return tuple(np.maximum(base, scale * vol_adjustment)
+                     for base, scale in ((0.02, 0.2), (0.05, 0.5), (0.10, 1.0)))
+    
+    @staticmethod
+    @metrics.timed('options.suggest_strikes')
     def suggest_option_strikes(stock_price: float, volatility: float, 
                              direction: str, expiry_days: int) -> List[float]:
         """Suggest optimal strike prices based on ML prediction"""
         try:
-            vol_adjustment = volatility / 100 * np.sqrt(expiry_days / 365)
+            near, mid, far = OptionsStrategy.strike_offsets(volatility, expiry_days)
             
             if direction == 'BULLISH':
                 # Suggest ITM to slightly OTM calls
                 strikes = [
-                    stock_price * 0.98,  # ITM
-                    stock_price * 1.02,  # Slightly OTM
-                    stock_price * 1.05,  # OTM
-                    stock_price * 1.10   # Further OTM
+                    stock_price * (1 - near),  # ITM
+                    stock_price * (1 + near),  # Slightly OTM
+                    stock_price * (1 + mid),   # OTM
+                    stock_price * (1 + far)    # Further OTM
                 ]
             elif direction == 'BEARISH':
                 # Suggest ITM to slightly OTM puts
                 strikes = [
-                    stock_price * 1.02,  # ITM
-                    stock_price * 0.98,  # Slightly OTM
-                    stock_price * 0.95,  # OTM
-                    stock_price * 0.90   # Further OTM
+                    stock_price * (1 + near),  # ITM
+                    stock_price * (1 - near),  # Slightly OTM
+                    stock_price * (1 - mid),   # OTM
+                    stock_price * (1 - far)    # Further OTM
                 ]
             else:  # NEUTRAL
                 # Suggest ATM and slightly OTM for strangles/condors
                 strikes = [
-                    stock_price * 0.95,
+                    stock_price * (1 - mid),
                     stock_price * 1.00,  # ATM
-                    stock_price * 1.05,
-                    stock_price * 1.10
+                    stock_price * (1 + mid),
+                    stock_price * (1 + far)
                 ]
             
             # Round to nearest $0.50 or $1.00
@@ -132,8 +566,28 @@ class OptionsStrategy:
             
         except Exception as e:
             print(f"Error suggesting strikes: {e}")
+            metrics.record_error('options.suggest_strikes')
             return [stock_price]
 
+# Per-process engine used by pool workers, built on first use in each worker
+_worker_engine = None
+
+def _recommend_chunk(chunk: List[Tuple[str, Dict, Dict]], account_size: float,
+                     risk_level: 'RiskLevel') -> List[Tuple[str, List['TradeRecommendation']]]:
+    """Process-pool entry point: recommendations for one shard of tickers"""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = TradeRecommendationEngine()
+    
+    async def run():
+        return [
+            (ticker, await _worker_engine.generate_recommendations(
+                ticker, market_data, ml_analysis, account_size, risk_level))
+            for ticker, market_data, ml_analysis in chunk
+        ]
+    
+    return asyncio.run(run())
+
 class TradeRecommendationEngine:
     """Main recommendation engine with ML integration"""
     
@@ -146,6 +600,27 @@ class TradeRecommendationEngine:
             RiskLevel.SPECULATION: {'max_risk_pct': 0.20, 'min_prob_profit': 0.40}
         }
     
+    def _resolve_iv(self, market_data: Dict, expiry_days: int, simulate) -> float:
+        """ATM implied volatility (percent) from ``market_data['options_chain']`` quotes.
+        
+        The chain is a mapping of ``strike``/``expiry_days``/``is_call``/``price``
+        columns. Without a usable chain a supplied ``implied_volatility``
+        (percent) is used, and ``simulate()`` only when neither is there.
+        """
+        chain = market_data.get('options_chain')
+        if chain:
+            iv = atm_implied_volatility(
+                market_data.get('price', 0), chain['strike'], chain['expiry_days'],
+                chain['is_call'], chain['price'], min_days=min(7, expiry_days)
+            )
+            if np.isfinite(iv):
+                return iv * 100
+        iv = market_data.get('implied_volatility')
+        if iv is not None and iv > 0:
+            return float(iv)
+        return simulate()
+    
+    @metrics.timed('recommendations.generate')
     async def generate_recommendations(self, ticker: str, market_data: Dict, 
                                     ml_analysis: Dict, account_size: float = 100000,
                                     risk_level: RiskLevel = RiskLevel.MODERATE) -> List[TradeRecommendation]:
@@ -176,7 +651,8 @@ class TradeRecommendationEngine:
             
             # 1. Stock recommendations
             stock_recs = await self._generate_stock_recommendations(
-                ticker, stock_price, direction, confidence, rating, account_size, risk_level
+                ticker, stock_price, direction, confidence, rating, account_size, risk_level,
+                ml_analysis.get('features', {}).get('implied_volatility') or DEFAULT_VOLATILITY * 100
             )
             recommendations.extend(stock_recs)
             
@@ -198,12 +674,216 @@ class TradeRecommendationEngine:
             
         except Exception as e:
             print(f"Error generating recommendations for {ticker}: {e}")
+            metrics.record_error('recommendations.generate')
             return []
     
+    async def generate_recommendations_many(self, universe: Iterable[Tuple[str, Dict, Dict]],
+                                            account_size: float = 100000,
+                                            risk_level: RiskLevel = RiskLevel.MODERATE,
+                                            max_workers: Optional[int] = None, chunk_size: int = 64,
+                                            executor: Optional[Executor] = None
+                                            ) -> AsyncIterator[Tuple[str, List[TradeRecommendation]]]:
+        """Generate recommendations for a whole universe across a process pool.
+        
+        ``universe`` yields ``(ticker, market_data, ml_analysis)`` tuples. Tickers are
+        sharded into chunks of ``chunk_size`` and at most two chunks per worker are in
+        flight, so memory stays bounded for large or lazily-produced universes.
+        ``(ticker, recommendations)`` pairs are yielded as their shard completes,
+        without blocking the event loop. Pass ``executor`` to reuse a warm pool.
+        """
+        # Imported here: the process-pool machinery (multiprocessing) costs ~8 ms at import
+        from concurrent.futures import ProcessPoolExecutor
+        
+        loop = asyncio.get_running_loop()
+        workers = max_workers or os.cpu_count() or 1
+        pool = executor or ProcessPoolExecutor(max_workers=workers)
+        items = iter(universe)
+        pending = set()
+        
+        def submit_next() -> bool:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                return False
+            metrics.record_batch('recommendations.many', len(chunk))
+            pending.add(loop.run_in_executor(pool, _recommend_chunk, chunk, account_size, risk_level))
+            return True
+        
+        try:
+            while len(pending) < 2 * workers and submit_next():
+                pass
+            
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        print(f"Error in recommendation worker: {e}")
+                        metrics.record_error('recommendations.many')
+                        results = []
+                    submit_next()
+                    for ticker, recommendations in results:
+                        yield ticker, recommendations
+        finally:
+            for future in pending:
+                future.cancel()
+            if executor is None:
+                pool.shutdown(wait=False, cancel_futures=True)
+    
+    @metrics.timed('recommendations.batch')
+    def generate_recommendations_batch(self, analysis: Dict, market_data,
+                                       account_size: float = 100000,
+                                       risk_level: RiskLevel = RiskLevel.MODERATE,
+                                       top_n: int = 5) -> RecommendationBatch:
+        """Columnar counterpart of ``generate_recommendations`` for a whole universe.
+        
+        ``analysis`` is the output of ``QuantumMLEngine.analyze_batch`` and
+        ``market_data`` the matching price columns, optionally with an
+        ``implied_volatility`` column (percent, NaN where unknown) that prices the
+        option rules in place of a simulated IV. The stock, single-option and
+        straddle rules are applied as array operations and written straight into
+        a RecommendationBatch holding the ``top_n`` candidates per ticker, with
+        POP and expected value from one ``score_probabilities`` pass.
+        
+        An optional ``options_chain`` column (one chain mapping or None per
+        ticker) works as in ``generate_recommendations``: tickers with a chain
+        get the ``search_strategies`` structures in place of the straddle rule,
+        keeping the search's POP and expected value. The search runs one ticker
+        at a time.
+        """
+        try:
+            tickers = np.asarray(analysis['ticker'])
+            metrics.record_batch('recommendations.batch', len(tickers))
+            ml_pred = analysis['ml_analysis']
+            price = np.asarray(market_data['price'], dtype=float)
+            direction = ml_pred['price_prediction']['direction']
+            vol_prediction = ml_pred['volatility_forecast']['prediction']
+            composite = ml_pred['composite_score']
+            confidence = np.asarray(composite['confidence_score'], dtype=float)
+            rating = np.zeros(len(tickers), dtype=np.int8)
+            for code, label in enumerate(RATINGS):
+                rating[composite['rating'] == label] = code
+            
+            max_risk_pct = self.risk_preferences[risk_level]['max_risk_pct']
+            eligible = (price > 0) & (confidence >= 0.4)
+            bullish = direction == 'BULLISH'
+            bearish = direction == 'BEARISH'
+            volatility = analysis.get('features', {}).get('implied_volatility')
+            supplied_iv = (np.asarray(market_data['implied_volatility'], dtype=float)
+                           if 'implied_volatility' in market_data else None)
+            chains = market_data.get('options_chain')
+            has_chain = (np.array([bool(chain) for chain in chains], dtype=bool) if chains is not None
+                         else np.zeros(len(tickers), dtype=bool))
+            parts = []
+            
+            def option_iv(rows, simulate):
+                # Supplied IV where there is one, simulated only for the rest
+                iv = np.full(len(rows), np.nan) if supplied_iv is None else supplied_iv[rows].copy()
+                missing = ~(iv > 0)
+                iv[missing] = simulate(int(missing.sum()))
+                return iv
+            
+            def part(rows, trade_type, **values):
+                n = len(rows)
+                columns = {name: np.full(n, np.nan) if np.issubdtype(dtype, np.floating) else np.zeros(n, dtype=dtype)
+                           for name, dtype in BATCH_COLUMNS.items()}
+                columns.update({
+                    'ticker_index': rows,
+                    'trade_type': np.full(n, TRADE_TYPE_CODES[trade_type]),
+                    'ml_rating': rating[rows],
+                    'risk_level': np.full(n, RISK_LEVEL_CODES[risk_level]),
+                    'signal_confidence': confidence[rows],
+                    'underlying_price': price[rows],
+                })
+                columns.update(values)
+                parts.append(RecommendationBatch(tickers, columns))
+            
+            # 1. Stock long/short with a 15% stop
+            for trade_type, mask, sign, target_scale in ((TradeType.STOCK_LONG, bullish, 1, 0.2),
+                                                         (TradeType.STOCK_SHORT, bearish, -1, 0.15)):
+                rows = np.flatnonzero(eligible & mask & (confidence > 0.6))
+                p, c = price[rows], confidence[rows]
+                position_size = ((account_size * max_risk_pct) / (p * 0.15)).astype(np.int64)
+                target = p * (1 + sign * c * target_scale)
+                max_risk = position_size * p * 0.15
+                max_reward = position_size * sign * (target - p)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    risk_reward = np.where(max_risk > 0, max_reward / max_risk, 0.0)
+                part(rows, trade_type,
+                     direction=np.full(len(rows), sign), entry_price=p, target_price=target,
+                     stop_loss=p * (1 - sign * 0.15), position_size=position_size,
+                     risk_reward_ratio=risk_reward,
+                     max_risk=max_risk, max_reward=max_reward, confidence_score=c)
+            
+            # 2. Slightly OTM calls/puts, 30 DTE
+            expiry_days = 30
+            for trade_type, mask, sign in ((TradeType.CALL_BUY, bullish, 1), (TradeType.PUT_BUY, bearish, -1)):
+                rows = np.flatnonzero(eligible & mask & (confidence > 0.5))
+                p, c = price[rows], confidence[rows]
+                iv = option_iv(rows, lambda k: np.clip(np.random.normal(35, 10, k), 15, 80))
+                near, _, _ = self.options_strategy.strike_offsets(iv, expiry_days)
+                strike = np.round(p * (1 + sign * near) * 2) / 2
+                pricing = black_scholes_chain(p, strike, expiry_days, iv / 100, sign > 0)
+                premium = pricing['premium']
+                priced = premium > 0
+                rows, p, c, iv, strike = rows[priced], p[priced], c[priced], iv[priced], strike[priced]
+                pricing = {name: values[priced] for name, values in pricing.items()}
+                premium = pricing['premium']
+                contracts = np.maximum(1, ((account_size * max_risk_pct) / (premium * 100)).astype(np.int64))
+                max_risk = contracts * premium * 100
+                part(rows, trade_type,
+                     direction=np.full(len(rows), sign), entry_price=premium, target_price=premium * 2,
+                     stop_loss=premium * 0.5, position_size=contracts,
+                     risk_reward_ratio=np.full(len(rows), 3.0),
+                     max_risk=max_risk, max_reward=max_risk * 3, expiry_days=np.full(len(rows), expiry_days),
+                     confidence_score=c * 0.9, strike_1=strike, premium=premium, implied_volatility=iv,
+                     **{greek: pricing[greek] for greek in ('delta', 'gamma', 'theta', 'vega', 'rho', 'break_even')})
+            
+            # 3. ATM straddle on predicted volatility expansion, 21 DTE
+            expiry_days = 21
+            rows = np.flatnonzero(eligible & (vol_prediction == 'EXPANSION') & (confidence > 0.6) & ~has_chain)
+            p, c = price[rows], confidence[rows]
+            iv = option_iv(rows, lambda k: np.clip(np.random.normal(30, 8, k), 15, 60))
+            strike = np.round(p)
+            legs = black_scholes_chain(p[:, None], strike[:, None], expiry_days, iv[:, None] / 100, [True, False])
+            total_premium = legs['premium'].sum(axis=1)
+            priced = total_premium > 0
+            rows, c, strike, iv, total_premium = rows[priced], c[priced], strike[priced], iv[priced], total_premium[priced]
+            contracts = np.maximum(1, ((account_size * 0.03) / (total_premium * 100)).astype(np.int64))
+            max_risk = contracts * total_premium * 100
+            part(rows, TradeType.STRADDLE,
+                 direction=np.zeros(len(rows)), entry_price=total_premium, target_price=total_premium * 1.5,
+                 stop_loss=total_premium * 0.6, position_size=contracts,
+                 risk_reward_ratio=np.full(len(rows), 2.0),
+                 max_risk=max_risk, max_reward=max_risk * 2, expiry_days=np.full(len(rows), expiry_days),
+                 confidence_score=c * 0.8, strike_1=strike, strike_2=strike, premium=total_premium,
+                 implied_volatility=iv)
+            
+            batch = RecommendationBatch.concat(tickers, parts)
+            parts.clear()  # release the per-rule columns before scoring
+            batch = score_probabilities(batch, volatility)
+            
+            # 4. Structures searched from the listed chain, where there is one; they keep the
+            #    POP and expected value the search scored them with
+            rows = np.flatnonzero(eligible & has_chain)
+            if len(rows):
+                searched = self._searched_strategy_batch(tickers, rows, price, chains, ml_pred, confidence,
+                                                         account_size, risk_level)
+                batch = RecommendationBatch.concat(tickers, [batch, searched])
+            return batch.top_per_ticker(top_n)
+            
+        except Exception as e:
+            print(f"Error generating batch recommendations: {e}")
+            metrics.record_error('recommendations.batch')
+            return RecommendationBatch.empty(analysis.get('ticker', ()))
+    
+    @metrics.timed('recommendations.stock')
     async def _generate_stock_recommendations(self, ticker: str, stock_price: float,
                                            direction: str, confidence: float, rating: str,
-                                           account_size: float, risk_level: RiskLevel) -> List[TradeRecommendation]:
-        """Generate stock long/short recommendations"""
+                                           account_size: float, risk_level: RiskLevel,
+                                           volatility: float = DEFAULT_VOLATILITY * 100) -> List[TradeRecommendation]:
+        """Generate stock long/short recommendations (``volatility`` in percent scores POP)"""
         recommendations = []
         risk_params = self.risk_preferences[risk_level]
         
@@ -217,6 +897,7 @@ class TradeRecommendationEngine:
                 max_risk = position_size * stock_price * 0.15
                 max_reward = position_size * (target_price - stock_price)
                 risk_reward = max_reward / max_risk if max_risk > 0 else 0
+                pop, ev = structure_odds(STOCK, stock_price, volatility / 100, STOCK_HORIZON_DAYS, stock_price)
                 
                 recommendations.append(TradeRecommendation(
                     ticker=ticker,
@@ -227,7 +908,7 @@ class TradeRecommendationEngine:
                     stop_loss=stop_loss,
                     position_size=position_size,
                     risk_reward_ratio=risk_reward,
-                    probability_of_profit=confidence,
+                    probability_of_profit=pop,
                     max_risk=max_risk,
                     max_reward=max_reward,
                     time_horizon='2-4 weeks',
@@ -239,7 +920,8 @@ class TradeRecommendationEngine:
                         f"ML model shows {confidence:.1%} bullish probability",
                         f"Rating: {rating}",
                         f"Target: {((target_price/stock_price - 1) * 100):.1f}% upside"
-                    ]
+                    ],
+                    expected_value=ev * position_size
                 ))
             
             elif direction == 'BEARISH' and confidence > 0.6:
@@ -251,6 +933,8 @@ class TradeRecommendationEngine:
                 max_risk = position_size * stock_price * 0.15
                 max_reward = position_size * (stock_price - target_price)
                 risk_reward = max_reward / max_risk if max_risk > 0 else 0
+                pop, ev = structure_odds(STOCK, stock_price, volatility / 100, STOCK_HORIZON_DAYS, stock_price,
+                                         direction=-1)
                 
                 recommendations.append(TradeRecommendation(
                     ticker=ticker,
@@ -261,7 +945,7 @@ class TradeRecommendationEngine:
                     stop_loss=stop_loss,
                     position_size=position_size,
                     risk_reward_ratio=risk_reward,
-                    probability_of_profit=confidence,
+                    probability_of_profit=pop,
                     max_risk=max_risk,
                     max_reward=max_reward,
                     time_horizon='2-4 weeks',
@@ -273,14 +957,17 @@ class TradeRecommendationEngine:
                         f"ML model shows {confidence:.1%} bearish probability",
                         f"Rating: {rating}",
                         f"Target: {((1 - target_price/stock_price) * 100):.1f}% downside"
-                    ]
+                    ],
+                    expected_value=ev * position_size
                 ))
                 
         except Exception as e:
             print(f"Error generating stock recommendations: {e}")
+            metrics.record_error('recommendations.stock')
         
         return recommendations
     
+    @metrics.timed('recommendations.options')
     async def _generate_options_recommendations(self, ticker: str, market_data: Dict,
                                               ml_analysis: Dict, account_size: float, 
                                               risk_level: RiskLevel) -> List[TradeRecommendation]:
@@ -299,9 +986,10 @@ class TradeRecommendationEngine:
             confidence = composite.get('confidence_score', 0.5)
             rating = composite.get('rating', 'C')
             
-            # Simulate options data
-            iv = np.clip(np.random.normal(35, 10), 15, 80)  # IV between 15-80%
+            # Implied volatility from the chain when quotes are available, else simulated
             expiry_days = 30  # 30 DTE
+            iv = self._resolve_iv(market_data, expiry_days,
+                                  lambda: np.clip(np.random.normal(35, 10), 15, 80))  # IV between 15-80%
             
             if confidence > 0.5:
                 # Generate strikes based on direction
@@ -321,6 +1009,7 @@ class TradeRecommendationEngine:
                     
                     max_risk = contracts * premium * 100
                     max_reward = max_risk * 3  # Assume 3:1 reward potential
+                    pop, ev = structure_odds(CALL, stock_price, iv / 100, expiry_days, premium, strike)
                     
                     recommendations.append(TradeRecommendation(
                         ticker=ticker,
@@ -331,7 +1020,7 @@ class TradeRecommendationEngine:
                         stop_loss=premium * 0.5,
                         position_size=contracts,
                         risk_reward_ratio=3.0,
-                        probability_of_profit=confidence * 0.8,  # Options have lower POP
+                        probability_of_profit=pop,
                         max_risk=max_risk,
                         max_reward=max_reward,
                         time_horizon=f'{expiry_days} days',
@@ -347,7 +1036,8 @@ class TradeRecommendationEngine:
                         expiry_date=(datetime.now() + timedelta(days=expiry_days)).strftime('%Y-%m-%d'),
                         strike_prices=[strike],
                         premium=premium,
-                        greeks=option_metrics
+                        greeks=option_metrics,
+                        expected_value=ev * contracts * CONTRACT_MULTIPLIER
                     ))
                 
                 elif direction == 'BEARISH':
@@ -362,6 +1052,7 @@ class TradeRecommendationEngine:
                     
                     max_risk = contracts * premium * 100
                     max_reward = max_risk * 3
+                    pop, ev = structure_odds(PUT, stock_price, iv / 100, expiry_days, premium, strike)
                     
                     recommendations.append(TradeRecommendation(
                         ticker=ticker,
@@ -372,7 +1063,7 @@ class TradeRecommendationEngine:
                         stop_loss=premium * 0.5,
                         position_size=contracts,
                         risk_reward_ratio=3.0,
-                        probability_of_profit=confidence * 0.8,
+                        probability_of_profit=pop,
                         max_risk=max_risk,
                         max_reward=max_reward,
                         time_horizon=f'{expiry_days} days',
@@ -388,14 +1079,17 @@ class TradeRecommendationEngine:
                         expiry_date=(datetime.now() + timedelta(days=expiry_days)).strftime('%Y-%m-%d'),
                         strike_prices=[strike],
                         premium=premium,
-                        greeks=option_metrics
+                        greeks=option_metrics,
+                        expected_value=ev * contracts * CONTRACT_MULTIPLIER
                     ))
                     
         except Exception as e:
             print(f"Error generating options recommendations: {e}")
+            metrics.record_error('recommendations.options')
         
         return recommendations
     
+    @metrics.timed('recommendations.strategies')
     async def _generate_strategy_recommendations(self, ticker: str, market_data: Dict,
                                                ml_analysis: Dict, account_size: float,
                                                risk_level: RiskLevel) -> List[TradeRecommendation]:
@@ -411,12 +1105,19 @@ class TradeRecommendationEngine:
             vol_prediction = vol_forecast.get('prediction', 'STABLE')
             confidence = composite.get('confidence_score', 0.5)
             
+            # Search the listed chain when there is one
+            if market_data.get('options_chain'):
+                return self._searched_strategy_recommendations(
+                    ticker, stock_price, market_data['options_chain'], ml_analysis, account_size, risk_level
+                )
+            
             # Volatility-based strategies
             if vol_prediction == 'EXPANSION' and confidence > 0.6:
                 # Long straddle for volatility expansion
                 atm_strike = round(stock_price)
-                iv = np.clip(np.random.normal(30, 8), 15, 60)
                 expiry_days = 21
+                iv = self._resolve_iv(market_data, expiry_days,
+                                      lambda: np.clip(np.random.normal(30, 8), 15, 60))
                 
                 call_metrics = self.options_strategy.calculate_option_metrics(
                     stock_price, atm_strike, expiry_days, iv, True
@@ -430,6 +1131,8 @@ class TradeRecommendationEngine:
                 
                 max_risk = contracts * total_premium * 100
                 max_reward = max_risk * 2  # Assume good volatility expansion
+                pop, ev = structure_odds(STRADDLE, stock_price, iv / 100, expiry_days, total_premium,
+                                         atm_strike, atm_strike)
                 
                 recommendations.append(TradeRecommendation(
                     ticker=ticker,
@@ -440,7 +1143,7 @@ class TradeRecommendationEngine:
                     stop_loss=total_premium * 0.6,
                     position_size=contracts,
                     risk_reward_ratio=2.0,
-                    probability_of_profit=0.65,
+                    probability_of_profit=pop,
                     max_risk=max_risk,
                     max_reward=max_reward,
                     time_horizon=f'{expiry_days} days',
@@ -455,13 +1158,142 @@ class TradeRecommendationEngine:
                     ],
                     expiry_date=(datetime.now() + timedelta(days=expiry_days)).strftime('%Y-%m-%d'),
                     strike_prices=[atm_strike, atm_strike],
-                    premium=total_premium
+                    premium=total_premium,
+                    expected_value=ev * contracts * CONTRACT_MULTIPLIER
                 ))
                 
         except Exception as e:
             print(f"Error generating strategy recommendations: {e}")
+            metrics.record_error('recommendations.strategies')
         
         return recommendations
+    
+    def _searched_strategy_recommendations(self, ticker: str, stock_price: float, chain: Dict,
+                                           ml_analysis: Dict, account_size: float,
+                                           risk_level: RiskLevel) -> List[TradeRecommendation]:
+        """Best listed multi-leg structure per ML signal, from ``search_strategies``.
+        
+        Structures are ranked on expected return on risk net of the risk-free
+        carry, sized to the risk level's budget. Where the chain's quotes match
+        the model, that return is close to zero for every candidate, so the
+        pick says little beyond fitting the budget and the POP front.
+        """
+        ml_pred = ml_analysis.get('ml_analysis', {})
+        vol_prediction = ml_pred.get('volatility_forecast', {}).get('prediction', 'STABLE')
+        direction = ml_pred.get('price_prediction', {}).get('direction', 'NEUTRAL')
+        composite = ml_pred.get('composite_score', {})
+        confidence = composite.get('confidence_score', 0.5)
+        
+        structures = []
+        if vol_prediction == 'EXPANSION' and confidence > 0.6:
+            structures += ['straddle', 'strangle']
+        elif vol_prediction == 'CONTRACTION' and confidence > 0.6:
+            structures += ['iron_condor', 'calendar_spread']
+        if direction == 'BULLISH':
+            structures.append('call_spread')
+        elif direction == 'BEARISH':
+            structures.append('put_spread')
+        if not structures:
+            return []
+        
+        risk_budget = account_size * self.risk_preferences[risk_level]['max_risk_pct']
+        found = search_strategies(stock_price, chain, structures=structures, top_k=1,
+                                  max_risk=risk_budget / CONTRACT_MULTIPLIER, net_of_carry=True)
+        
+        recommendations = []
+        for row in range(len(found['structure'])):
+            trade_type = TradeType(SEARCH_STRUCTURES[found['structure'][row]])
+            cost, risk, reward = (float(found[name][row]) for name in ('cost', 'max_risk', 'max_reward'))
+            expiry_days = int(found['expiry_days'][row])
+            strikes = [float(found[f'strike_{leg}'][row]) for leg in range(1, 5)
+                       if np.isfinite(found[f'strike_{leg}'][row])]
+            contracts = max(1, int(risk_budget / (risk * CONTRACT_MULTIPLIER)))
+            
+            if cost > 0:  # debit: target half the reward, stop at half the debit
+                target = cost + 0.5 * reward if np.isfinite(reward) else cost * 1.5
+                entry, stop = cost, cost * 0.5
+            else:  # credit: buy back at half the credit, stop at twice it
+                entry = -cost
+                target, stop = entry * 0.5, entry * 2.0
+            max_risk = contracts * risk * CONTRACT_MULTIPLIER
+            max_reward = contracts * reward * CONTRACT_MULTIPLIER if np.isfinite(reward) else max_risk * 2
+            
+            recommendations.append(TradeRecommendation(
+                ticker=ticker,
+                trade_type=trade_type,
+                direction={'call_spread': 'BULLISH', 'put_spread': 'BEARISH'}.get(trade_type.value, 'NEUTRAL'),
+                entry_price=entry,
+                target_price=target,
+                stop_loss=stop,
+                position_size=contracts,
+                risk_reward_ratio=max_reward / max_risk,
+                probability_of_profit=float(found['probability_of_profit'][row]),
+                max_risk=max_risk,
+                max_reward=max_reward,
+                time_horizon=f'{expiry_days} days',
+                confidence_score=confidence * 0.8,
+                ml_rating=composite.get('rating', 'B'),
+                strategy_description=f"{trade_type.value.replace('_', ' ').title()} selected from the listed chain "
+                                     f"by expected return on risk net of carry",
+                risk_level=risk_level,
+                reasons=[
+                    f"ML signal: {direction.lower()} price, {vol_prediction.lower()} volatility "
+                    f"({confidence:.1%} confidence)",
+                    f"Strikes {', '.join(f'${strike:g}' for strike in strikes)}, "
+                    f"{'debit' if cost > 0 else 'credit'} ${abs(cost):.2f}",
+                    f"Expected return on risk {found['return_on_risk'][row]:.1%}, "
+                    f"net delta {found['delta'][row]:+.2f}"
+                ],
+                expiry_date=(datetime.now() + timedelta(days=expiry_days)).strftime('%Y-%m-%d'),
+                strike_prices=strikes,
+                premium=abs(cost),
+                expected_value=float(found['expected_value'][row]) * contracts * CONTRACT_MULTIPLIER
+            ))
+        
+        return recommendations
+
+    def _searched_strategy_batch(self, tickers, rows, price, chains, ml_pred: Dict, confidence,
+                                 account_size: float, risk_level: RiskLevel) -> RecommendationBatch:
+        """``_searched_strategy_recommendations`` for the given rows of a batch, packed as columns"""
+        recommendations, owners = [], []
+        for row in rows:
+            signal = {'ml_analysis': {
+                'price_prediction': {'direction': ml_pred['price_prediction']['direction'][row]},
+                'volatility_forecast': {'prediction': ml_pred['volatility_forecast']['prediction'][row]},
+                'composite_score': {'confidence_score': float(confidence[row]),
+                                    'rating': ml_pred['composite_score']['rating'][row]},
+            }}
+            try:
+                found = self._searched_strategy_recommendations(str(tickers[row]), float(price[row]), chains[row],
+                                                                signal, account_size, risk_level)
+            except Exception as e:
+                print(f"Error generating strategy recommendations: {e}")
+                metrics.record_error('recommendations.strategies')
+                continue
+            recommendations += found
+            owners += [row] * len(found)
+        if not recommendations:
+            return RecommendationBatch.empty(tickers)
+        
+        packed = RecommendationBatch.from_recommendations(recommendations)
+        owners = np.asarray(owners, dtype=np.int64)
+        columns = dict(packed.columns, ticker_index=owners, underlying_price=price[owners],
+                       signal_confidence=confidence[owners])
+        batch = RecommendationBatch(tickers, columns)
+        batch._rendered = packed._rendered
+        return batch
+
+# Global recommendation engine instance, built on first use
+_recommendation_engine = None
+
+def get_recommendation_engine() -> TradeRecommendationEngine:
+    """The process-wide TradeRecommendationEngine"""
+    global _recommendation_engine
+    if _recommendation_engine is None:
+        _recommendation_engine = TradeRecommendationEngine()
+    return _recommendation_engine
 
-# Global recommendation engine instance
-recommendation_engine = TradeRecommendationEngine()
\ No newline at end of file
+def __getattr__(name):
+    if name == 'recommendation_engine':
+        return get_recommendation_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""
+Shared-Memory Universe Scan
+Multi-process ML scoring over a ticker x feature matrix held in shared memory
+"""
+
+import os
+import numpy as np
+from concurrent.futures import Executor, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Sequence
+
+from ml_models import (
+    OPTIONS_FEATURES, RATINGS, SHORT_DATA_FIELDS, TECHNICAL_FEATURES, QuantumMLEngine, get_ml_engine
+)
+
+FEATURE_COLUMNS = TECHNICAL_FEATURES + OPTIONS_FEATURES + tuple(SHORT_DATA_FIELDS)
+
+# Numeric prediction outputs; labels are stored as small integer codes
+PREDICTION_COLUMNS = (
+    'price_direction',          # -1 BEARISH, 0 NEUTRAL, 1 BULLISH
+    'price_probability',
+    'price_confidence',
+    'volatility_prediction',    # -1 CONTRACTION, 0 STABLE, 1 EXPANSION
+    'expansion_probability',
+    'expected_vol_change',
+    'flow_direction',           # -1 BEARISH_FLOW, 0 NEUTRAL_FLOW, 1 BULLISH_FLOW
+    'flow_strength',
+    'gamma_impact',
+    'overall_direction',        # -1 BEARISH, 0 NEUTRAL, 1 BULLISH
+    'confidence_score',
+    'rating',                   # index into RATINGS
+    'risk_adjusted_score',
+)
+
+FEATURE_INDEX = {name: j for j, name in enumerate(FEATURE_COLUMNS)}
+PREDICTION_INDEX = {name: j for j, name in enumerate(PREDICTION_COLUMNS)}
+
+class SharedMatrix:
+    """A float64 (rows x columns) matrix backed by a named shared-memory block.
+
+    Stored column-major so one column over any row range is a contiguous slice.
+    Only the block name and shape need to cross process boundaries.
+    """
+
+    def __init__(self, rows: int, columns: int, name: Optional[str] = None):
+        self.shape = (rows, columns)
+        nbytes = max(rows * columns * 8, 8)
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        else:
+            self.shm = _attach(name)
+        self.array = np.ndarray(self.shape, dtype=np.float64, buffer=self.shm.buf, order='F')
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self):
+        """Release this process's mapping (and the block itself if we created it)"""
+        self.array = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to an existing block; the coordinator that created it owns its lifetime.
+
+    Pool workers share the coordinator's resource tracker, so on Pythons without
+    the ``track`` flag the attach-time registration is a harmless duplicate.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13
+        return shared_memory.SharedMemory(name=name)
+
+def _label_codes(labels: np.ndarray, negative: str, positive: str) -> np.ndarray:
+    return (labels == positive).astype(float) - (labels == negative)
+
+def build_feature_matrix(engine: QuantumMLEngine, market_data, short_data=None) -> SharedMatrix:
+    """Run batch feature engineering and lay the result out in shared memory"""
+    technical = engine.feature_engineer.calculate_technical_features_batch(market_data)
+    n = len(technical['price_momentum'])
+    options = engine.feature_engineer.calculate_options_features_batch(
+        n, short_data, {name: market_data[name] for name in OPTIONS_FEATURES if name in market_data}
+    )
+    features = {**technical, **options}
+
+    matrix = SharedMatrix(n, len(FEATURE_COLUMNS))
+    for name, j in FEATURE_INDEX.items():
+        matrix.array[:, j] = features.get(name, 0.0)
+    return matrix
+
+# Per-process engine used by pool workers, built on first use in each worker
+_worker_engine = None
+
+def score_rows(engine: QuantumMLEngine, features: np.ndarray, out: np.ndarray, start: int, stop: int):
+    """Score rows [start, stop) of a feature matrix into a prediction matrix"""
+    columns = {name: features[start:stop, j] for name, j in FEATURE_INDEX.items()}
+    price = engine.predictor.predict_price_direction_batch(columns)
+    volatility = engine.predictor.predict_volatility_batch(columns)
+    flow = engine.predictor.analyze_options_flow_batch(columns)
+    composite = engine._calculate_composite_score_batch(price, volatility, flow)
+
+    rating_codes = np.zeros(stop - start)
+    for code, rating in enumerate(RATINGS):
+        rating_codes[composite['rating'] == rating] = code
+
+    values = {
+        'price_direction': _label_codes(price['direction'], 'BEARISH', 'BULLISH'),
+        'price_probability': price['probability'],
+        'price_confidence': price['confidence'],
+        'volatility_prediction': _label_codes(volatility['prediction'], 'CONTRACTION', 'EXPANSION'),
+        'expansion_probability': volatility['expansion_probability'],
+        'expected_vol_change': volatility['expected_vol_change'],
+        'flow_direction': _label_codes(flow['flow_direction'], 'BEARISH_FLOW', 'BULLISH_FLOW'),
+        'flow_strength': flow['flow_strength'],
+        'gamma_impact': flow['gamma_impact'],
+        'overall_direction': _label_codes(composite['overall_direction'], 'BEARISH', 'BULLISH'),
+        'confidence_score': composite['confidence_score'],
+        'rating': rating_codes,
+        'risk_adjusted_score': composite['risk_adjusted_score'],
+    }
+    for name, j in PREDICTION_INDEX.items():
+        out[start:stop, j] = values[name]
+
+def _scan_rows(features_name: str, out_name: str, rows: int, start: int, stop: int) -> int:
+    """Process-pool entry point: attach both blocks zero-copy and score a row range"""
+    global _worker_engine
+    if _worker_engine is None:
+        _worker_engine = get_ml_engine()
+
+    features = SharedMatrix(rows, len(FEATURE_COLUMNS), name=features_name)
+    out = SharedMatrix(rows, len(PREDICTION_COLUMNS), name=out_name)
+    try:
+        score_rows(_worker_engine, features.array, out.array, start, stop)
+    finally:
+        features.close()
+        out.close()
+    return stop - start
+
+def scan_shared(features: SharedMatrix, max_workers: Optional[int] = None,
+                rows_per_task: Optional[int] = None, executor: Optional[Executor] = None) -> SharedMatrix:
+    """Score every row of a shared feature matrix across a process pool.
+
+    Workers receive only block names and row offsets; they read their rows and
+    write predictions in place, so IPC per task is constant in universe size.
+    The caller owns (and must ``close``) both matrices.
+    """
+    rows = features.shape[0]
+    workers = max_workers or os.cpu_count() or 1
+    step = rows_per_task or max(1, -(-rows // (workers * 4)))
+    out = SharedMatrix(rows, len(PREDICTION_COLUMNS))
+
+    pool = executor or ProcessPoolExecutor(max_workers=workers)
+    try:
+        tasks = [pool.submit(_scan_rows, features.name, out.name, rows, start, min(start + step, rows))
+                 for start in range(0, rows, step)]
+        for task in tasks:
+            task.result()
+    except Exception:
+        out.close()
+        raise
+    finally:
+        if executor is None:
+            pool.shutdown()
+    return out
+
+def decode_predictions(predictions: np.ndarray) -> Dict[str, np.ndarray]:
+    """Copy a prediction matrix out into named columns with string labels restored"""
+    columns = {name: predictions[:, j].copy() for name, j in PREDICTION_INDEX.items()}
+    for name, labels in (('price_direction', ('BEARISH', 'NEUTRAL', 'BULLISH')),
+                         ('volatility_prediction', ('CONTRACTION', 'STABLE', 'EXPANSION')),
+                         ('flow_direction', ('BEARISH_FLOW', 'NEUTRAL_FLOW', 'BULLISH_FLOW')),
+                         ('overall_direction', ('BEARISH', 'NEUTRAL', 'BULLISH'))):
+        columns[name] = np.asarray(labels)[columns[name].astype(int) + 1]
+    columns['rating'] = np.asarray(RATINGS)[columns['rating'].astype(int)]
+    return columns
+
+def shared_universe_scan(tickers: Sequence[str], market_data, short_data=None,
+                         max_workers: Optional[int] = None, rows_per_task: Optional[int] = None,
+                         executor: Optional[Executor] = None) -> Dict[str, np.ndarray]:
+    """Feature engineering, parallel scoring and decoding for a whole universe"""
+    engine = get_ml_engine()
+    with build_feature_matrix(engine, market_data, short_data) as features:
+        predictions = scan_shared(features, max_workers, rows_per_task, executor)
+        try:
+            result = decode_predictions(predictions.array)
+        finally:
+            predictions.close()
+    result['ticker'] = np.asarray(tickers)
+    return result
@@ -0,0 +1,313 @@
+"""
+Strategy Search
+Vectorized enumeration, pruning and ranking of multi-leg option structures over a strike x expiry grid
+"""
+
+import numpy as np
+from typing import Dict, Optional, Sequence
+
+from metrics import metrics
+from options_pricing import DAYS_PER_YEAR, RISK_FREE_RATE, black_scholes_chain, implied_volatility, option_premium
+from probability import LEG_CALL, LEG_PUT, PathSet, score_positions
+
+# Structure names match TradeType values so callers can map them directly
+SEARCH_STRUCTURES = ('call_spread', 'put_spread', 'straddle', 'strangle', 'iron_condor', 'calendar_spread')
+CALL_SPREAD, PUT_SPREAD, STRADDLE, STRANGLE, IRON_CONDOR, CALENDAR_SPREAD = range(len(SEARCH_STRUCTURES))
+
+# Legs per structure as (is_call, signed quantity, expiry) with expiry 0 = near, 1 = far.
+# Strikes come back in this order as strike_1..strike_4 (long strike first for spreads).
+STRUCTURE_LEGS = {
+    CALL_SPREAD: ((True, 1, 0), (True, -1, 0)),
+    PUT_SPREAD: ((False, 1, 0), (False, -1, 0)),
+    STRADDLE: ((False, 1, 0), (True, 1, 0)),
+    STRANGLE: ((False, 1, 0), (True, 1, 0)),
+    IRON_CONDOR: ((False, 1, 0), (False, -1, 0), (True, -1, 0), (True, 1, 0)),
+    CALENDAR_SPREAD: ((True, -1, 0), (True, 1, 1)),
+}
+MAX_LEGS = 4
+
+# Expiries (calendar days) priced when no chain is supplied
+DEFAULT_EXPIRIES = (7, 14, 21, 30, 45, 60)
+# Listed strikes kept per search, nearest the money first
+MAX_STRIKES = 41
+# Widest spread / condor wing, in strike steps
+MAX_WIDTH = 6
+# Furthest short strike (condors) or straddle strike from the money, in strike steps
+MAX_SPAN = 10
+# Calendars are only built this many strikes either side of the money
+CALENDAR_SPAN = 3
+# Quotes (and net debits/credits) below this premium are treated as untradeable
+MIN_PREMIUM = 0.05
+# Paths for calendars, the only structures that need simulating
+SEARCH_PATHS = 2000
+
+RESULT_COLUMNS = ('structure', 'expiry_days', 'far_expiry_days', 'strike_1', 'strike_2', 'strike_3', 'strike_4',
+                  'cost', 'max_risk', 'max_reward', 'probability_of_profit', 'expected_value', 'return_on_risk',
+                  'delta', 'gamma', 'theta', 'vega')
+
+def strike_step(spot: float) -> float:
+    """Listed-style strike increment for a given underlying price"""
+    return 0.5 if spot < 25 else 1.0 if spot < 100 else 2.5 if spot < 250 else 5.0
+
+def option_grid(spot: float, chain: Optional[Dict] = None, iv: float = 30.0,
+                expiry_days: Sequence[int] = DEFAULT_EXPIRIES, rate: float = RISK_FREE_RATE) -> Dict[str, np.ndarray]:
+    """Call and put quotes on a strikes x expiries grid.
+
+    With a ``chain`` (``strike``/``expiry_days``/``is_call``/``price`` columns,
+    as in ``market_data['options_chain']``) the listed strikes, expiries and
+    quoted premiums are used and each quote's IV is solved; unquoted or
+    unsolvable cells are NaN. Without one a synthetic listed-style grid is
+    priced at a flat ``iv`` (percent). Quote arrays are (2, expiries, strikes)
+    with calls first; ``atm_iv`` (decimal) is one per expiry.
+    """
+    if chain is not None and len(chain['strike']):
+        listed = np.asarray(chain['strike'], dtype=float)
+        days = np.asarray(chain['expiry_days'], dtype=float)
+        is_call = np.asarray(chain['is_call'], dtype=bool)
+        price = np.asarray(chain['price'], dtype=float)
+        live = days > 0
+        strikes = np.unique(listed[live])
+        strikes = np.sort(strikes[np.argsort(np.abs(strikes - spot), kind='stable')[:MAX_STRIKES]])
+        expiries = np.unique(days[live])
+
+        k = np.minimum(np.searchsorted(strikes, listed), len(strikes) - 1)
+        quoted = np.flatnonzero(live & (strikes[k] == listed) & (price > 0))
+        e = np.searchsorted(expiries, days[quoted])
+        side = np.where(is_call[quoted], 0, 1)
+        solved = implied_volatility(price[quoted], spot, listed[quoted], days[quoted], is_call[quoted], rate)
+        premium = np.full((2, len(expiries), len(strikes)), np.nan)
+        sigma = np.full_like(premium, np.nan)
+        ok = solved['converged']
+        premium[side[ok], e[ok], k[quoted][ok]] = price[quoted][ok]
+        sigma[side[ok], e[ok], k[quoted][ok]] = solved['iv'][ok]
+    else:
+        step = strike_step(spot)
+        atm = round(spot / step) * step
+        strikes = atm + step * np.arange(-(MAX_STRIKES // 2), MAX_STRIKES // 2 + 1)
+        strikes = strikes[strikes > 0]
+        expiries = np.asarray(expiry_days, dtype=float)
+        sigma = np.full((2, len(expiries), len(strikes)), iv / 100)
+        premium = None
+
+    greeks = black_scholes_chain(spot, strikes[None, None, :], expiries[None, :, None], sigma,
+                                 np.array([True, False])[:, None, None], rate)
+    if premium is None:
+        premium = greeks['premium']
+
+    # ATM IV per expiry: mean of the call and put IVs at the quoted strike nearest spot
+    atm_iv = np.full(len(expiries), iv / 100)
+    quoted_sides = np.isfinite(sigma).sum(axis=0)
+    mid = np.where(quoted_sides > 0, np.nansum(sigma, axis=0) / np.maximum(quoted_sides, 1), np.nan)
+    for row in range(len(expiries)):
+        quoted = np.flatnonzero(np.isfinite(mid[row]))
+        if len(quoted):
+            atm_iv[row] = mid[row, quoted[np.argmin(np.abs(strikes[quoted] - spot))]]
+
+    return {
+        'strike': strikes,
+        'expiry_days': expiries,
+        'premium': premium,
+        'iv': sigma,
+        'delta': greeks['delta'],
+        'gamma': greeks['gamma'],
+        'theta': greeks['theta'],
+        'vega': greeks['vega'],
+        'atm_iv': atm_iv,
+    }
+
+def _strike_combinations(strikes: np.ndarray, spot: float) -> Dict[int, np.ndarray]:
+    """Strike-index tuples (rows x legs, in STRUCTURE_LEGS order) for one expiry"""
+    n = len(strikes)
+    index = np.arange(n)
+    atm = int(np.argmin(np.abs(strikes - spot)))
+    low, high = np.triu_indices(n, 1)
+    vertical = high - low <= MAX_WIDTH
+    around = index[np.abs(index - atm) <= MAX_SPAN]
+    strangle = (strikes[low] <= spot) & (strikes[high] >= spot) & (high - low <= 2 * MAX_WIDTH)
+
+    # Condors: OTM short put b and short call c with equal wings of w steps
+    short_put = index[(strikes < spot) & (atm - index <= MAX_SPAN)]
+    short_call = index[(strikes > spot) & (index - atm <= MAX_SPAN)]
+    b, c, w = (axis.ravel() for axis in np.meshgrid(short_put, short_call, np.arange(1, MAX_WIDTH + 1), indexing='ij'))
+    fits = (b - w >= 0) & (c + w < n)
+    b, c, w = b[fits], c[fits], w[fits]
+
+    return {
+        CALL_SPREAD: np.column_stack([low[vertical], high[vertical]]),
+        PUT_SPREAD: np.column_stack([high[vertical], low[vertical]]),
+        STRADDLE: np.column_stack([around, around]),
+        STRANGLE: np.column_stack([low[strangle], high[strangle]]),
+        IRON_CONDOR: np.column_stack([b - w, b, c, c + w]),
+        CALENDAR_SPREAD: np.repeat(index[np.abs(index - atm) <= CALENDAR_SPAN, None], 2, axis=1),
+    }
+
+def enumerate_candidates(grid: Dict[str, np.ndarray], spot: float,
+                         structures: Sequence[str] = SEARCH_STRUCTURES) -> Dict[str, np.ndarray]:
+    """Every candidate of the requested structures as padded (candidates, MAX_LEGS) leg tables.
+
+    Same-expiry structures are built at every expiry; calendars pair every
+    near expiry with every later one. ``leg_strike`` and ``leg_expiry`` index
+    into the grid; padding legs have zero quantity.
+    """
+    codes = [SEARCH_STRUCTURES.index(name) for name in structures]
+    combinations = _strike_combinations(grid['strike'], spot)
+    n_expiries = len(grid['expiry_days'])
+    near_far = np.triu_indices(n_expiries, 1)
+    parts = []
+    for code in codes:
+        strikes = combinations[code]
+        template = STRUCTURE_LEGS[code]
+        if code == CALENDAR_SPREAD:
+            expiries = np.column_stack(near_far)
+            pairs = np.repeat(np.arange(len(expiries)), len(strikes))
+            expiries, strikes = expiries[pairs], np.tile(strikes, (len(expiries), 1))
+        else:
+            expiries = np.repeat(np.arange(n_expiries), len(strikes))[:, None]
+            strikes = np.tile(strikes, (n_expiries, 1))
+        m = len(strikes)
+        leg_strike = np.zeros((m, MAX_LEGS), dtype=np.intp)
+        leg_expiry = np.repeat(expiries[:, :1], MAX_LEGS, axis=1)
+        leg_call = np.zeros((m, MAX_LEGS), dtype=bool)
+        leg_quantity = np.zeros((m, MAX_LEGS))
+        for slot, (is_call, quantity, expiry) in enumerate(template):
+            leg_strike[:, slot] = strikes[:, slot]
+            leg_expiry[:, slot] = expiries[:, expiry]
+            leg_call[:, slot] = is_call
+            leg_quantity[:, slot] = quantity
+        parts.append({'structure': np.full(m, code, dtype=np.int8), 'near': expiries[:, 0],
+                      'leg_strike': leg_strike, 'leg_expiry': leg_expiry,
+                      'leg_call': leg_call, 'leg_quantity': leg_quantity})
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]} if parts else {}
+
+def _pareto_top(structure: np.ndarray, score: np.ndarray, pop: np.ndarray, top_k: int) -> np.ndarray:
+    """Rows on each structure's (score, POP) Pareto front, best ``top_k`` by score per structure"""
+    order = np.lexsort((-pop, -score, structure))
+    group = structure[order].astype(float)
+    # Running POP maximum that restarts per structure (POP is in [0, 1], groups are 2 apart)
+    best = np.maximum.accumulate(pop[order] + 2 * group) - 2 * group
+    starts = np.r_[True, group[1:] != group[:-1]]
+    previous = np.where(starts, -np.inf, np.r_[-np.inf, best[:-1]])
+    front = order[pop[order] > previous]
+    group = structure[front]
+    first = np.r_[0, np.flatnonzero(group[1:] != group[:-1]) + 1]
+    rank = np.arange(len(front)) - np.repeat(first, np.diff(np.r_[first, len(front)]))
+    return front[rank < top_k]
+
+def _empty_result() -> Dict[str, np.ndarray]:
+    return {name: np.zeros(0, dtype=np.int8 if name == 'structure' else float) for name in RESULT_COLUMNS}
+
+@metrics.timed('strategies.search')
+def search_strategies(spot: float, chain: Optional[Dict] = None, iv: float = 30.0,
+                      structures: Sequence[str] = SEARCH_STRUCTURES, top_k: int = 3,
+                      max_risk: Optional[float] = None, expiry_days: Sequence[int] = DEFAULT_EXPIRIES,
+                      drift: float = RISK_FREE_RATE, rate: float = RISK_FREE_RATE,
+                      paths: Optional[PathSet] = None, net_of_carry: bool = False) -> Dict[str, np.ndarray]:
+    """Best multi-leg structures for one underlying, as columns (see RESULT_COLUMNS).
+
+    Candidates from ``enumerate_candidates`` are priced from the grid quotes;
+    cost, Greeks and an expiry payoff matrix at each candidate's breakpoints
+    give max risk and reward, and candidates that cannot profit, carry an
+    untradeable leg or risk more than ``max_risk`` per unit are pruned before
+    POP/EV scoring. Survivors are ranked by expected return on risk, keeping
+    only the (return, POP) Pareto front, ``top_k`` per structure. Money
+    values are per unit of underlying (multiply by the contract size).
+
+    With ``net_of_carry`` the ranking return leaves out the carry a fairly
+    priced position earns by growing at ``drift`` (cost x (e^(drift t) - 1)),
+    which otherwise favours the longest expiry whenever the quotes carry no
+    edge over the model. ``return_on_risk`` is reported gross either way.
+    """
+    try:
+        grid = option_grid(spot, chain, iv, expiry_days, rate)
+        candidates = enumerate_candidates(grid, spot, structures)
+        if not candidates:
+            return _empty_result()
+        metrics.record_batch('strategies.search', len(candidates['structure']))
+
+        side = np.where(candidates['leg_call'], 0, 1)
+        cells = (side, candidates['leg_expiry'], candidates['leg_strike'])
+        quantity = candidates['leg_quantity']
+        used = quantity != 0
+        premium = np.where(used, grid['premium'][cells], 0.0)
+        tradeable = np.all(~used | (premium >= MIN_PREMIUM), axis=1)
+
+        strike = np.where(used, grid['strike'][candidates['leg_strike']], 0.0)
+        leg_days = grid['expiry_days'][candidates['leg_expiry']]
+        horizon = grid['expiry_days'][candidates['near']]
+        cost = (quantity * premium).sum(axis=1)
+
+        # Payoff matrix at the breakpoints; legs expiring later are marked with Black-Scholes
+        points = np.concatenate([np.zeros((len(strike), 1)), np.sort(strike, axis=1)], axis=1)
+        pnl = np.repeat(-cost[:, None], points.shape[1], axis=1)
+        for slot in range(MAX_LEGS):
+            call = candidates['leg_call'][:, slot, None]
+            value = np.maximum(np.where(call, points - strike[:, slot, None], strike[:, slot, None] - points), 0.0)
+            later = np.flatnonzero(used[:, slot] & (leg_days[:, slot] > horizon))
+            if len(later):
+                with np.errstate(divide='ignore'):  # the zero-price breakpoint
+                    value[later] = option_premium(points[later], strike[later, slot, None],
+                                                  (leg_days[later, slot] - horizon[later])[:, None],
+                                                  grid['iv'][side[later, slot], candidates['leg_expiry'][later, slot],
+                                                                 candidates['leg_strike'][later, slot]][:, None],
+                                                  call[later], rate)
+            pnl += quantity[:, slot, None] * value
+        slope = np.where(candidates['leg_call'], quantity, 0.0).sum(axis=1)
+        max_reward = np.where(slope > 0, np.inf, pnl.max(axis=1))
+        max_loss = np.where(slope < 0, np.inf, -pnl.min(axis=1))
+
+        keep = tradeable & (np.abs(cost) >= MIN_PREMIUM) & (max_reward > 0) & (max_loss > 0)
+        if max_risk is not None:
+            keep &= max_loss <= max_risk
+        rows = np.flatnonzero(keep)
+        if not len(rows):
+            return _empty_result()
+
+        leg_row, leg_slot = np.nonzero(used[rows])
+        cell = tuple(axis[rows][leg_row, leg_slot] for axis in cells)
+        positions = {
+            'underlying': np.zeros(len(rows)),
+            'spot': np.full(len(rows), float(spot)),
+            'vol': grid['atm_iv'][candidates['near'][rows]],
+            'days': horizon[rows],
+            'cost': cost[rows],
+        }
+        legs = {
+            'position': leg_row,
+            'kind': np.where(candidates['leg_call'][rows][leg_row, leg_slot], LEG_CALL, LEG_PUT),
+            'strike': strike[rows][leg_row, leg_slot],
+            'quantity': quantity[rows][leg_row, leg_slot],
+            'days': leg_days[rows][leg_row, leg_slot],
+            'vol': grid['iv'][cell],
+        }
+        if paths is None and (legs['days'] > positions['days'][leg_row]).any():
+            paths = PathSet(SEARCH_PATHS)
+        pop, ev = score_positions(positions, legs, paths, drift, rate)
+        return_on_risk = ev / max_loss[rows]
+        score = return_on_risk
+        if net_of_carry:
+            score = (ev - cost[rows] * np.expm1(drift * horizon[rows] / DAYS_PER_YEAR)) / max_loss[rows]
+
+        best = _pareto_top(candidates['structure'][rows], score, pop, top_k)
+        picked = rows[best]
+        result = {
+            'structure': candidates['structure'][picked],
+            'expiry_days': horizon[picked],
+            'far_expiry_days': leg_days[picked].max(axis=1),
+            'cost': cost[picked],
+            'max_risk': max_loss[picked],
+            'max_reward': max_reward[picked],
+            'probability_of_profit': pop[best],
+            'expected_value': ev[best],
+            'return_on_risk': return_on_risk[best],
+        }
+        for slot in range(MAX_LEGS):
+            result[f'strike_{slot + 1}'] = np.where(used[picked, slot], strike[picked, slot], np.nan)
+        for greek in ('delta', 'gamma', 'theta', 'vega'):
+            values = np.where(used[picked], grid[greek][tuple(axis[picked] for axis in cells)], 0.0)
+            result[greek] = (quantity[picked] * values).sum(axis=1)
+        return {name: result[name] for name in RESULT_COLUMNS}
+
+    except Exception as e:
+        print(f"Error searching strategies: {e}")
+        metrics.record_error('strategies.search')
+        return _empty_result()
@@ -0,0 +1,31 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# The services are flat modules imported by name (``from metrics import metrics``)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml_models import QuantumMLEngine
+from recommendation_engine import RiskLevel, TradeRecommendationEngine
+
+@pytest.fixture(scope='session')
+def recommendation_batch():
+    """Recommendations for a seeded 500-ticker universe"""
+    np.random.seed(11)
+    rng = np.random.default_rng(11)
+    n = 500
+    price = rng.lognormal(np.log(60), 1.0, n).clip(1, 2000)
+    market_data = {
+        'price': price,
+        'volume': rng.lognormal(np.log(2e6), 1.5, n),
+        'high': price * rng.uniform(1.0, 1.06, n),
+        'low': price * rng.uniform(0.94, 1.0, n),
+    }
+    tickers = [f'SYN{i:05d}' for i in range(n)]
+    analysis = QuantumMLEngine(cache_features=False, model_dir=None).analyze_batch(tickers, market_data)
+    batch = TradeRecommendationEngine().generate_recommendations_batch(analysis, market_data, 100000,
+                                                                       RiskLevel.AGGRESSIVE)
+    assert len(batch)
+    return batch
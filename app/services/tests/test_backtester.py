@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from backtester import HORIZON, STOP, TARGET, backtest
+from bar_store import BarStore
+from options_pricing import RISK_FREE_RATE, option_premium
+from recommendation_engine import BATCH_COLUMNS, TRADE_TYPE_CODES, RecommendationBatch, TradeType
+
+START = np.datetime64('2024-01-02')
+
+def store_path(tmp_path, closes, ticker='TEST'):
+    """A store holding one bar per day with open = previous close and a 1% range"""
+    closes = np.asarray(closes, dtype=float)
+    opens = np.r_[closes[0], closes[:-1]]
+    store = BarStore(str(tmp_path))
+    store.append(ticker, START + np.arange(len(closes)), opens, np.maximum(opens, closes) * 1.01,
+                 np.minimum(opens, closes) * 0.99, closes, np.full(len(closes), 1e6))
+    return str(tmp_path)
+
+def trades(*rows):
+    columns = {name: np.array([row.get(name, np.nan if np.issubdtype(dtype, np.floating) else 0) for row in rows],
+                              dtype=dtype)
+               for name, dtype in BATCH_COLUMNS.items()}
+    return RecommendationBatch(['TEST'], columns)
+
+def straddle_value(spot, days_left):
+    return sum(option_premium(spot, 100.0, days_left, 0.3, is_call, RISK_FREE_RATE) for is_call in (True, False))
+
+def test_straddle_rally_hits_target(tmp_path):
+    # Both legs priced: an up move is a gain for a straddle, not a loss
+    root = store_path(tmp_path, [100, 103, 106, 110, 113, 116, 118, 120])
+    entry = float(straddle_value(100.0, 30))
+    batch = trades({'trade_type': TRADE_TYPE_CODES[TradeType.STRADDLE], 'entry_price': entry,
+                    'target_price': entry * 1.5, 'stop_loss': entry * 0.6, 'position_size': 2,
+                    'expiry_days': 30, 'strike_1': 100.0, 'strike_2': 100.0, 'implied_volatility': 30.0})
+    result = backtest(batch, START, root=root)['trades']
+
+    assert result['exit_reason'][0] == TARGET
+    assert result['exit_price'][0] == pytest.approx(entry * 1.5)
+    assert result['pnl'][0] == pytest.approx(entry * 0.5 * 2 * 100)
+
+def test_straddle_marked_at_call_plus_put(tmp_path):
+    # A quiet path never touches the levels, so the exit is the horizon close
+    closes = np.full(40, 100.0)
+    closes[-12:] = 104.0
+    root = store_path(tmp_path, closes)
+    entry = float(straddle_value(100.0, 30))
+    batch = trades({'trade_type': TRADE_TYPE_CODES[TradeType.STRADDLE], 'entry_price': entry,
+                    'target_price': entry * 10, 'stop_loss': 0.01, 'position_size': 1,
+                    'expiry_days': 30, 'strike_1': 100.0, 'strike_2': 100.0, 'implied_volatility': 30.0})
+    result = backtest(batch, START, root=root)['trades']
+
+    assert result['exit_reason'][0] == HORIZON
+    assert result['exit_price'][0] == pytest.approx(4.0, abs=1e-4)  # intrinsic at expiry
+    assert result['pnl'][0] == pytest.approx((4.0 - entry) * 100, abs=1e-2)
+
+def test_stock_levels_fill_at_level_or_gap(tmp_path):
+    root = store_path(tmp_path, [100, 102, 104, 109, 111, 80])
+    long_trade = {'trade_type': TRADE_TYPE_CODES[TradeType.STOCK_LONG], 'direction': 1, 'entry_price': 100.0,
+                  'target_price': 110.0, 'stop_loss': 85.0, 'position_size': 10}
+    gap_stop = {'trade_type': TRADE_TYPE_CODES[TradeType.STOCK_LONG], 'direction': 1, 'entry_price': 100.0,
+                'target_price': 200.0, 'stop_loss': 90.0, 'position_size': 10}
+    result = backtest(trades(long_trade, gap_stop), START, root=root)['trades']
+
+    assert list(result['exit_reason']) == [TARGET, STOP]
+    assert result['exit_price'][0] == pytest.approx(110.0)
+    assert result['pnl'][0] == pytest.approx(100.0)
+    # The last bar opens at 111 and trades down to 79.2: the stop fills at its level
+    assert result['exit_price'][1] == pytest.approx(90.0)
+    assert result['exit_date'][1] == START + 5
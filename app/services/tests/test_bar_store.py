@@ -0,0 +1,53 @@
+import os
+
+import numpy as np
+import pytest
+
+from bar_store import DATE_FILE, BarStore, _field_file
+
+START = np.datetime64('2024-01-01')
+
+def bars(days, first=0):
+    """``days`` consecutive daily bars starting ``first`` days after START, close = 100 + day"""
+    day = np.arange(first, first + days)
+    close = 100.0 + day
+    return START + day, close - 0.5, close + 1, close - 1, close, np.full(days, 1e6)
+
+def test_append_and_read_round_trip(tmp_path):
+    store = BarStore(str(tmp_path))
+    assert store.append('aaa', *bars(10)) == 10
+    assert 'AAA' in store and store.length('AAA') == 10 and store.tickers() == ['AAA']
+    window = store.read('AAA', START + 2, START + 4)
+    np.testing.assert_array_equal(window['date'], START + np.arange(2, 5))
+    np.testing.assert_array_equal(window['close'], [102.0, 103.0, 104.0])
+    assert not window['close'].flags.writeable
+
+def test_overlapping_appends_only_add_new_bars(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.append('AAA', *bars(10))
+    assert store.append('AAA', *bars(10, first=5)) == 5
+    np.testing.assert_array_equal(store.read('AAA')['close'], 100.0 + np.arange(15))
+    with pytest.raises(ValueError):
+        store.append('AAA', *(column[::-1] for column in bars(3, first=20)))
+
+def test_interrupted_append_is_trimmed(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.append('AAA', *bars(5))
+    # An append that wrote a field but died before committing its dates
+    with open(os.path.join(str(tmp_path), 'AAA', _field_file('close')), 'ab') as f:
+        f.write(np.array([999.0, 999.0]).tobytes())
+    assert store.length('AAA') == 5
+    store.append('AAA', *bars(2, first=5))
+    np.testing.assert_array_equal(store.read('AAA')['close'], 100.0 + np.arange(7))
+    assert os.path.getsize(os.path.join(str(tmp_path), 'AAA', DATE_FILE)) == 7 * 8
+
+def test_panels_group_tickers_by_calendar(tmp_path):
+    store = BarStore(str(tmp_path))
+    store.append('AAA', *bars(10))
+    store.append('BBB', *bars(10))
+    store.append('NEW', *bars(4, first=6))
+    assert sorted(map(sorted, store.calendar_groups(['AAA', 'BBB', 'NEW']))) == [['AAA', 'BBB'], ['NEW']]
+    dates, panel = store.panel(['AAA', 'BBB'], fields=('close',))
+    assert panel['close'].shape == (10, 2)
+    with pytest.raises(ValueError):
+        store.panel(['AAA', 'NEW'])
@@ -0,0 +1,68 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from ml_models import OPTIONS_FEATURES, TECHNICAL_FEATURES, QuantumMLEngine
+
+INDICATORS = ('price_momentum', 'rsi_14', 'macd_signal', 'bollinger_position', 'stoch_k',
+              'vwap_deviation', 'money_flow_index', 'on_balance_volume')
+
+@pytest.fixture
+def universe():
+    rng = np.random.default_rng(7)
+    n = 64
+    price = rng.uniform(5, 500, n)
+    columns = {
+        'price': price,
+        'volume': rng.uniform(1e5, 2e7, n),
+        'high': price * rng.uniform(1.0, 1.05, n),
+        'low': price * rng.uniform(0.95, 1.0, n),
+        'price_momentum': rng.normal(0, 0.1, n),
+        'rsi_14': rng.uniform(0, 100, n),
+        'macd_signal': rng.normal(0, 0.05, n),
+        'bollinger_position': rng.uniform(0, 1, n),
+        'stoch_k': rng.uniform(0, 100, n),
+        'vwap_deviation': rng.normal(0, 0.02, n),
+        'money_flow_index': rng.uniform(0, 100, n),
+        'on_balance_volume': rng.normal(0, 0.1, n),
+        'implied_volatility': rng.uniform(10, 100, n),
+        'iv_rank': rng.uniform(0, 100, n),
+        'iv_percentile': rng.uniform(0, 100, n),
+        'put_call_ratio': rng.uniform(0.3, 3.0, n),
+        'gamma_exposure': rng.normal(0, 1e6, n),
+        'delta_exposure': rng.normal(0, 5e5, n),
+    }
+    return [f'T{i:03d}' for i in range(n)], columns
+
+def assert_row_matches(tree, i, expected, path=()):
+    """Row ``i`` of a columnar batch result equals a scalar result (timestamps aside)"""
+    for name, value in expected.items():
+        if name == 'timestamp':
+            continue
+        leaf = tree[name]
+        if isinstance(value, dict):
+            assert_row_matches(leaf, i, value, path + (name,))
+            continue
+        actual = leaf[i] if isinstance(leaf, np.ndarray) and leaf.ndim else leaf
+        if isinstance(value, str):
+            assert actual == value, path + (name,)
+        else:
+            assert actual == pytest.approx(value), path + (name,)
+
+def test_analyze_batch_matches_analyze_stock(universe):
+    tickers, columns = universe
+    engine = QuantumMLEngine(cache_features=False, model_dir=None)
+    batch = engine.analyze_batch(tickers, columns)
+    assert 'error' not in batch
+
+    for i, ticker in enumerate(tickers):
+        market_data = {name: columns[name][i] for name in ('price', 'volume', 'high', 'low')}
+        market_data['indicators'] = {name: columns[name][i] for name in INDICATORS}
+        options_data = {name: columns[name][i] for name in OPTIONS_FEATURES}
+        scalar = asyncio.run(engine.analyze_stock(ticker, market_data, options_data=options_data))
+        assert 'error' not in scalar
+
+        for name in TECHNICAL_FEATURES + OPTIONS_FEATURES:
+            assert batch['features'][name][i] == pytest.approx(scalar['features'][name]), name
+        assert_row_matches(batch['ml_analysis'], i, scalar['ml_analysis'])
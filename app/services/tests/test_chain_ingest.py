@@ -0,0 +1,99 @@
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+
+import chain_ingest
+from chain_ingest import ChainFeatureAccumulator, iter_chain_blocks, read_chain, snapshot_features
+
+AS_OF = date(2025, 1, 2)
+
+def contract(strike, expiration, kind, oi, volume, iv, delta=None, gamma=None, price=None):
+    record = {
+        'details': {'strike_price': strike, 'expiration_date': expiration, 'contract_type': kind},
+        'day': {'volume': volume},
+        'open_interest': oi,
+        'implied_volatility': iv,
+        'last_quote': {'bid': 1.0, 'ask': 1.2},
+    }
+    if delta is not None:
+        record['greeks'] = {'delta': delta, 'gamma': gamma}
+    if price is not None:
+        record['underlying_asset'] = {'price': price}
+    return record
+
+RECORDS = [
+    contract(95, '2025-01-31', 'call', 100, 10, 0.30, 0.70, 0.02, price=100.0),
+    contract(100, '2025-01-31', 'call', 200, 30, 0.25, 0.50, 0.04, price=100.0),
+    contract(100, '2025-01-31', 'put', 300, 60, 0.27, -0.50, 0.04, price=100.0),
+    contract(105, '2025-01-31', 'put', 50, 5, 0.29, -0.75, 0.02, price=100.0),
+    contract(100, '2025-01-05', 'call', 400, 90, 0.60, 0.52, 0.10, price=100.0),   # under ATM_MIN_DAYS
+    contract(100, '2024-12-20', 'put', 999, 999, 0.40, -0.5, 0.05, price=100.0),  # expired
+]
+
+def write(path, records, layout):
+    if layout == 'page':
+        path.write_text(json.dumps({'status': 'OK', 'results': records}))
+    elif layout == 'array':
+        path.write_text(json.dumps(records))
+    else:
+        path.write_text('\n'.join(json.dumps(record) for record in records))
+    return str(path)
+
+@pytest.mark.parametrize('layout', ['page', 'array', 'ndjson'])
+def test_read_chain_layouts(tmp_path, layout):
+    chain = read_chain(write(tmp_path / 'chain.json', RECORDS, layout), AS_OF)
+    np.testing.assert_array_equal(chain['strike'], [95, 100, 100, 105, 100, 100])
+    np.testing.assert_array_equal(chain['expiry_days'], [29, 29, 29, 29, 3, -13])
+    np.testing.assert_array_equal(chain['is_call'], [True, True, False, False, True, False])
+    np.testing.assert_array_equal(chain['open_interest'], [100, 200, 300, 50, 400, 999])
+    assert np.all(chain['underlying_price'] == 100.0)
+
+def test_blocks_cover_the_file(tmp_path):
+    path = write(tmp_path / 'chain.json', RECORDS * 5, 'page')
+    blocks = list(iter_chain_blocks(path, AS_OF, block_rows=4))
+    assert [len(block['strike']) for block in blocks] == [4] * 7 + [2]
+    whole = read_chain(path, AS_OF)
+    np.testing.assert_array_equal(np.concatenate([block['strike'] for block in blocks]), whole['strike'])
+
+def test_snapshot_features_reference_values(tmp_path):
+    features = snapshot_features(write(tmp_path / 'chain.json', RECORDS, 'page'), as_of=AS_OF)
+    # Live contracts only: calls 10 + 30 + 90, puts 60 + 5
+    assert features['put_call_ratio'] == pytest.approx(65 / 130)
+    # Dealer GEX: sign * gamma * OI * 100 * S^2 * 1%; DEX: delta * OI * 100 * S
+    gex = 100 * 100 * 100 * 0.01 * (0.02 * 100 + 0.04 * 200 - 0.04 * 300 - 0.02 * 50 + 0.10 * 400)
+    dex = 100 * 100 * (0.70 * 100 + 0.50 * 200 - 0.50 * 300 - 0.75 * 50 + 0.52 * 400)
+    assert features['gamma_exposure'] == pytest.approx(gex)
+    assert features['delta_exposure'] == pytest.approx(dex)
+    # ATM IV: the 29-day expiry (the 3-day one is too near), mean of the 100 call and put
+    assert features['implied_volatility'] == pytest.approx(26.0)
+
+def test_spot_arriving_late_matches_known_spot(tmp_path):
+    records = [dict(record) for record in RECORDS[:4]]
+    for record in records[:3]:
+        del record['underlying_asset']
+    blocks = list(iter_chain_blocks(write(tmp_path / 'chain.json', records, 'ndjson'), AS_OF, block_rows=1))
+    late = ChainFeatureAccumulator()
+    for block in blocks:
+        late.add(block)
+    known = ChainFeatureAccumulator(100.0)
+    for block in blocks:
+        known.add(block)
+    assert late.features() == pytest.approx(known.features())
+
+def test_missing_spot_is_bounded_and_reported(tmp_path, monkeypatch):
+    monkeypatch.setattr(chain_ingest, 'PENDING_LIMIT', 3)
+    records = [{key: value for key, value in record.items() if key != 'underlying_asset'} for record in RECORDS]
+    path = write(tmp_path / 'chain.json', records * 4, 'array')
+    accumulator = ChainFeatureAccumulator()
+    for block in iter_chain_blocks(path, AS_OF, block_rows=2):
+        accumulator.add(block)
+    assert accumulator.pending_rows <= 3
+    assert accumulator.pending_rows + accumulator.unpriced == 4 * 5
+
+    features = accumulator.features()
+    assert 'gamma_exposure' not in features and 'delta_exposure' not in features
+    assert features['put_call_ratio'] == pytest.approx(65 / 130)
+    # With the spot supplied the same file values fully
+    assert snapshot_features(path, spot=100.0, as_of=AS_OF)['gamma_exposure'] != 0
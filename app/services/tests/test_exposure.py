@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from exposure import ExposureProfile
+
+def chain(seed=5, n=600):
+    rng = np.random.default_rng(seed)
+    return {
+        'strike': rng.choice(np.arange(70.0, 131.0, 2.5), n),
+        'expiry_days': rng.choice([-1.0, 3.0, 10.0, 30.0, 90.0], n),
+        'is_call': rng.random(n) < 0.5,
+        'open_interest': np.where(rng.random(n) < 0.2, 0.0, rng.integers(1, 5000, n)).astype(float),
+        'iv': rng.uniform(0.15, 0.8, n),
+    }
+
+def profile(columns, spot=100.0):
+    return ExposureProfile(spot, columns['strike'], columns['expiry_days'], columns['is_call'],
+                           columns['open_interest'], columns['iv'])
+
+def assert_same_totals(updated, fresh):
+    assert updated.total_gex == pytest.approx(fresh.total_gex, rel=1e-9, abs=1e-6)
+    assert updated.total_dex == pytest.approx(fresh.total_dex, rel=1e-9, abs=1e-6)
+    for name in ('gex_by_strike', 'dex_by_strike', 'gex_by_expiry', 'dex_by_expiry'):
+        np.testing.assert_allclose(getattr(updated, name), getattr(fresh, name), rtol=1e-9, atol=1e-6)
+
+def test_incremental_updates_match_rebuild():
+    columns = chain()
+    updated = profile(columns)
+    rng = np.random.default_rng(9)
+    rows = rng.choice(len(columns['strike']), 150, replace=False)
+    for row in rows[:50]:
+        columns['open_interest'][row] = rng.integers(0, 8000)
+        updated.update(row, open_interest=columns['open_interest'][row])
+    for row in rows[50:100]:
+        columns['iv'][row] = rng.uniform(0.1, 1.0)
+        updated.update(row, iv=columns['iv'][row])
+    for row in rows[100:]:
+        columns['open_interest'][row] = rng.integers(0, 8000)
+        columns['iv'][row] = rng.uniform(0.1, 1.0)
+        updated.update(row, open_interest=columns['open_interest'][row], iv=columns['iv'][row])
+
+    assert_same_totals(updated, profile(columns))
+
+def test_open_interest_on_empty_contract_counts():
+    columns = chain()
+    empty = np.flatnonzero((columns['open_interest'] == 0) & (columns['expiry_days'] > 0))
+    updated = profile(columns)
+    for row in empty:
+        updated.update(row, open_interest=1000)
+    columns['open_interest'][empty] = 1000
+    assert_same_totals(updated, profile(columns))
+
+def test_set_spot_matches_rebuild():
+    columns = chain()
+    moved = profile(columns)
+    version = moved.version
+    moved.set_spot(104.0)
+    assert moved.version > version
+    assert_same_totals(moved, profile(columns, spot=104.0))
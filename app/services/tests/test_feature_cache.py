@@ -0,0 +1,53 @@
+import numpy as np
+
+from feature_cache import FeatureCache, fingerprint
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def counting(cache, inputs, group='technical', ticker='AAA', bar=1):
+    calls = []
+    def compute():
+        calls.append(1)
+        return {'value': 1.0}
+    cache.get_or_compute(group, ticker, bar, inputs, compute)
+    return len(calls)
+
+def test_nan_inputs_hit_the_cache():
+    cache = FeatureCache()
+    assert counting(cache, {'price': 10.0, 'iv': float('nan')}) == 1
+    assert counting(cache, {'iv': float('nan'), 'price': 10.0}) == 0
+    assert counting(cache, {'iv': np.float64('nan'), 'price': np.float64(10.0)}) == 0
+    assert counting(cache, {'iv': 0.3, 'price': 10.0}) == 1
+    assert fingerprint([np.nan, (np.float32('nan'),)]) == fingerprint([float('nan'), (None,)])
+    assert cache.stats()['hits'] == 2
+
+def test_versioned_inputs_miss_after_a_change():
+    class Profile:
+        version = 0
+    profile, cache = Profile(), FeatureCache()
+    assert counting(cache, {'exposure': profile}) == 1
+    assert counting(cache, {'exposure': profile}) == 0
+    profile.version += 1
+    assert counting(cache, {'exposure': profile}) == 1
+
+def test_entries_expire_and_evict():
+    clock = Clock()
+    cache = FeatureCache(max_entries=2, ttl={'technical': 10.0}, clock=clock)
+    assert counting(cache, 1) == 1
+    clock.now = 9.0
+    assert counting(cache, 1) == 0
+    clock.now = 10.0
+    assert counting(cache, 1) == 1
+    assert cache.stats()['expirations'] == 1
+
+    counting(cache, 2)
+    counting(cache, 1)  # refreshes 1, so 2 is the least recently used
+    counting(cache, 3)
+    assert cache.stats()['evictions'] == 1
+    assert counting(cache, 1) == 0
+    assert counting(cache, 2) == 1
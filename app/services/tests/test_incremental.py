@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from incremental import IncrementalScanner
+from ml_models import QuantumMLEngine
+from recommendation_engine import TradeRecommendationEngine
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def universe(n=60, seed=3):
+    rng = np.random.default_rng(seed)
+    price = rng.lognormal(np.log(60), 0.6, n)
+    columns = {'price': price, 'volume': rng.lognormal(np.log(2e6), 1.0, n),
+               'high': price * rng.uniform(1.0, 1.05, n), 'low': price * rng.uniform(0.95, 1.0, n)}
+    return [f'SYN{i:03d}' for i in range(n)], columns
+
+def recommendations_by_ticker(batch):
+    found = {}
+    for view in batch:
+        found.setdefault(view.ticker, []).append((view.trade_type, view.position_size, view.confidence_score))
+    return found
+
+@pytest.fixture
+def scanner():
+    np.random.seed(3)
+    return IncrementalScanner(QuantumMLEngine(cache_features=False, model_dir=None), TradeRecommendationEngine(),
+                              max_age=60.0, clock=Clock())
+
+def test_only_moved_tickers_are_recomputed(scanner):
+    tickers, columns = universe()
+    analysis, batch = scanner.refresh(tickers, columns)
+    assert scanner.stats()['recomputed'] == len(tickers)
+
+    moved = {name: values.copy() for name, values in columns.items()}
+    moved['price'][[4, 9]] *= 1.02          # past the 0.5% threshold
+    moved['price'][[5]] *= 1.001            # within it
+    again, rebatched = scanner.refresh(tickers, moved)
+    assert scanner.stats()['recomputed'] == len(tickers) + 2
+    assert scanner.stats()['served'] == len(tickers) - 2
+
+    still = np.setdiff1d(np.arange(len(tickers)), [4, 9])
+    score = again['ml_analysis']['composite_score']['confidence_score']
+    np.testing.assert_array_equal(score[still], analysis['ml_analysis']['composite_score']['confidence_score'][still])
+    before, after = recommendations_by_ticker(batch), recommendations_by_ticker(rebatched)
+    for row in still:
+        assert after.get(tickers[row]) == before.get(tickers[row])
+    assert set(after) <= set(tickers)
+
+def test_results_expire_and_follow_the_request_order(scanner):
+    tickers, columns = universe()
+    scanner.refresh(tickers, columns)
+    scanner.clock.now = 60.0
+    _, forward = scanner.refresh(tickers, columns)
+    assert scanner.stats()['recomputed'] == 2 * len(tickers)
+
+    order = np.arange(len(tickers))[::-1]
+    analysis, batch = scanner.refresh([tickers[i] for i in order], {k: v[order] for k, v in columns.items()})
+    assert scanner.stats()['served'] == len(tickers)
+    assert list(analysis['ticker']) == [tickers[i] for i in order]
+    assert np.all(np.diff(batch['ticker_index']) >= 0)
+    assert recommendations_by_ticker(batch) == recommendations_by_ticker(forward)
@@ -0,0 +1,56 @@
+import asyncio
+
+import numpy as np
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from market_data_client import SNAPSHOT_PATH, MarketDataClient, snapshot_columns
+
+def snapshot(ticker, close, previous=None):
+    return {'ticker': ticker, 'day': {'c': close, 'v': 1000, 'h': close, 'l': close, 'o': close},
+            'prevDay': {'c': previous if previous is not None else close}}
+
+async def serve(handler, test):
+    app = web.Application()
+    app.router.add_get(SNAPSHOT_PATH, handler)
+    async with TestServer(app) as server:
+        async with MarketDataClient(str(server.make_url('')), api_key='', rate=1000, burst=1000) as client:
+            return await test(client)
+
+def test_concurrent_snapshots_share_one_request():
+    queries = []
+
+    async def handler(request):
+        tickers = request.query['tickers'].split(',')
+        queries.append(tickers)
+        return web.json_response({'tickers': [snapshot(t, 10.0 + i) for i, t in enumerate(tickers) if t != 'NONE']})
+
+    async def test(client):
+        found = await asyncio.gather(*(client.snapshot(t) for t in ('AAA', 'BBB', 'AAA', 'NONE')))
+        return found, len(client._flushes)
+
+    found, pending = asyncio.run(serve(handler, test))
+    assert queries == [['AAA', 'BBB', 'NONE']]
+    assert [item and item['ticker'] for item in found] == ['AAA', 'BBB', 'AAA', None]
+    assert pending == 0
+
+def test_throttled_requests_are_retried():
+    calls = []
+
+    async def handler(request):
+        calls.append(1)
+        if len(calls) < 3:
+            return web.Response(status=429, headers={'Retry-After': '0'})
+        return web.json_response({'tickers': [snapshot('AAA', 10.0)]})
+
+    async def test(client):
+        return await client.snapshots(['AAA']), client.retries
+
+    found, retries = asyncio.run(serve(handler, test))
+    assert set(found) == {'AAA'} and retries == 2
+
+def test_snapshot_columns_fall_back_to_previous_close():
+    columns = snapshot_columns({'AAA': snapshot('AAA', 0, previous=9.5), 'BBB': snapshot('BBB', 12.0)},
+                               ['AAA', 'BBB', 'CCC'])
+    np.testing.assert_array_equal(columns['price'], [9.5, 12.0, np.nan])
+    np.testing.assert_array_equal(columns['low'], [0.0, 12.0, np.nan])
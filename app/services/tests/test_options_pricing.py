@@ -0,0 +1,47 @@
+import numpy as np
+
+from options_pricing import DAYS_PER_YEAR, RISK_FREE_RATE, black_scholes_chain, implied_volatility
+
+def test_black_scholes_reference_values():
+    # Hull's textbook case: S = K = 100, one year, r = 5%, vol = 20%
+    priced = black_scholes_chain(100.0, 100.0, DAYS_PER_YEAR, 0.2, [True, False], rate=0.05)
+    np.testing.assert_allclose(priced['premium'], [10.4506, 5.5735], atol=1e-4)
+    np.testing.assert_allclose(priced['delta'], [0.6368, -0.3632], atol=1e-4)
+    np.testing.assert_allclose(priced['gamma'], 0.018762, atol=1e-6)
+    # Daily theta and per-point vega
+    np.testing.assert_allclose(priced['theta'], [-6.4140 / 365, -1.6579 / 365], atol=1e-5)
+    np.testing.assert_allclose(priced['vega'], 0.37524, atol=1e-5)
+
+def test_put_call_parity_across_a_grid():
+    strike = np.linspace(50, 150, 21)[:, None]
+    expiry_days = np.array([1, 7, 30, 180, 720])[None, :]
+    call = black_scholes_chain(100.0, strike, expiry_days, 0.35, True)['premium']
+    put = black_scholes_chain(100.0, strike, expiry_days, 0.35, False)['premium']
+    forward_strike = strike * np.exp(-RISK_FREE_RATE * expiry_days / DAYS_PER_YEAR)
+    np.testing.assert_allclose(call - put, 100.0 - forward_strike, atol=1e-9)
+
+def test_implied_volatility_round_trip():
+    rng = np.random.default_rng(3)
+    n = 2000
+    spot = 100.0
+    strike = rng.uniform(60, 140, n)
+    expiry_days = rng.integers(2, 730, n)
+    is_call = rng.random(n) < 0.5
+    iv = rng.uniform(0.05, 1.5, n)
+    premium = black_scholes_chain(spot, strike, expiry_days, iv, is_call)['premium']
+    # Premiums at the no-arbitrage bound (deep ITM, low vol) carry no volatility information
+    forward_strike = strike * np.exp(-RISK_FREE_RATE * expiry_days / DAYS_PER_YEAR)
+    bound = np.maximum(np.where(is_call, spot - forward_strike, forward_strike - spot), 0)
+    informative = premium - bound > 1e-4
+
+    solved = implied_volatility(premium, spot, strike, expiry_days, is_call)
+
+    assert solved['converged'][informative].all()
+    np.testing.assert_allclose(solved['iv'][informative], iv[informative], rtol=1e-5, atol=1e-6)
+    repriced = black_scholes_chain(spot, strike, expiry_days, solved['iv'], is_call)['premium']
+    np.testing.assert_allclose(repriced[informative], premium[informative], atol=1e-6)
+
+def test_implied_volatility_flags_prices_below_intrinsic():
+    solved = implied_volatility([5.0, 0.5], 100.0, [90.0, 100.0], 30, True)
+    assert not solved['converged'][0] and np.isnan(solved['iv'][0])
+    assert solved['converged'][1]
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from portfolio import size_portfolio, unit_exposures
+
+@pytest.mark.parametrize('risk_budget,ticker_limit', [(25000, None), (25000, 2000), (5000, 800), (1e9, None)])
+def test_size_portfolio_stays_within_budgets(recommendation_batch, risk_budget, ticker_limit):
+    batch = recommendation_batch
+    sized = size_portfolio(batch, risk_budget, ticker_limit)
+    columns = sized.columns
+    assert len(sized)
+
+    assert columns['max_risk'].sum() <= risk_budget * (1 + 1e-9)
+    if ticker_limit is not None:
+        by_ticker = np.bincount(columns['ticker_index'], columns['max_risk'])
+        assert by_ticker.max() <= ticker_limit * (1 + 1e-9)
+
+    # Whole units, never larger than the batch's own sizes, with risk rescaled per unit
+    # (the batch rules give each ticker at most one row per trade type)
+    original = dict(zip(zip(batch.columns['ticker_index'], batch.columns['trade_type']),
+                        batch.columns['position_size']))
+    assert len(original) == len(batch)
+    for key, size in zip(zip(columns['ticker_index'], columns['trade_type']), columns['position_size']):
+        assert 0 < size <= original[key]
+    np.testing.assert_allclose(unit_exposures(sized)['max_risk'] * columns['position_size'], columns['max_risk'])
+
+def test_size_portfolio_without_limits_keeps_sizes(recommendation_batch):
+    sized = size_portfolio(recommendation_batch, np.inf)
+    assert len(sized) == len(recommendation_batch)
+    np.testing.assert_array_equal(sized.columns['position_size'], recommendation_batch.columns['position_size'])
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from probability import (
+    CALL, CALL_SPREAD, LEG_CALL, LEG_PUT, LEG_STOCK, PUT, PUT_SPREAD, STOCK, STRADDLE, STRUCTURES, PathSet,
+    expiry_analytic, simulate, structure_odds, structure_odds_batch,
+)
+
+# Hull's at-the-money example (S = K = 100, 20% vol, one year) under a 5% drift;
+# bought at the Black-Scholes price, the expected P&L is the premium's carry
+CALL_PRICE, PUT_PRICE = 10.450583572185565, 5.573526022256971
+
+def test_single_options_match_the_lognormal_closed_form():
+    pop, ev = structure_odds(CALL, 100.0, 0.2, 365, CALL_PRICE, 100.0, drift=0.05)
+    assert pop == pytest.approx(0.364299, abs=1e-6)   # N(d2) at the 110.45 break-even
+    assert ev == pytest.approx(0.535813, abs=1e-6)    # premium x (e^0.05 - 1)
+    pop, ev = structure_odds(PUT, 100.0, 0.2, 365, PUT_PRICE, 100.0, drift=0.05)
+    assert pop == pytest.approx(0.331149, abs=1e-6)
+    assert ev == pytest.approx(0.285761, abs=1e-6)
+
+def test_stock_sides_are_complementary():
+    long_pop, long_ev = structure_odds(STOCK, 100.0, 0.3, 28, 100.0, direction=1)
+    short_pop, short_ev = structure_odds(STOCK, 100.0, 0.3, 28, 100.0, direction=-1)
+    assert long_pop + short_pop == pytest.approx(1.0)
+    assert long_ev == pytest.approx(-short_ev) and long_ev > 0
+
+@pytest.mark.parametrize('structure', range(len(STRUCTURES)))
+def test_batch_matches_scalar(structure):
+    rng = np.random.default_rng(structure)
+    n = 50
+    spot = rng.uniform(20, 200, n)
+    vol = rng.uniform(0.1, 0.8, n)
+    days = rng.integers(5, 120, n).astype(float)
+    strike_1 = np.round(spot * rng.uniform(0.85, 1.0, n), 1)
+    strike_2 = np.round(spot * rng.uniform(1.0, 1.15, n), 1)
+    if structure == PUT_SPREAD:
+        strike_1, strike_2 = strike_2, strike_1
+    cost = spot * rng.uniform(0.01, 0.08, n) if structure != STOCK else spot
+    direction = rng.choice([-1, 1], n)
+    pop, ev = structure_odds_batch(np.full(n, structure), spot, vol, days, cost, strike_1, strike_2, direction)
+    for i in range(n):
+        expected = structure_odds(structure, spot[i], vol[i], days[i], cost[i], strike_1[i], strike_2[i],
+                                  direction[i])
+        assert (pop[i], ev[i]) == pytest.approx(expected, abs=1e-9)
+
+def legs(*rows):
+    return {name: np.array(values) for name, values in zip(('position', 'kind', 'strike', 'quantity'), zip(*rows))}
+
+def test_multi_leg_closed_form_matches_simple_structures_and_simulation():
+    # 0: call spread, 1: straddle, 2: iron condor for a credit, 3: covered call
+    positions = {'underlying': np.zeros(4), 'spot': np.full(4, 100.0), 'vol': np.full(4, 0.3),
+                 'days': np.full(4, 30.0), 'cost': np.array([2.5, 6.8, -1.2, 97.0])}
+    positions_legs = legs(
+        (0, LEG_CALL, 100.0, 1), (0, LEG_CALL, 110.0, -1),
+        (1, LEG_PUT, 100.0, 1), (1, LEG_CALL, 100.0, 1),
+        (2, LEG_PUT, 85.0, 1), (2, LEG_PUT, 90.0, -1), (2, LEG_CALL, 110.0, -1), (2, LEG_CALL, 115.0, 1),
+        (3, LEG_STOCK, 0.0, 1), (3, LEG_CALL, 105.0, -1),
+    )
+    pop, ev = expiry_analytic(positions, positions_legs)
+    assert (pop[0], ev[0]) == pytest.approx(structure_odds(CALL_SPREAD, 100.0, 0.3, 30, 2.5, 100.0, 110.0))
+    assert (pop[1], ev[1]) == pytest.approx(structure_odds(STRADDLE, 100.0, 0.3, 30, 6.8, 100.0, 100.0))
+
+    simulated_pop, simulated_ev = simulate(positions, positions_legs, PathSet(50000, seed=1))
+    np.testing.assert_allclose(simulated_pop, pop, atol=0.01)
+    np.testing.assert_allclose(simulated_ev, ev, atol=0.05)
@@ -0,0 +1,66 @@
+import asyncio
+import numpy as np
+import pytest
+
+from ranking import RANK_KEYS, Leaderboard
+
+def full_sort(batch, key, k, type_quota=None, sector_quota=None, sectors=None):
+    """Reference leaderboard: sort every row, then fill the quotas greedily"""
+    sectors = sectors or {}
+    recommendations = [view.to_recommendation() for view in batch]
+    score = batch.columns[RANK_KEYS[key]].astype(float)
+    # Highest score first, earlier rows first among ties
+    order = [row for row in np.lexsort((np.arange(len(score)), -score)) if np.isfinite(score[row])]
+    board, by_type, by_sector = [], {}, {}
+    for row in order:
+        recommendation = recommendations[row]
+        trade_type = recommendation.trade_type
+        sector = sectors.get(recommendation.ticker, 'Unknown')
+        if type_quota is not None and by_type.get(trade_type, 0) >= type_quota:
+            continue
+        if sector_quota is not None and by_sector.get(sector, 0) >= sector_quota:
+            continue
+        board.append(recommendation)
+        by_type[trade_type] = by_type.get(trade_type, 0) + 1
+        by_sector[sector] = by_sector.get(sector, 0) + 1
+        if len(board) == k:
+            break
+    return board
+
+def summary(board):
+    return [(r.ticker, r.trade_type, r.strike_prices, r.position_size) for r in board]
+
+@pytest.mark.parametrize('key', sorted(RANK_KEYS))
+@pytest.mark.parametrize('type_quota,sector_quota', [(None, None), (5, None), (None, 7), (3, 4)])
+def test_leaderboard_matches_full_sort(recommendation_batch, key, type_quota, sector_quota):
+    batch = recommendation_batch
+    sectors = {ticker: f'S{i % 6}' for i, ticker in enumerate(batch.tickers)}
+    expected = full_sort(batch, key, 25, type_quota, sector_quota, sectors)
+
+    board = Leaderboard(25, key, type_quota, sector_quota, sectors)
+    # Fed in chunks, as a streaming scan would
+    for start in range(0, len(batch), 97):
+        board.add_batch(batch.take(np.arange(start, min(start + 97, len(batch)))))
+    assert summary(board.leaderboard()) == summary(expected)
+
+    one_by_one = Leaderboard(25, key, type_quota, sector_quota, sectors)
+    one_by_one.add(view.to_recommendation() for view in batch)
+    assert summary(one_by_one.leaderboard()) == summary(expected)
+
+@pytest.mark.parametrize('fields', [
+    {'k': 0.5}, {'k': 0}, {'k': 'x'}, {'k': True},
+    {'typeQuota': {'call_buy': 'x'}}, {'typeQuota': {'call_buy': 0}}, {'typeQuota': 2.5},
+    {'sectorQuota': [3]}, {'sectorQuota': {'Tech': -1}},
+])
+def test_leaderboard_rejects_bad_caps_before_streaming(fields):
+    from aiohttp.test_utils import TestClient, TestServer
+    from analysis_service import AnalysisService
+
+    async def post():
+        body = {'requests': [{'ticker': 'AAA', 'marketData': {'price': 100, 'volume': 1e6}}], **fields}
+        async with TestClient(TestServer(AnalysisService().create_app())) as client:
+            response = await client.post('/leaderboard', json=body)
+            return response.status, await response.json()
+
+    status, body = asyncio.run(post())
+    assert status == 400 and 'error' in body
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from options_pricing import black_scholes_chain
+from portfolio import unit_exposures
+from probability import CONTRACT_MULTIPLIER
+from recommendation_engine import RecommendationBatch, RiskLevel, TradeRecommendation, TradeType
+from scenarios import batch_legs, recommendation_legs
+
+CONDOR_STRIKES = [90.0, 95.0, 105.0, 110.0]
+
+def condor():
+    return TradeRecommendation(
+        ticker='AAA', trade_type=TradeType.IRON_CONDOR, direction='NEUTRAL', entry_price=1.5, target_price=0.75,
+        stop_loss=3.0, position_size=2, risk_reward_ratio=0.43, probability_of_profit=0.6, max_risk=700.0,
+        max_reward=300.0, time_horizon='30 days', confidence_score=0.7, ml_rating='NEUTRAL',
+        strategy_description='Iron condor', risk_level=RiskLevel.MODERATE, reasons=[],
+        strike_prices=CONDOR_STRIKES, premium=1.5, greeks={'implied_volatility': 25.0})
+
+def test_condor_keeps_all_four_strikes():
+    batch = RecommendationBatch.from_recommendations([condor()])
+    assert batch[0].strike_prices == CONDOR_STRIKES
+    assert batch[0].to_recommendation().strike_prices == CONDOR_STRIKES
+    legs = batch_legs(batch)
+    assert np.isfinite(legs['strike']).all()
+    for name, column in recommendation_legs([condor()]).items():
+        np.testing.assert_array_equal(legs[name], column)
+
+def test_condor_exposure_prices_every_leg():
+    batch = RecommendationBatch.from_recommendations([condor()])
+    batch.columns['underlying_price'][:] = 100.0
+    exposures = unit_exposures(batch)
+    legs = [(False, 1, 90.0), (False, -1, 95.0), (True, -1, 105.0), (True, 1, 110.0)]
+    for greek in ('delta', 'gamma', 'theta', 'vega'):
+        expected = sum(quantity * black_scholes_chain(100.0, strike, 30, 0.25, is_call)[greek]
+                       for is_call, quantity, strike in legs)
+        assert exposures[greek][0] == pytest.approx(float(expected) * CONTRACT_MULTIPLIER)
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from options_pricing import black_scholes_chain
+from probability import CONTRACT_MULTIPLIER
+from recommendation_engine import BATCH_COLUMNS, TRADE_TYPE_CODES, RecommendationBatch, TradeType
+from scenarios import scenario_pnl
+
+SPOT_MOVES = np.array([-0.1, 0.0, 0.1])
+IV_SHIFTS = np.array([-5.0, 0.0, 5.0])
+DAYS = np.array([0.0, 10.0, 45.0])
+
+def positions(*rows):
+    columns = {name: np.array([row.get(name, np.nan if np.issubdtype(dtype, np.floating) else 0) for row in rows],
+                              dtype=dtype)
+               for name, dtype in BATCH_COLUMNS.items()}
+    return RecommendationBatch(['TEST'], columns)
+
+def option(trade_type, strikes, **values):
+    row = {'trade_type': TRADE_TYPE_CODES[trade_type], 'underlying_price': 100.0, 'position_size': 3,
+           'expiry_days': 30, 'implied_volatility': 25.0, **values}
+    row.update({f'strike_{leg}': strike for leg, strike in enumerate(strikes, 1)})
+    return row
+
+def reference(legs, size):
+    """P&L grid of ``legs`` ((is_call, quantity, strike)) repriced with float64 Black-Scholes"""
+    spot = 100.0 * (1 + SPOT_MOVES)[:, None, None]
+    iv = ((25.0 + IV_SHIFTS) / 100)[None, :, None]
+    days = np.maximum(30 - DAYS, 0)[None, None, :]
+    total = 0.0
+    for is_call, quantity, strike in legs:
+        now = black_scholes_chain(spot, strike, days, iv, is_call)['premium']
+        entry = black_scholes_chain(100.0, strike, 30, 0.25, is_call)['premium']
+        total = total + quantity * (now - entry)
+    return total * size * CONTRACT_MULTIPLIER
+
+def test_scenario_pnl_reference_values():
+    batch = positions(
+        {'trade_type': TRADE_TYPE_CODES[TradeType.STOCK_LONG], 'direction': 1, 'entry_price': 50.0,
+         'position_size': 200},
+        {'trade_type': TRADE_TYPE_CODES[TradeType.STOCK_SHORT], 'direction': -1, 'entry_price': 50.0,
+         'position_size': 100},
+        option(TradeType.CALL_BUY, [105.0]),
+        option(TradeType.IRON_CONDOR, [85.0, 90.0, 110.0, 115.0]),
+        option(TradeType.CALL_BUY, [105.0], implied_volatility=np.nan),
+    )
+    pnl = scenario_pnl(batch, SPOT_MOVES, IV_SHIFTS, DAYS)['pnl']
+    assert pnl.shape == (5, 3, 3, 3)
+
+    # Nothing has moved at the centre of the grid on day 0
+    np.testing.assert_allclose(pnl[:4, 1, 1, 0], 0.0, atol=1e-3)
+    # Stock moves one-for-one with spot, whatever the IV or the day
+    np.testing.assert_allclose(pnl[0], np.broadcast_to((200 * 50.0 * SPOT_MOVES)[:, None, None], (3, 3, 3)))
+    np.testing.assert_allclose(pnl[1], np.broadcast_to((-100 * 50.0 * SPOT_MOVES)[:, None, None], (3, 3, 3)))
+
+    call = reference([(True, 1, 105.0)], 3)
+    condor = reference([(False, 1, 85.0), (False, -1, 90.0), (True, -1, 110.0), (True, 1, 115.0)], 3)
+    np.testing.assert_allclose(pnl[2], call, rtol=1e-4, atol=0.05)
+    np.testing.assert_allclose(pnl[3], condor, rtol=1e-4, atol=0.05)
+    # Past expiry (day 45) a call is worth its intrinsic value
+    np.testing.assert_allclose(pnl[2, :, 1, 2], (np.maximum(100.0 * (1 + SPOT_MOVES) - 105.0, 0)
+                                                 - black_scholes_chain(100.0, 105.0, 30, 0.25, True)['premium'])
+                               * 3 * CONTRACT_MULTIPLIER, rtol=1e-4, atol=0.05)
+    # An option without an IV cannot be priced
+    assert np.isnan(pnl[4]).all()
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from ml_models import QuantumMLEngine
+from options_pricing import black_scholes_chain
+from recommendation_engine import RiskLevel, TradeRecommendationEngine, TradeType
+from strategy_search import DEFAULT_EXPIRIES, search_strategies
+
+SEARCHED = {TradeType.CALL_SPREAD, TradeType.PUT_SPREAD, TradeType.STRADDLE, TradeType.STRANGLE,
+            TradeType.IRON_CONDOR, TradeType.CALENDAR_SPREAD}
+
+def listed_chain(spot, iv=0.3):
+    """Calls and puts every 2.5% of spot for the default expiries, quoted at Black-Scholes"""
+    strike = np.round(spot * np.arange(0.8, 1.201, 0.025), 2)
+    days = np.array(DEFAULT_EXPIRIES, dtype=float)
+    strike, days, is_call = (a.ravel() for a in np.meshgrid(strike, days, [True, False], indexing='ij'))
+    price = black_scholes_chain(spot, strike, days, iv, is_call)['premium']
+    return {'strike': strike, 'expiry_days': days, 'is_call': is_call, 'price': price}
+
+def test_search_finds_spreads_within_budget():
+    found = search_strategies(100.0, listed_chain(100.0), structures=['call_spread', 'iron_condor'], top_k=1,
+                              max_risk=5.0)
+    assert set(found['structure']) <= {0, 4}
+    assert len(found['structure'])
+    assert np.all(found['max_risk'] <= 5.0 + 1e-9)
+    assert np.all((found['probability_of_profit'] >= 0) & (found['probability_of_profit'] <= 1))
+
+def test_batch_uses_the_chain_search_like_the_scalar_path():
+    np.random.seed(5)
+    rng = np.random.default_rng(5)
+    n = 40
+    price = rng.lognormal(np.log(80), 0.5, n)
+    market_data = {'price': price, 'volume': rng.lognormal(np.log(2e6), 1.0, n),
+                   'high': price * rng.uniform(1.0, 1.06, n), 'low': price * rng.uniform(0.94, 1.0, n)}
+    tickers = [f'SYN{i:03d}' for i in range(n)]
+    analysis = QuantumMLEngine(cache_features=False, model_dir=None).analyze_batch(tickers, market_data)
+    chains = [listed_chain(p) if i % 2 == 0 else None for i, p in enumerate(price)]
+    engine = TradeRecommendationEngine()
+    batch = engine.generate_recommendations_batch(analysis, {**market_data, 'options_chain': chains},
+                                                  100000, RiskLevel.MODERATE, top_n=10)
+
+    by_ticker = {}
+    for view in batch:
+        if view.trade_type in SEARCHED:
+            by_ticker.setdefault(view.ticker, []).append(view.to_recommendation())
+    searched = 0
+    for row, ticker in enumerate(tickers):
+        got = by_ticker.get(ticker, [])
+        if chains[row] is None:
+            assert all(rec.trade_type == TradeType.STRADDLE for rec in got)
+            continue
+        ml = analysis['ml_analysis']
+        if not (price[row] > 0 and ml['composite_score']['confidence_score'][row] >= 0.4):
+            assert not got
+            continue
+        expected = engine._searched_strategy_recommendations(ticker, float(price[row]), chains[row], {
+            'ml_analysis': {
+                'price_prediction': {'direction': ml['price_prediction']['direction'][row]},
+                'volatility_forecast': {'prediction': ml['volatility_forecast']['prediction'][row]},
+                'composite_score': {'confidence_score': float(ml['composite_score']['confidence_score'][row]),
+                                    'rating': ml['composite_score']['rating'][row]},
+            }}, 100000, RiskLevel.MODERATE)
+        key = lambda rec: rec.trade_type.value
+        assert len(got) == len(expected)
+        for ours, theirs in zip(sorted(got, key=key), sorted(expected, key=key)):
+            assert ours.trade_type == theirs.trade_type
+            assert ours.strike_prices == pytest.approx(theirs.strike_prices)
+            assert ours.position_size == theirs.position_size
+            assert ours.expected_value == pytest.approx(theirs.expected_value)
+            assert ours.reasons == theirs.reasons
+        searched += len(expected)
+    assert searched
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+import pytest
+
+from bar_store import BarStore
+from training import VOL_WINDOW, fit_logistic, realized_volatility, train, walk_forward_splits
+
+def test_realized_volatility_reference():
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (120, 3)), axis=0))
+    rv = realized_volatility(close)
+    returns = np.diff(np.log(close), axis=0)
+    for bar in (VOL_WINDOW, 60, 119):
+        window = returns[bar - VOL_WINDOW:bar]
+        np.testing.assert_allclose(rv[bar], window.std(axis=0) * np.sqrt(252), rtol=1e-9)
+
+def test_walk_forward_splits_leave_a_gap():
+    dates = np.repeat(np.arange(19000, 19600), 3)
+    splits = walk_forward_splits(dates, folds=4, gap=20)
+    assert len(splits) == 4
+    previous_end = None
+    for train_end, test_start, test_end in splits:
+        assert test_start - train_end > 20
+        assert test_start <= test_end
+        if previous_end is not None:
+            assert test_start == previous_end + 1
+        previous_end = test_end
+    assert previous_end == 19599
+
+def test_fit_logistic_recovers_coefficients():
+    rng = np.random.default_rng(1)
+    X = rng.standard_normal((50000, 2))
+    y = (rng.random(50000) < 1 / (1 + np.exp(-(0.5 + 1.5 * X[:, 0] - 1.0 * X[:, 1])))).astype(float)
+    intercept, weights = fit_logistic(X, y, l2=0.0)
+    assert intercept == pytest.approx(0.5, abs=0.05)
+    np.testing.assert_allclose(weights, [1.5, -1.0], atol=0.06)
+
+def test_train_writes_a_versioned_model_set(tmp_path):
+    rng = np.random.default_rng(2)
+    store = BarStore(str(tmp_path / 'bars'))
+    dates = np.datetime64('2023-01-02') + np.arange(300)
+    for ticker in ('AAA', 'BBB', 'CCC'):
+        close = 50 * np.exp(np.cumsum(rng.normal(0, 0.015, len(dates))))
+        store.append(ticker, dates, close, close * 1.01, close * 0.99, close, rng.lognormal(14, 0.3, len(dates)))
+
+    models = str(tmp_path / 'models')
+    report = train(str(tmp_path / 'bars'), models, folds=3, max_workers=1, activate=False)
+    assert os.path.isdir(os.path.join(models, report['version']))
+    for name, summary in report['models'].items():
+        assert summary['train_rows'] > 0
+        assert len(summary['folds']) == 3
+        for fold in summary['folds']:
+            assert fold['train_end'] < fold['test_start'] <= fold['test_end']
+        if summary['accuracy'] is not None:
+            assert 0 <= summary['accuracy'] <= 1
+    # The labeled dataset is cached and reused
+    assert train(str(tmp_path / 'bars'), models, folds=3, max_workers=1, activate=False)['dataset'] == report['dataset']
@@ -0,0 +1,416 @@
+"""
+Walk-Forward Model Training
+Offline labeled datasets from the bar store, parallel walk-forward fits and versioned artifacts
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from bar_store import DEFAULT_ROOT, BarStore
+from indicators import BACKFILL_BLOCK, MACD_SIGNAL, MACD_SLOW, compute_indicators
+from ml_models import MODEL_VERSION, FeatureEngineer, MLPredictor
+from model_runtime import DEFAULT_MODEL_DIR, CompiledModel, TreeEnsemble, linear_terms, publish, save_models
+
+PRICE_FEATURES = (
+    'price_momentum', 'volume_ratio', 'volatility', 'price_position',
+    'rsi_14', 'macd_signal', 'bollinger_position', 'stoch_k',
+    'vwap_deviation', 'money_flow_index', 'on_balance_volume',
+)
+# No option history is stored offline, so iv_rank is trained on its realized-vol analogue
+VOLATILITY_FEATURES = ('iv_rank', 'volatility', 'bollinger_position', 'price_momentum')
+
+PRICE_HORIZON_BARS = 5
+VOL_WINDOW = 20
+VOL_RANK_WINDOW = 252
+# Bars before the slowest indicator (MACD signal) has settled
+WARMUP_BARS = MACD_SLOW + MACD_SIGNAL
+
+WALK_FORWARD_FOLDS = 5
+# Rows sampled per fit; fold accuracy is always measured on the full test window
+MAX_TRAIN_ROWS = 500000
+L2_PENALTY = 1e-3
+NEWTON_STEPS = 8
+
+BOOST_ROUNDS = 25
+BOOST_DEPTH = 2
+BOOST_LEARNING_RATE = 0.1
+SPLIT_BINS = 32
+
+DATASET_FORMAT = 1
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    totals = np.cumsum(values, axis=0)
+    totals[window:] = totals[window:] - totals[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window).reshape((-1,) + (1,) * (values.ndim - 1))
+    return totals / counts
+
+def realized_volatility(close: np.ndarray, window: int = VOL_WINDOW) -> np.ndarray:
+    """Annualized trailing close-to-close volatility, (bars, tickers)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.nan_to_num(np.diff(np.log(close), axis=0, prepend=np.log(close[:1])))
+    mean = _rolling_mean(returns, window)
+    return np.sqrt(np.maximum(_rolling_mean(returns * returns, window) - mean * mean, 0) * 252)
+
+def volatility_rank(rv: np.ndarray, window: int = VOL_RANK_WINDOW) -> np.ndarray:
+    """Position of each value within its trailing ``window`` range on a 0-100 scale
+    (the ``iv_rank_percentile`` definition applied to realized volatility)"""
+    padded = np.concatenate([np.repeat(rv[:1], window - 1, axis=0), rv])
+    view = np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)
+    low, high = view.min(axis=-1), view.max(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(high > low, np.clip(100 * (rv - low) / (high - low), 0, 100), 50.0)
+
+def label_panel(dates: np.ndarray, bars: Dict[str, np.ndarray], horizon: int = PRICE_HORIZON_BARS
+                ) -> Dict[str, np.ndarray]:
+    """Engine features plus forward labels for one (bars, tickers) panel, flattened row-major.
+
+    Labels are NaN where the future is not yet in the store or the inputs have
+    not warmed up; those rows are never trained or scored.
+    """
+    close = bars['close']
+    n_bars, n_tickers = close.shape
+    indicators = compute_indicators(bars['high'], bars['low'], close, bars['volume'])
+    columns = {'price': close, 'volume': bars['volume'], 'high': bars['high'], 'low': bars['low'], **indicators}
+    features = FeatureEngineer.calculate_technical_features_batch(
+        {name: values.ravel() for name, values in columns.items()})
+
+    rv = realized_volatility(close)
+    features['iv_rank'] = volatility_rank(rv).ravel()
+
+    price_up = np.full(close.shape, np.nan)
+    vol_up = np.full(close.shape, np.nan)
+    price_up[:n_bars - horizon] = close[horizon:] > close[:n_bars - horizon]
+    vol_up[:n_bars - VOL_WINDOW] = rv[VOL_WINDOW:] > rv[:n_bars - VOL_WINDOW]
+    price_up[:WARMUP_BARS] = np.nan
+    vol_up[:max(WARMUP_BARS, VOL_WINDOW)] = np.nan
+
+    rows = {name: np.nan_to_num(np.asarray(features[name], dtype=np.float64))
+            for name in sorted(set(PRICE_FEATURES) | set(VOLATILITY_FEATURES))}
+    rows['date'] = np.repeat(dates.astype('datetime64[D]').astype(np.int64), n_tickers)
+    rows['price_up'] = price_up.ravel()
+    rows['vol_up'] = vol_up.ravel()
+    return rows
+
+def dataset_key(store: BarStore, tickers: Sequence[str], start, end, horizon: int) -> str:
+    """Cache key covering everything the dataset depends on (new bars change it)"""
+    digest = hashlib.sha1(json.dumps([
+        DATASET_FORMAT, MODEL_VERSION, str(start), str(end), horizon,
+        [(ticker, store.length(ticker)) for ticker in tickers],
+    ]).encode()).hexdigest()
+    return digest[:16]
+
+def build_dataset(store: BarStore, cache_dir: str, tickers: Optional[Sequence[str]] = None,
+                  start=None, end=None, horizon: int = PRICE_HORIZON_BARS) -> str:
+    """Compute features and labels once and store them as .npy columns.
+
+    Returns the dataset directory. A dataset with the same key is reused as is,
+    so repeated runs and every walk-forward fold share one feature pass.
+    """
+    tickers = store.tickers() if tickers is None else list(tickers)
+    directory = os.path.join(cache_dir, dataset_key(store, tickers, start, end, horizon))
+    if os.path.exists(os.path.join(directory, 'date.npy')):
+        return directory
+
+    parts = []
+    for group in store.calendar_groups(tickers, start, end):
+        for i in range(0, len(group), BACKFILL_BLOCK):
+            dates, bars = store.panel(group[i:i + BACKFILL_BLOCK], start, end, ('high', 'low', 'close', 'volume'))
+            if len(dates) > WARMUP_BARS:
+                parts.append(label_panel(dates, bars, horizon))
+    if not parts:
+        raise ValueError("No tickers with enough bars to build a training set")
+
+    staging = directory + '.tmp'
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name in parts[0]:
+        np.save(os.path.join(staging, f'{name}.npy'), np.concatenate([part[name] for part in parts]))
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+    return directory
+
+def load_dataset(directory: str, columns: Sequence[str]) -> Dict[str, np.ndarray]:
+    return {name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode='r') for name in columns}
+
+def walk_forward_splits(dates: np.ndarray, folds: int, gap: int) -> List[Tuple[int, int, int]]:
+    """``(train_end, test_start, test_end)`` day bounds for expanding-window folds.
+
+    The unique dates are cut into ``folds + 1`` blocks; fold k trains on blocks
+    before k and tests on block k. ``gap`` bars are dropped between train and
+    test so no training label looks into the test window.
+    """
+    days = np.unique(dates)
+    edges = np.linspace(0, len(days), folds + 2).astype(int)
+    splits = []
+    for k in range(1, folds + 1):
+        test_start = days[edges[k]]
+        test_end = days[edges[k + 1] - 1]
+        train_end = days[max(edges[k] - gap - 1, 0)]
+        splits.append((int(train_end), int(test_start), int(test_end)))
+    return splits
+
+def fit_logistic(X: np.ndarray, y: np.ndarray, l2: float = L2_PENALTY, steps: int = NEWTON_STEPS
+                 ) -> Tuple[float, np.ndarray]:
+    """L2-regularized logistic regression by Newton's method on standardized X"""
+    n, p = X.shape
+    w = np.zeros(p + 1)     # intercept first
+    penalty = np.full(p + 1, l2 * n)
+    penalty[0] = 0
+    hessian = np.empty((p + 1, p + 1))
+    for _ in range(steps):
+        prob = 1 / (1 + np.exp(-np.clip(X @ w[1:] + w[0], -30, 30)))
+        residual = prob - y
+        weight = prob * (1 - prob)
+        gradient = np.concatenate([[residual.sum()], X.T @ residual]) + penalty * w
+        weighted = X.T * weight
+        hessian[0, 0] = weight.sum()
+        hessian[0, 1:] = hessian[1:, 0] = weighted.sum(axis=1)
+        hessian[1:, 1:] = weighted @ X
+        w -= np.linalg.solve(hessian + np.diag(penalty + 1e-9), gradient)
+    return float(w[0]), w[1:]
+
+def fit_boosted_trees(X: np.ndarray, y: np.ndarray, margin: np.ndarray, rounds: int = BOOST_ROUNDS,
+                      depth: int = BOOST_DEPTH, learning_rate: float = BOOST_LEARNING_RATE,
+                      bins: int = SPLIT_BINS, l2: float = 1.0) -> Optional[TreeEnsemble]:
+    """Gradient-boosted trees on the logistic loss, starting from ``margin``.
+
+    Splits are searched over per-feature quantile bins with one bincount per
+    feature and tree level; thresholds are stored in raw feature units so the
+    ensemble runs directly in the model runtime.
+    """
+    if rounds <= 0:
+        return None
+    n, p = X.shape
+    edges = [np.unique(np.quantile(X[:, j], np.linspace(0, 1, bins + 1)[1:-1])) for j in range(p)]
+    # One contiguous uint8 row of bin codes per feature
+    binned = np.stack([np.searchsorted(edges[j], X[:, j], side='left').astype(np.uint8) for j in range(p)])
+
+    feature, threshold, left, right, value, roots = [], [], [], [], [], []
+
+    def add_node():
+        for column in (feature, left, right):
+            column.append(-1)
+        threshold.append(0.0)
+        value.append(0.0)
+        return len(feature) - 1
+
+    for _ in range(rounds):
+        prob = 1 / (1 + np.exp(-margin))
+        g, h = prob - y, prob * (1 - prob)
+        roots.append(add_node())
+        frontier = [roots[-1]]
+        node_of = np.zeros(n, dtype=np.int64)   # position within the frontier
+        for level in range(depth + 1):
+            count = len(frontier)
+            G = np.bincount(node_of, weights=g, minlength=count)
+            H = np.bincount(node_of, weights=h, minlength=count)
+            if level == depth:
+                break
+            best = np.zeros(count)
+            split = [None] * count
+            for j in range(p):
+                width = len(edges[j]) + 1
+                index = node_of * width + binned[j]
+                GL = np.cumsum(np.bincount(index, weights=g, minlength=count * width).reshape(count, width), axis=1)[:, :-1]
+                HL = np.cumsum(np.bincount(index, weights=h, minlength=count * width).reshape(count, width), axis=1)[:, :-1]
+                if not GL.size:
+                    continue
+                GR, HR = G[:, None] - GL, H[:, None] - HL
+                gain = GL ** 2 / (HL + l2) + GR ** 2 / (HR + l2) - (G ** 2 / (H + l2))[:, None]
+                k = gain.argmax(axis=1)
+                for i in np.flatnonzero(gain[np.arange(count), k] > best + 1e-12):
+                    best[i] = gain[i, k[i]]
+                    split[i] = (j, k[i])
+            children = []
+            next_of = np.full(n, -1, dtype=np.int64)
+            for i, node in enumerate(frontier):
+                if split[i] is None:
+                    continue
+                j, k = split[i]
+                feature[node], threshold[node] = j, float(edges[j][k])
+                left[node], right[node] = add_node(), add_node()
+                mine = node_of == i
+                goes_left = binned[j] <= k
+                next_of[mine & goes_left] = len(children)
+                next_of[mine & ~goes_left] = len(children) + 1
+                children += [left[node], right[node]]
+            # Rows in unsplit nodes stay there as leaves
+            for i, node in enumerate(frontier):
+                if split[i] is None:
+                    value[node] = -G[i] / (H[i] + l2)
+            if not children:
+                frontier = []
+                break
+            stay = next_of < 0
+            frontier, node_of = children, np.where(stay, 0, next_of)
+            g, h = np.where(stay, 0.0, g), np.where(stay, 0.0, h)
+        for i, node in enumerate(frontier):
+            value[node] = -G[i] / (H[i] + l2)
+        ensemble = TreeEnsemble(feature, threshold, left, right, value, roots[-1:], learning_rate)
+        margin = margin + ensemble.predict(X)
+
+    return TreeEnsemble(feature, threshold, left, right, value, roots, learning_rate)
+
+# model name -> (label column, features, boosted tree rounds, metadata type)
+MODEL_SPECS = {
+    'price_direction': ('price_up', PRICE_FEATURES, BOOST_ROUNDS, 'gradient_boost'),
+    'volatility_forecast': ('vol_up', VOLATILITY_FEATURES, 0, 'logistic'),
+}
+
+def fit_model(X: np.ndarray, y: np.ndarray, features: Sequence[str], boost_rounds: int) -> CompiledModel:
+    """Standardized logistic model with optional boosted trees on its residual.
+
+    ``X`` is standardized in place (callers pass a fresh matrix); tree
+    thresholds are mapped back to raw feature units afterwards.
+    """
+    mean = X.mean(axis=0)
+    std = np.sqrt(np.maximum(np.einsum('ij,ij->j', X, X) / len(X) - mean * mean, 0))
+    std[std == 0] = 1
+    X -= mean
+    X /= std
+    intercept, weights = fit_logistic(X, y)
+    model = CompiledModel(
+        'model', features, defaults=mean,
+        terms=linear_terms([{'feature': name, 'offset': -m, 'scale': 1 / s, 'weight': w}
+                            for name, m, s, w in zip(features, mean, std, weights)], list(features)),
+        intercept=intercept, link='logistic',
+    )
+    if boost_rounds:
+        trees = fit_boosted_trees(X, y, intercept + X @ weights, rounds=boost_rounds)
+        split = trees.feature >= 0
+        trees.threshold[split] = trees.threshold[split] * std[trees.feature[split]] + mean[trees.feature[split]]
+        model.trees = trees
+    return model
+
+def _training_rows(dataset: Dict[str, np.ndarray], label: str, lo: Optional[int], hi: int,
+                   limit: Optional[int], seed: int = 0) -> np.ndarray:
+    """Indices with a label and ``lo <= date <= hi``; sampled down to ``limit`` rows"""
+    dates = dataset['date']
+    mask = np.isfinite(dataset[label]) & (dates <= hi)
+    if lo is not None:
+        mask &= dates >= lo
+    rows = np.flatnonzero(mask)
+    if limit and len(rows) > limit:
+        rows = np.sort(np.random.default_rng(seed).choice(rows, limit, replace=False))
+    return rows
+
+def run_fold(dataset_dir: str, name: str, split: Optional[Tuple[int, int, int]],
+             max_rows: int = MAX_TRAIN_ROWS) -> Dict:
+    """Fit one model on one walk-forward fold (``split=None`` fits the final model
+    on every labeled row). Pool entry point: the dataset is memory-mapped, not sent."""
+    label, features, rounds, _ = MODEL_SPECS[name]
+    dataset = load_dataset(dataset_dir, ('date', label) + tuple(features))
+
+    def columns(rows):
+        return {feature: np.asarray(dataset[feature][rows]) for feature in features}
+
+    def X_of(rows):
+        return np.column_stack(list(columns(rows).values()))
+
+    if split is None:
+        rows = _training_rows(dataset, label, None, np.iinfo(np.int64).max, max_rows)
+        model = fit_model(X_of(rows), np.asarray(dataset[label][rows]), features, rounds)
+        return {'name': name, 'model': model, 'train_rows': len(rows)}
+
+    train_end, test_start, test_end = split
+    train = _training_rows(dataset, label, None, train_end, max_rows)
+    test = _training_rows(dataset, label, test_start, test_end, None)
+    if not len(train) or not len(test):
+        return {'name': name, 'split': split, 'train_rows': len(train), 'test_rows': len(test), 'accuracy': None}
+    model = fit_model(X_of(train), np.asarray(dataset[label][train]), features, rounds)
+    predicted = model.predict(columns(test)) > 0.5
+    return {
+        'name': name,
+        'split': split,
+        'train_rows': len(train),
+        'test_rows': len(test),
+        'accuracy': float(np.mean(predicted == (np.asarray(dataset[label][test]) > 0.5))),
+    }
+
+def _day(day: int) -> str:
+    return str(np.datetime64(day, 'D'))
+
+def train(bar_root: str = DEFAULT_ROOT, model_root: str = DEFAULT_MODEL_DIR,
+          tickers: Optional[Sequence[str]] = None, start=None, end=None, folds: int = WALK_FORWARD_FOLDS,
+          horizon: int = PRICE_HORIZON_BARS, max_rows: int = MAX_TRAIN_ROWS, max_workers: Optional[int] = None,
+          executor: Optional[Executor] = None, activate: bool = True) -> Dict:
+    """Build (or reuse) the dataset, run every fold and final fit across a process
+    pool, and write ``model_root/<version>``. Returns the training report."""
+    store = BarStore(bar_root)
+    dataset_dir = build_dataset(store, os.path.join(model_root, '.datasets'), tickers, start, end, horizon)
+    splits = walk_forward_splits(np.load(os.path.join(dataset_dir, 'date.npy'), mmap_mode='r'),
+                                 folds, max(horizon, VOL_WINDOW))
+
+    jobs = [(name, split) for name in MODEL_SPECS for split in splits + [None]]
+    workers = max_workers or os.cpu_count() or 1
+    if workers == 1 and executor is None:
+        results = [run_fold(dataset_dir, name, split, max_rows) for name, split in jobs]
+    else:
+        pool = executor or ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = [pool.submit(run_fold, dataset_dir, name, split, max_rows) for name, split in jobs]
+            results = [future.result() for future in futures]
+        finally:
+            if executor is None:
+                pool.shutdown()
+
+    trained_at = datetime.now()
+    version = f"{MODEL_VERSION}-{trained_at.strftime('%Y%m%d%H%M%S')}"
+    defaults = MLPredictor()
+    models = {'options_flow': defaults.runtime['options_flow']}
+    models['options_flow'].metadata['trained'] = False
+    report = {'version': version, 'dataset': dataset_dir, 'models': {}}
+    for name, (label, features, rounds, kind) in MODEL_SPECS.items():
+        fold_results = [r for r in results if r['name'] == name and 'split' in r]
+        scored = [r for r in fold_results if r['accuracy'] is not None]
+        test_rows = sum(r['test_rows'] for r in scored)
+        accuracy = sum(r['accuracy'] * r['test_rows'] for r in scored) / test_rows if test_rows else None
+        final = next(r for r in results if r['name'] == name and 'model' in r)
+        model = final['model']
+        model.name = name
+        model.metadata = {
+            'type': kind,
+            'accuracy': accuracy,
+            'last_trained': trained_at.isoformat(),
+            'trained': True,
+            'label': label,
+            'train_rows': final['train_rows'],
+            'folds': [{'train_end': _day(r['split'][0]), 'test_start': _day(r['split'][1]),
+                       'test_end': _day(r['split'][2]), 'train_rows': r['train_rows'],
+                       'test_rows': r['test_rows'], 'accuracy': r['accuracy']} for r in fold_results],
+        }
+        models[name] = model
+        report['models'][name] = {key: model.metadata[key] for key in ('accuracy', 'train_rows', 'folds')}
+
+    save_models(models, os.path.join(model_root, version), version=version)
+    if activate:
+        publish(model_root, version)
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description='Walk-forward training of the scanner models from stored bars')
+    parser.add_argument('--bars', default=DEFAULT_ROOT, help='bar store root')
+    parser.add_argument('--models', default=DEFAULT_MODEL_DIR, help='model artifact root')
+    parser.add_argument('--tickers', nargs='*', help='restrict to these tickers')
+    parser.add_argument('--start', help='first bar date (YYYY-MM-DD)')
+    parser.add_argument('--end', help='last bar date (YYYY-MM-DD)')
+    parser.add_argument('--folds', type=int, default=WALK_FORWARD_FOLDS)
+    parser.add_argument('--horizon', type=int, default=PRICE_HORIZON_BARS, help='price label horizon in bars')
+    parser.add_argument('--max-rows', type=int, default=MAX_TRAIN_ROWS, help='training rows sampled per fit')
+    parser.add_argument('--workers', type=int, help='process pool size (default: CPU count)')
+    parser.add_argument('--no-activate', action='store_true', help='write the artifacts without updating LATEST')
+    args = parser.parse_args()
+
+    report = train(args.bars, args.models, args.tickers, args.start, args.end, args.folds, args.horizon,
+                   args.max_rows, args.workers, activate=not args.no_activate)
+    print(json.dumps(report, indent=2))
+
+if __name__ == '__main__':
+    main()
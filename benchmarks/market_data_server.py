@@ -0,0 +1,144 @@
+"""
+Market Data Fixture Server
+Local, seeded stand-in for the Polygon stock snapshot endpoint, for offline client runs
+
+Usage:
+    python benchmarks/market_data_server.py --port 8090 --tickers 5000 --latency-ms 20
+    SCANNER_MARKET_DATA_URL=http://127.0.0.1:8090 python ...   # point MarketDataClient at it
+
+Serves GET /v2/snapshot/locale/us/markets/stocks/tickers (optionally ?tickers=A,B,...)
+with optional per-request latency, a request-rate limit answered with 429 and
+random 503s, and counts what it served at GET /stats.
+"""
+
+import argparse
+import asyncio
+import random
+import threading
+import time
+import numpy as np
+from aiohttp import web
+from typing import Dict, Optional
+
+SNAPSHOT_PATH = '/v2/snapshot/locale/us/markets/stocks/tickers'
+
+def synthetic_snapshots(n: int, seed: int = 42) -> Dict[str, Dict]:
+    """Seeded Polygon-shaped ticker snapshots keyed by symbol (SYN00000...)"""
+    rng = np.random.default_rng(seed)
+    close = np.round(rng.lognormal(np.log(60), 1.0, n).clip(1, 2000), 2)
+    previous = np.round(close * rng.normal(1, 0.02, n), 2)
+    spread = close * rng.uniform(0.005, 0.06, n)
+    high = np.round(close + spread * rng.uniform(0, 1, n), 2)
+    low = np.round(close - spread * rng.uniform(0, 1, n), 2)
+    volume = np.round(rng.lognormal(np.log(2e6), 1.5, n))
+    snapshots = {}
+    for i in range(n):
+        ticker = f'SYN{i:05d}'
+        snapshots[ticker] = {
+            'ticker': ticker,
+            'todaysChange': float(close[i] - previous[i]),
+            'todaysChangePerc': float(100 * (close[i] / previous[i] - 1)),
+            'day': {'o': float(previous[i]), 'h': float(high[i]), 'l': float(low[i]), 'c': float(close[i]),
+                    'v': float(volume[i])},
+            'prevDay': {'c': float(previous[i]), 'v': float(volume[i])},
+            'lastQuote': {'p': float(close[i] - 0.01), 'P': float(close[i] + 0.01)},
+        }
+    return snapshots
+
+class FixtureServer:
+    """aiohttp app serving ``synthetic_snapshots`` with configurable latency, throttling and errors"""
+
+    def __init__(self, tickers: int = 5000, seed: int = 42, latency_ms: float = 0.0,
+                 rate_limit: Optional[float] = None, error_rate: float = 0.0):
+        self.snapshots = synthetic_snapshots(tickers, seed)
+        self.latency = latency_ms / 1000
+        self.rate_limit = rate_limit
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.stats = {'requests': 0, 'throttled': 0, 'errors': 0, 'symbols': 0}
+        self.runner = None
+        self.thread = None
+        self.loop = None
+
+    def _throttled(self) -> bool:
+        now = time.monotonic()
+        if now - self.window_start >= 1.0:
+            self.window_start, self.window_requests = now, 0
+        self.window_requests += 1
+        return self.rate_limit is not None and self.window_requests > self.rate_limit
+
+    async def handle_snapshot(self, request: web.Request) -> web.Response:
+        self.stats['requests'] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._throttled():
+            self.stats['throttled'] += 1
+            return web.json_response({'status': 'ERROR', 'error': 'rate limited'}, status=429,
+                                     headers={'Retry-After': '1'})
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.stats['errors'] += 1
+            return web.json_response({'status': 'ERROR'}, status=503)
+        symbols = request.query.get('tickers')
+        if symbols:
+            found = [self.snapshots[s] for s in symbols.split(',') if s in self.snapshots]
+        else:
+            found = list(self.snapshots.values())
+        self.stats['symbols'] += len(found)
+        return web.json_response({'status': 'OK', 'count': len(found), 'tickers': found})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get(SNAPSHOT_PATH, self.handle_snapshot)
+        app.router.add_get('/stats', self.handle_stats)
+        return app
+
+    def start_background(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Serve from a daemon thread with its own event loop; returns the base URL"""
+        started = threading.Event()
+        address = {}
+
+        async def serve():
+            self.runner = web.AppRunner(self.create_app(), access_log=None)
+            await self.runner.setup()
+            site = web.TCPSite(self.runner, host, port)
+            await site.start()
+            address['port'] = site._server.sockets[0].getsockname()[1]
+            started.set()
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self.loop.run_until_complete(serve())
+            self.loop.run_forever()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+        return f'http://{host}:{address["port"]}'
+
+    def stop(self):
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop = None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Scanner Pro market data fixture server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--tickers', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--rate-limit', type=float, help='requests per second before answering 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered 503')
+    args = parser.parse_args(argv)
+    server = FixtureServer(args.tickers, args.seed, args.latency_ms, args.rate_limit, args.error_rate)
+    web.run_app(server.create_app(), host=args.host, port=args.port)
+
+if __name__ == '__main__':
+    main()